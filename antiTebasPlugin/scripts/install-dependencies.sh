@@ -87,7 +87,7 @@ case $DISTRO in
         apt-get install -y \
             curl wget git nano vim \
             python3 python3-pip python3-venv \
-            iptables netfilter-persistent \
+            iptables ipset netfilter-persistent \
             netcat-openbsd net-tools dnsutils \
             cron logrotate sudo \
             ca-certificates gnupg lsb-release \
@@ -97,7 +97,7 @@ case $DISTRO in
         yum install -y \
             curl wget git nano vim \
             python3 python3-pip \
-            iptables iptables-services \
+            iptables ipset iptables-services \
             netcat net-tools bind-utils \
             cronie logrotate sudo \
             ca-certificates gnupg \
@@ -105,7 +105,7 @@ case $DISTRO in
         || dnf install -y \
             curl wget git nano vim \
             python3 python3-pip \
-            iptables iptables-services \
+            iptables ipset iptables-services \
             netcat net-tools bind-utils \
             cronie logrotate sudo \
             ca-certificates gnupg \
@@ -115,7 +115,7 @@ case $DISTRO in
         pacman -S --noconfirm \
             curl wget git nano vim \
             python python-pip \
-            iptables netfilter-utils \
+            iptables ipset netfilter-utils \
             netcat net-tools dnsutils \
             cronie logrotate sudo \
             ca-certificates gnupg
@@ -139,6 +139,9 @@ python3 -m pip install \
     psutil \
     pathlib2
 
+# Opcional: TTL reales en la resolución de dominios WARP
+python3 -m pip install dnspython || warn "dnspython no instalado - se usará el TTL por defecto"
+
 log "Librerías Python instaladas"
 
 # ==============================================
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Índice de dominios compilado
+Archivo binario con la lista WARP ya compilada: se proyecta en memoria con
+mmap (solo lectura) y se consulta directamente, sin construir un ``set``
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from itertools import accumulate
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+from zlib import crc32
+
+MAGIC = b'ATXIDX'
+VERSION = 1
+HEADER = struct.Struct('<6sHIIII')   # magic, versión, dominios, cubetas, bytes de meta, bytes de blob
+EMPTY = 0xFFFFFFFF                   # cubeta libre
+
+
+def source_signature(source: Path) -> Optional[List[int]]:
+    """(mtime_ns, tamaño) de la lista de la que sale el índice"""
+    try:
+        st = Path(source).stat()
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _padding(size: int) -> bytes:
+    return b'\0' * (-size % 4)
+
+
+def compile_index(path: Path, domains: Iterable[str], source: Optional[Path] = None, **meta) -> bool:
+    """Compilar los dominios en ``path`` (escritura atómica)
+
+    Formato, todo alineado a 4 bytes y en el orden de bytes de la máquina:
+
+    - cabecera y metadatos JSON (versión, firma de la lista de origen, ...)
+    - ``offsets``: ``n + 1`` uint32, inicio de cada dominio en el blob
+    - ``buckets``: tabla hash de direccionamiento abierto (CRC-32, sondeo
+      lineal, ocupación <= 50 %) con el número de orden de cada dominio
+    - blob: los dominios en UTF-8, uno tras otro, ordenados por el dominio
+      invertido (``moc.nzad``, ``moc.nzad.evil``, ...): cada dominio queda
+      junto a sus subdominios
+    """
+    path = Path(path)
+    keys = [domain.encode() for domain in sorted(set(domains), key=lambda domain: domain[::-1])]
+    offsets = array('I', accumulate(map(len, keys), initial=0))
+
+    nbuckets = 8
+    while nbuckets < 2 * len(keys):
+        nbuckets *= 2
+    mask = nbuckets - 1
+    buckets = array('I', [EMPTY]) * nbuckets
+    for i, key in enumerate(keys):
+        slot = crc32(key) & mask
+        while buckets[slot] != EMPTY:
+            slot = (slot + 1) & mask
+        buckets[slot] = i
+
+    header_meta = dict(meta, byteorder=sys.byteorder,
+                       source=source_signature(source) if source is not None else None)
+    meta_bytes = json.dumps(header_meta).encode()
+    meta_bytes += _padding(HEADER.size + len(meta_bytes))
+    blob = b''.join(keys)
+
+    tmp = path.with_name(path.name + '.tmp')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(keys), nbuckets, len(meta_bytes), len(blob)))
+            f.write(meta_bytes)
+            f.write(offsets.tobytes())
+            f.write(buckets.tobytes())
+            f.write(blob)
+        os.replace(tmp, path)
+        return True
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        return False
+
+
+class CompiledIndex:
+    """Índice de solo lectura sobre un archivo compilado con ``compile_index``
+
+    El archivo se proyecta con mmap: cargarlo no lee nada del disco y las
+    páginas se comparten entre el monitor y los procesos de la CLI. La
+    búsqueda recorre los dominios padre de la consulta como ``DomainIndex``
+    (``a.b.example.com`` → ``b.example.com`` → ...) y cada uno se busca en
+    la tabla hash del archivo.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._open()
+        except (ValueError, struct.error, TypeError):
+            self.close()
+            raise ValueError(f"índice compilado no válido: {self.path}")
+
+    def _open(self):
+        mm = self._mm
+        magic, version, count, nbuckets, meta_len, blob_len = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('versión')
+        start = HEADER.size
+        self.meta: Dict = json.loads(mm[start:start + meta_len].rstrip(b'\0'))
+        if self.meta.get('byteorder') != sys.byteorder:
+            raise ValueError('orden de bytes')
+
+        start += meta_len
+        offsets_end = start + 4 * (count + 1)
+        buckets_end = offsets_end + 4 * nbuckets
+        if buckets_end + blob_len != len(mm):
+            raise ValueError('tamaño')
+
+        view = memoryview(mm)
+        self._offsets = view[start:offsets_end].cast('I')
+        self._buckets = view[offsets_end:buckets_end].cast('I')
+        self._blob_start = buckets_end
+        self._count = count
+        self._mask = nbuckets - 1
+        view.release()
+
+    def close(self):
+        for name in ('_offsets', '_buckets'):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        self._mm.close()
+
+    @property
+    def nbytes(self) -> int:
+        """Tamaño del archivo proyectado"""
+        return len(self._mm)
+
+    def _find(self, key: bytes) -> bool:
+        mm = self._mm
+        offsets = self._offsets
+        buckets = self._buckets
+        base = self._blob_start
+        mask = self._mask
+        slot = crc32(key) & mask
+        while True:
+            i = buckets[slot]
+            if i == EMPTY:
+                return False
+            if mm[base + offsets[i]:base + offsets[i + 1]] == key:
+                return True
+            slot = (slot + 1) & mask
+
+    def __contains__(self, domain: str) -> bool:
+        return self._find(domain.encode())
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        mm = self._mm
+        offsets = self._offsets
+        base = self._blob_start
+        for i in range(self._count):
+            yield mm[base + offsets[i]:base + offsets[i + 1]].decode()
+
+    def match(self, domain: str) -> Optional[str]:
+        """Devolver la entrada de la lista que cubre al dominio, o None"""
+        try:
+            key = domain.encode()
+        except UnicodeError:
+            return None
+        # Búsqueda en línea (sin _find): es el camino caliente del monitor
+        mm = self._mm
+        offsets = self._offsets
+        buckets = self._buckets
+        base = self._blob_start
+        mask = self._mask
+
+        # El propio dominio y después sus padres: un slice por etiqueta
+        pos = -1
+        while True:
+            candidate = key[pos + 1:] if pos >= 0 else key
+            slot = crc32(candidate) & mask
+            i = buckets[slot]
+            while i != EMPTY:
+                if mm[base + offsets[i]:base + offsets[i + 1]] == candidate:
+                    return candidate.decode()
+                slot = (slot + 1) & mask
+                i = buckets[slot]
+            pos = key.find(b'.', pos + 1)
+            if pos == -1:
+                return None
+
+    def matches(self, domain: str) -> bool:
+        """Verificar si el dominio (o alguno de sus padres) está en la lista"""
+        return self.match(domain) is not None
+
+
+def load_index(path: Path, source: Optional[Path] = None) -> Optional[CompiledIndex]:
+    """Abrir el índice si existe, es válido y sigue correspondiendo a ``source``
+
+    Devuelve None si hay que volver a compilarlo (p. ej. la lista de texto se
+    editó a mano después de compilar).
+    """
+    try:
+        index = CompiledIndex(path)
+    except (OSError, ValueError):
+        return None
+    if source is not None and index.meta.get('source') != source_signature(source):
+        index.close()
+        return None
+    return index
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Socket de control
+Socket Unix con peticiones JSON (una por línea) para consultar y modificar
+el monitor en ejecución sin arrancar otro proceso completo
+
+Uso como cliente (lo usa warp-domains):
+    python3 control_socket.py [--socket RUTA] test|add|remove <dominio>
+    python3 control_socket.py [--socket RUTA] stats|reload|flush
+
+Códigos de salida: 0 correcto, 1 la operación falló, 3 monitor no disponible.
+"""
+
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+DEFAULT_SOCKET = Path("/run/antitebas/control.sock")
+OPERATIONS = ('test', 'add', 'remove', 'list', 'stats', 'reload', 'flush')
+MAX_REQUEST = 64 * 1024
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_UNAVAILABLE = 3
+
+Handler = Callable[[Dict], Dict]
+
+
+class ControlUnavailable(Exception):
+    """No hay monitor escuchando en el socket de control"""
+
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ControlServer:
+    """Servidor del socket de control en un hilo propio
+
+    Cada línea recibida es un objeto JSON con ``op`` y sus argumentos; la
+    respuesta es otra línea JSON con ``ok`` y el resultado (o ``error``).
+    """
+
+    def __init__(self, path: Path, handlers: Dict[str, Handler], logger: Optional[logging.Logger] = None):
+        self.path = Path(path)
+        self.handlers = handlers
+        self.logger = logger or logging.getLogger('AntiTebas')
+        self.server: Optional[_ThreadingUnixServer] = None
+        self.thread: Optional[threading.Thread] = None
+
+    def dispatch(self, request: Dict) -> Dict:
+        op = request.get('op') if isinstance(request, dict) else None
+        handler = self.handlers.get(op)
+        if handler is None:
+            return {'ok': False, 'error': f"operación desconocida: {op}"}
+        try:
+            response = handler(request)
+        except Exception as e:
+            self.logger.error(f"Error en operación de control {op}: {e}")
+            return {'ok': False, 'error': str(e)}
+        response.setdefault('ok', True)
+        return response
+
+    def _request_handler(self):
+        control = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    line = self.rfile.readline(MAX_REQUEST)
+                    if not line:
+                        break
+                    try:
+                        response = control.dispatch(json.loads(line))
+                    except ValueError as e:
+                        response = {'ok': False, 'error': f"JSON inválido: {e}"}
+                    self.wfile.write(json.dumps(response, default=str).encode('utf-8') + b'\n')
+
+        return RequestHandler
+
+    def _clear_stale_socket(self) -> bool:
+        """Borrar un socket huérfano; False si otro monitor ya lo atiende"""
+        if not self.path.exists():
+            return True
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.settimeout(1)
+                probe.connect(str(self.path))
+            return False
+        except OSError:
+            self.path.unlink()
+            return True
+
+    def start(self) -> bool:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if not self._clear_stale_socket():
+                self.logger.warning(f"⚠️ Otro monitor atiende ya el socket de control {self.path}")
+                return False
+            self.server = _ThreadingUnixServer(str(self.path), self._request_handler())
+            os.chmod(self.path, 0o660)
+        except OSError as e:
+            self.logger.warning(f"⚠️ No se pudo abrir el socket de control {self.path}: {e}")
+            return False
+        self.thread = threading.Thread(target=self.server.serve_forever, name='control', daemon=True)
+        self.thread.start()
+        self.logger.info(f"🎛️ Socket de control en {self.path}")
+        return True
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            try:
+                self.path.unlink()
+            except OSError:
+                pass
+
+
+def send_command(path: Path, op: str, timeout: float = 5.0, **args) -> Dict:
+    """Enviar una operación al monitor y devolver su respuesta"""
+    request = dict(args, op=op)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(path))
+            sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as reader:
+                line = reader.readline()
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise ControlUnavailable(str(e)) from e
+    if not line:
+        raise ControlUnavailable("conexión cerrada sin respuesta")
+    return json.loads(line)
+
+
+def format_response(op: str, response: Dict) -> str:
+    """Texto para la terminal, con el mismo formato que el modo sin monitor"""
+    if not response.get('ok'):
+        domain = response.get('domain')
+        if op == 'add' and domain:
+            return f"✗ Error agregando {domain}"
+        if op == 'remove' and domain:
+            return f"✗ Dominio {domain} no encontrado"
+        return f"✗ {response.get('error', 'Error')}"
+
+    if op == 'test':
+        return f"Dominio {response['domain']}: {'🎯 WARP' if response['warp'] else '🌐 Normal'}"
+    if op == 'add':
+        return f"✓ Dominio {response['domain']} agregado"
+    if op == 'remove':
+        return f"✓ Dominio {response['domain']} eliminado"
+    if op == 'list':
+        domains = response['domains']
+        if not domains:
+            return "   (ninguno configurado)"
+        lines = [''] + [f"{i:6}. {domain}" for i, domain in enumerate(domains, 1)]
+        return '\n'.join(lines + ['', f"Total: {len(domains)} dominios"])
+    if op == 'reload':
+        return f"✓ Listas recargadas: {response['domains']} dominios"
+    if op == 'flush':
+        return f"✓ Redirecciones aplicadas: {response['applied']} cambios"
+
+    lines = [
+        "📊 Estadísticas:",
+        f"   Total consultas: {response['total_queries']}",
+        f"   Consultas WARP: {response['warp_queries']}",
+        f"   Última actualización: {response['last_update'] or 'Nunca'}",
+        f"   Dominios cargados: {response['domains']}",
+        f"   IPs redirigidas: {response['redirect_ips']} ({response['redirect_pending']} pendientes)",
+    ]
+    for stage, depth in sorted(response.get('queues', {}).items()):
+        lines.append(f"   Cola {stage}: {depth}")
+    for unit, value in sorted(response.get('lag', {}).items()):
+        lines.append(f"   Retraso ({unit}): {value}")
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Cliente del socket de control de AntiTebas")
+    parser.add_argument('--socket', type=Path, default=DEFAULT_SOCKET)
+    parser.add_argument('--timeout', type=float, default=5.0)
+    parser.add_argument('op', choices=OPERATIONS)
+    parser.add_argument('domain', nargs='?')
+    args = parser.parse_args(argv)
+
+    if args.op in ('test', 'add', 'remove') and not args.domain:
+        parser.error(f"{args.op} necesita un dominio")
+
+    request = {'domain': args.domain} if args.domain else {}
+    try:
+        response = send_command(args.socket, args.op, timeout=args.timeout, **request)
+    except ControlUnavailable:
+        return EXIT_UNAVAILABLE
+    except (OSError, ValueError) as e:
+        print(f"✗ Error en el socket de control: {e}", file=sys.stderr)
+        return EXIT_FAILED
+
+    print(format_response(args.op, response))
+    return EXIT_OK if response.get('ok') else EXIT_FAILED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
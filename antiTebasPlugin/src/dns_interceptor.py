@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Interceptor DNS
+Detecta consultas a dominios WARP con el índice en memoria del controlador
+y las notifica por lotes al traffic manager desde un hilo residente
+"""
+
+import logging
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import requests
+
+
+def manager_url(host: str, port: int, path: str = '/api/query') -> str:
+    return f"http://{host}:{port}{path}"
+
+
+def check_manager(host: str, port: int, timeout: float = 3.0) -> bool:
+    """Comprobar que el traffic manager acepta conexiones (equivalente a ``nc -z``)"""
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def event_time(timestamp: Optional[float] = None) -> str:
+    """Fecha ISO 8601 con zona horaria de un epoch (ahora si es None)"""
+    if timestamp is None:
+        timestamp = time.time()
+    return datetime.fromtimestamp(timestamp).astimezone().isoformat(timespec='seconds')
+
+
+class QueryNotifier:
+    """Envío por lotes de consultas WARP al traffic manager (POST JSON a /api/query)
+
+    ``notify`` solo anota el evento y no bloquea nunca. Un hilo propio envía
+    cada ``interval`` segundos (o al llegar a ``batch_size`` eventos) un array
+    JSON con los eventos de la ventana por una sesión HTTP con keep-alive;
+    con ``batch_size=1`` se envía un documento por consulta, como antes. Las
+    consultas repetidas del mismo dominio y cliente dentro de la ventana se
+    agrupan en un evento con ``count``. Si el traffic manager no responde,
+    los eventos esperan en un búfer acotado a ``spill_size`` (se descartan
+    los más antiguos) y se reintenta cada ``retry_interval`` segundos.
+    """
+
+    def __init__(self, url: str, timeout: float = 2.0, interval: float = 0.5, batch_size: int = 100,
+                 spill_size: int = 10000, retry_interval: float = 5.0,
+                 session: Optional['requests.Session'] = None, logger: Optional[logging.Logger] = None):
+        self.url = url
+        self.timeout = timeout
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self.retry_interval = retry_interval
+        self.logger = logger or logging.getLogger('AntiTebas')
+        self.session = session or self._create_session()
+        self.stats = {'sent': 0, 'batches': 0, 'collapsed': 0, 'dropped': 0, 'errors': 0}
+
+        self._lock = threading.Lock()
+        self._window: Dict[Tuple[str, str], Dict] = {}   # (dominio, cliente) → evento
+        self._spill: Deque[Dict] = deque(maxlen=max(1, spill_size))
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._failing = False
+        self.thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _create_session() -> 'requests.Session':
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        return session
+
+    def notify(self, domain: str, client: str, query_type: str = 'A',
+               timestamp: Optional[float] = None) -> bool:
+        """Anotar una consulta WARP; ``timestamp`` en epoch (el de la fuente), ahora si no se da"""
+        key = (domain, client)
+        with self._lock:
+            event = self._window.get(key)
+            if event is not None:
+                event['count'] += 1
+                self.stats['collapsed'] += 1
+                return True
+            if len(self._window) >= self._spill.maxlen:
+                self.stats['dropped'] += 1
+                return False
+            self._window[key] = {
+                'domain': domain,
+                'client': client,
+                'type': query_type,
+                'timestamp': event_time(timestamp),
+                'count': 1,
+            }
+            full = len(self._window) >= self.batch_size
+        if full:
+            self._wake.set()
+        return True
+
+    def pending(self) -> int:
+        """Eventos aún sin enviar (ventana actual y búfer de espera)"""
+        return len(self._window) + len(self._spill)
+
+    def _take_window(self):
+        """Pasar los eventos de la ventana al búfer de envío"""
+        with self._lock:
+            events = list(self._window.values())
+            self._window = {}
+        overflow = len(self._spill) + len(events) - self._spill.maxlen
+        if overflow > 0:
+            self.stats['dropped'] += overflow
+        self._spill.extend(events)
+
+    def send(self, events: List[Dict]) -> bool:
+        payload = events if self.batch_size > 1 else events[0]
+        try:
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+        except OSError as e:  # requests.RequestException hereda de OSError
+            self.stats['errors'] += 1
+            if not self._failing:
+                self.logger.warning(f"⚠️ No se pudo notificar al traffic manager ({self.url}): {e} "
+                                    f"- reteniendo eventos")
+                self._failing = True
+            return False
+        if self._failing:
+            self.logger.info("✅ Traffic manager accesible de nuevo")
+            self._failing = False
+        self.stats['sent'] += len(events)
+        self.stats['batches'] += 1
+        return True
+
+    def flush(self) -> bool:
+        """Enviar todo lo pendiente en lotes; False si el traffic manager falla"""
+        self._take_window()
+        while self._spill:
+            batch = [self._spill[i] for i in range(min(self.batch_size, len(self._spill)))]
+            if not self.send(batch):
+                return False
+            for _ in batch:
+                self._spill.popleft()
+        return True
+
+    def _run(self):
+        retry_at = 0.0
+        while not self._stopping.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if time.monotonic() < retry_at:
+                # Traffic manager caído: acumular en el búfer hasta el reintento
+                self._take_window()
+                continue
+            if not self.flush():
+                retry_at = time.monotonic() + self.retry_interval
+
+    def start(self):
+        if self.thread is None:
+            self._stopping.clear()
+            self.thread = threading.Thread(target=self._run, name='notifier', daemon=True)
+            self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Detener el hilo, intentar un último envío y cerrar la sesión"""
+        self._stopping.set()
+        self._wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+        self.flush()
+        self.session.close()
+
+
+class DnsInterceptor:
+    """Detección de consultas WARP y notificación, sin redirección"""
+
+    def __init__(self, is_warp_domain: Callable[[str], bool], notifier: Optional[QueryNotifier] = None,
+                 logger: Optional[logging.Logger] = None):
+        self.is_warp_domain = is_warp_domain
+        self.notifier = notifier
+        self.logger = logger or logging.getLogger('AntiTebas')
+
+    def intercept(self, domain: str, client_ip: str, query_type: str = 'A',
+                  timestamp: Optional[float] = None) -> bool:
+        """Notificar la consulta si es de un dominio WARP; True si lo es"""
+        if not self.is_warp_domain(domain):
+            return False
+        self.logger.info(f"🎯 Dominio WARP detectado: {domain} (cliente: {client_ip})")
+        if self.notifier is not None:
+            self.notifier.notify(domain, client_ip, query_type, timestamp=timestamp)
+        return True
+
+    def process_queries(self, queries: Iterable[Dict]) -> int:
+        hits = 0
+        for query in queries:
+            if query and self.intercept(query['domain'], query['client_ip'], query.get('query_type', 'A'),
+                                        query.get('timestamp')):
+                hits += 1
+        return hits
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Resolución DNS asíncrona
+Pool de hilos con caché TTL/LRU acotada, coalescencia de consultas e IPv4/IPv6
+"""
+
+import logging
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Set, Tuple
+
+try:
+    import dns.exception
+    import dns.resolver  # dnspython (opcional): aporta TTL reales
+except ImportError:
+    dns = None
+
+# (IPs, TTL en segundos o None si el resolvedor no lo conoce)
+ResolveResult = Tuple[Set[str], Optional[int]]
+ResolveCallback = Callable[[str, Set[str], int], None]
+
+MIN_TTL = 5
+
+
+def resolve_getaddrinfo(domain: str) -> ResolveResult:
+    """Resolver A y AAAA con el resolvedor del sistema (sin TTL)"""
+    ips = set()
+    for item in socket.getaddrinfo(domain, None, type=socket.SOCK_STREAM):
+        ips.add(item[4][0])
+    return ips, None
+
+
+def resolve_dnspython(domain: str) -> ResolveResult:
+    """Resolver A y AAAA con dnspython, devolviendo el TTL más bajo
+
+    Cada tipo se resuelve por separado: si uno falla (p. ej. AAAA con
+    ``Timeout`` o ``NoNameservers``) se conservan las IPs del otro. El error
+    solo se propaga si no se obtuvo ninguna IP.
+    """
+    ips = set()
+    ttl = None
+    error = None
+    for rdtype in ('A', 'AAAA'):
+        try:
+            answer = dns.resolver.resolve(domain, rdtype)
+        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+            continue
+        except dns.exception.DNSException as e:
+            error = error or e
+            continue
+        ips.update(rdata.address for rdata in answer)
+        ttl = answer.rrset.ttl if ttl is None else min(ttl, answer.rrset.ttl)
+    if not ips and error is not None:
+        raise error
+    return ips, ttl
+
+
+def default_resolve_func() -> Callable[[str], ResolveResult]:
+    return resolve_dnspython if dns is not None else resolve_getaddrinfo
+
+
+class ResolverPool:
+    """Resolución de dominios fuera del hilo del monitor
+
+    - ``submit`` encola la resolución y vuelve de inmediato; el callback se
+      ejecuta en un hilo del pool con ``(dominio, ips, ttl)``.
+    - Las consultas simultáneas del mismo nombre comparten una única
+      resolución.
+    - Los resultados se guardan con su TTL en una caché LRU de tamaño fijo
+      (también los negativos, con ``negative_ttl``).
+    """
+
+    def __init__(self, workers: int = 4, cache_size: int = 10000, default_ttl: int = 300,
+                 negative_ttl: int = 30, resolve_func: Optional[Callable[[str], ResolveResult]] = None,
+                 logger: Optional[logging.Logger] = None):
+        self.cache_size = cache_size
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.resolve_func = resolve_func or default_resolve_func()
+        self.logger = logger or logging.getLogger('AntiTebas')
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='resolver')
+
+        # dominio → (expira, ips)
+        self._cache: "OrderedDict[str, Tuple[float, Set[str]]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'coalesced': 0,
+            'errors': 0,
+        }
+
+    def get_cached(self, domain: str) -> Optional[Tuple[Set[str], int]]:
+        """Devolver (ips, ttl restante) si el dominio está en caché y vigente"""
+        with self._lock:
+            return self._get_cached_locked(domain)
+
+    def _get_cached_locked(self, domain: str) -> Optional[Tuple[Set[str], int]]:
+        entry = self._cache.get(domain)
+        if entry is None:
+            return None
+        expires, ips = entry
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            del self._cache[domain]
+            return None
+        self._cache.move_to_end(domain)
+        return ips, int(remaining)
+
+    def _store(self, domain: str, ips: Set[str], ttl: int):
+        with self._lock:
+            self._cache[domain] = (time.monotonic() + ttl, ips)
+            self._cache.move_to_end(domain)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _lookup(self, domain: str) -> Tuple[Set[str], int]:
+        """Resolver (en un hilo del pool) y cachear el resultado"""
+        try:
+            ips, ttl = self.resolve_func(domain)
+            ttl = max(MIN_TTL, ttl if ttl is not None else self.default_ttl)
+            if not ips:
+                ttl = self.negative_ttl
+            self.logger.debug(f"Resuelto {domain} → {ips} (TTL {ttl}s)")
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.logger.debug(f"No se pudo resolver {domain}: {e}")
+            ips, ttl = set(), self.negative_ttl
+
+        self._store(domain, ips, ttl)
+        return ips, ttl
+
+    def _get_future(self, domain: str) -> Tuple[Optional[Tuple[Set[str], int]], Optional[Future]]:
+        """Resultado en caché o future (nuevo o ya en curso) para el dominio"""
+        with self._lock:
+            cached = self._get_cached_locked(domain)
+            if cached is not None:
+                self.stats['cache_hits'] += 1
+                return cached, None
+
+            future = self._inflight.get(domain)
+            if future is not None:
+                self.stats['coalesced'] += 1
+                return None, future
+
+            self.stats['cache_misses'] += 1
+            future = self.executor.submit(self._lookup, domain)
+            self._inflight[domain] = future
+
+        future.add_done_callback(lambda _f: self._finish(domain))
+        return None, future
+
+    def _finish(self, domain: str):
+        with self._lock:
+            self._inflight.pop(domain, None)
+
+    def submit(self, domain: str, callback: ResolveCallback):
+        """Resolver sin bloquear y llamar a ``callback(dominio, ips, ttl)``"""
+        cached, future = self._get_future(domain)
+        if cached is not None:
+            callback(domain, *cached)
+            return
+
+        def on_done(f: Future):
+            try:
+                callback(domain, *f.result())
+            except Exception as e:
+                self.logger.error(f"Error procesando resolución de {domain}: {e}")
+
+        future.add_done_callback(on_done)
+
+    def lookup(self, domain: str, timeout: Optional[float] = None) -> Tuple[Set[str], int]:
+        """Resolver bloqueando (usa caché y consultas en curso), devolver (ips, ttl)"""
+        cached, future = self._get_future(domain)
+        if cached is not None:
+            return cached
+        return future.result(timeout=timeout)
+
+    def resolve(self, domain: str, timeout: Optional[float] = None) -> Set[str]:
+        """Resolver bloqueando, devolver solo las IPs"""
+        return self.lookup(domain, timeout)[0]
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Índice de dominios WARP
+Búsqueda por sufijo de etiquetas en O(número de etiquetas)
+"""
+
+from typing import Iterable, Iterator, Optional, Set, Tuple
+
+
+class DomainIndex:
+    """Conjunto de dominios WARP con búsqueda de subdominios por etiquetas
+
+    En lugar de recorrer toda la lista comprobando ``endswith`` para cada
+    entrada, se recorren los dominios padre de la consulta
+    (``a.b.example.com`` → ``b.example.com`` → ``example.com`` → ``com``)
+    y cada uno se busca en un ``set``. El coste de una búsqueda depende del
+    número de etiquetas de la consulta, no del tamaño de la lista.
+    """
+
+    __slots__ = ('_domains',)
+
+    def __init__(self, domains: Iterable[str] = ()):
+        self._domains = set(domains)
+
+    def add(self, domain: str):
+        self._domains.add(domain)
+
+    def update(self, domains: Iterable[str]):
+        self._domains.update(domains)
+
+    def remove(self, domain: str):
+        self._domains.remove(domain)
+
+    def discard(self, domain: str):
+        self._domains.discard(domain)
+
+    def __contains__(self, domain: str) -> bool:
+        return domain in self._domains
+
+    def __len__(self) -> int:
+        return len(self._domains)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._domains)
+
+    def match(self, domain: str) -> Optional[str]:
+        """Devolver la entrada de la lista que cubre al dominio, o None"""
+        domains = self._domains
+        if domain in domains:
+            return domain
+
+        # Recorrer dominios padre: un slice por etiqueta
+        pos = domain.find('.')
+        while pos != -1:
+            parent = domain[pos + 1:]
+            if parent in domains:
+                return parent
+            pos = domain.find('.', pos + 1)
+
+        return None
+
+    def matches(self, domain: str) -> bool:
+        """Verificar si el dominio (o alguno de sus padres) está en la lista"""
+        return self.match(domain) is not None
+
+
+class OverlayIndex:
+    """Índice de la lista con las altas y bajas manuales encima
+
+    ``add``/``remove`` del CLI o del socket de control no reescriben ni
+    recompilan la lista entera: cada cambio publica un ``OverlayIndex``
+    nuevo (inmutable) con el mismo índice base y una capa pequeña
+    (``added`` y ``removed``). La capa se consulta antes que el índice base
+    y se funde con él en la siguiente actualización de listas.
+    """
+
+    __slots__ = ('base', 'added', 'removed', '_len')
+
+    def __init__(self, base, added: Iterable[str] = (), removed: Iterable[str] = ()):
+        self.base = base
+        # Solo altas que no están en la base y bajas que sí están
+        self.added = frozenset(d for d in added if d not in base)
+        self.removed = frozenset(d for d in removed if d in base)
+        self._len = len(base) + len(self.added) - len(self.removed)
+
+    @property
+    def changes(self) -> int:
+        """Entradas de la capa manual"""
+        return len(self.added) + len(self.removed)
+
+    def with_added(self, domain: str) -> 'OverlayIndex':
+        return OverlayIndex(self.base, self.added | {domain}, self.removed - {domain})
+
+    def with_removed(self, domain: str) -> 'OverlayIndex':
+        return OverlayIndex(self.base, self.added - {domain}, self.removed | {domain})
+
+    def __contains__(self, domain: str) -> bool:
+        if domain in self.added:
+            return True
+        return domain not in self.removed and domain in self.base
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[str]:
+        removed = self.removed
+        for domain in self.base:
+            if domain not in removed:
+                yield domain
+        yield from self.added
+
+    def match(self, domain: str) -> Optional[str]:
+        """Devolver la entrada que cubre al dominio: primero la capa, luego la base"""
+        added = self.added
+        if added:
+            if domain in added:
+                return domain
+            pos = domain.find('.')
+            while pos != -1:
+                if domain[pos + 1:] in added:
+                    return domain[pos + 1:]
+                pos = domain.find('.', pos + 1)
+
+        entry = self.base.match(domain)
+        # Entrada base dada de baja: seguir por sus dominios padre
+        while entry is not None and entry in self.removed:
+            pos = entry.find('.')
+            entry = self.base.match(entry[pos + 1:]) if pos != -1 else None
+        return entry
+
+    def matches(self, domain: str) -> bool:
+        return self.match(domain) is not None
+
+
+def read_overlay(path) -> Tuple[Set[str], Set[str]]:
+    """Leer la capa manual (``+dominio`` alta, ``-dominio`` baja), devolver (altas, bajas)"""
+    added, removed = set(), set()
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('+'):
+                added.add(line[1:])
+            elif line.startswith('-'):
+                removed.add(line[1:])
+    return added, removed
+
+
+def write_overlay(path, overlay: OverlayIndex):
+    """Guardar la capa manual (tamaño proporcional a los cambios, no a la lista)"""
+    with open(path, 'w') as f:
+        f.write("# Cambios manuales sobre la lista WARP (+alta, -baja); se funden al actualizar\n")
+        for domain in sorted(overlay.added):
+            f.write(f"+{domain}\n")
+        for domain in sorted(overlay.removed):
+            f.write(f"-{domain}\n")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Validación y normalización de dominios
+Validación por lotes con un patrón precompilado (una sola pasada en C por lote)
+"""
+
+import re
+from typing import Iterable, Iterator, List, Optional
+
+MAX_DOMAIN_LENGTH = 253
+BATCH_SIZE = 4096
+
+_LABEL = r'[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?'
+
+# Un dominio ya normalizado (minúsculas, sin punto final)
+DOMAIN_PATTERN = re.compile(rf'{_LABEL}(?:\.{_LABEL})*')
+
+# Un dominio por línea: longitud máxima y punto final opcional (que se descarta)
+BATCH_PATTERN = re.compile(rf'^(?=[^\n]{{1,{MAX_DOMAIN_LENGTH}}}\.?$)({_LABEL}(?:\.{_LABEL})*)\.?$', re.M)
+
+
+def to_ascii(domain: str) -> Optional[str]:
+    """Convertir un dominio internacionalizado a punycode (IDNA)"""
+    try:
+        return domain.encode('idna').decode('ascii')
+    except UnicodeError:
+        return None
+
+
+def normalize_domain(domain: str) -> Optional[str]:
+    """Normalizar un dominio (minúsculas, sin punto final, IDNA); None si no es válido"""
+    if not domain:
+        return None
+    domain = domain.strip().lower()
+    if domain.endswith('.'):
+        domain = domain[:-1]
+    if not domain.isascii():
+        domain = to_ascii(domain)
+        if domain is None:
+            return None
+    if len(domain) > MAX_DOMAIN_LENGTH or not DOMAIN_PATTERN.fullmatch(domain):
+        return None
+    return domain
+
+
+def is_valid_domain(domain: str) -> bool:
+    """Verificar si un dominio es válido"""
+    return normalize_domain(domain) is not None
+
+
+def normalize_batch(candidates: List[str]) -> List[str]:
+    """Normalizar un lote de candidatos, devolviendo solo los válidos
+
+    Los candidatos ASCII se unen en un único texto y se validan con una
+    sola búsqueda multilínea; solo los nombres no ASCII (IDNA) se tratan
+    uno a uno.
+    """
+    text = '\n'.join(candidates)
+    if text.isascii() and text.count('\n') == len(candidates) - 1:
+        # Caso habitual: todo ASCII y sin saltos de línea dentro de un nombre
+        return BATCH_PATTERN.findall(text.lower())
+
+    ascii_names = []
+    result = []
+    for name in candidates:
+        if name.isascii():
+            if '\n' not in name:
+                ascii_names.append(name)
+        else:
+            normalized = normalize_domain(name)
+            if normalized is not None:
+                result.append(normalized)
+    if ascii_names:
+        result.extend(BATCH_PATTERN.findall('\n'.join(ascii_names).lower()))
+    return result
+
+
+def validate_stream(candidates: Iterable[str], batch_size: int = BATCH_SIZE) -> Iterator[str]:
+    """Validar y normalizar un flujo de candidatos en lotes de ``batch_size``"""
+    batch = []
+    for name in candidates:
+        batch.append(name)
+        if len(batch) >= batch_size:
+            yield from normalize_batch(batch)
+            batch = []
+    if batch:
+        yield from normalize_batch(batch)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Rangos de IPs WARP
+Lista de IPs y CIDR (IPv4 e IPv6) agregada en el mínimo de prefijos y
+consultada por intervalos ordenados
+"""
+
+import ipaddress
+import socket
+from bisect import bisect_right
+from typing import Iterable, List, Tuple
+
+FAMILIES = {4: socket.AF_INET, 6: socket.AF_INET6}
+
+
+def parse_networks(lines: Iterable[str]) -> Tuple[List, int]:
+    """Leer IPs y CIDR (uno por línea, ``#`` comenta), devolver (redes, líneas inválidas)
+
+    Los bits de host se ignoran: ``104.16.1.0/12`` equivale a ``104.16.0.0/12``.
+    """
+    networks = []
+    invalid = 0
+    for line in lines:
+        entry = line.split('#', 1)[0].strip()
+        if not entry:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        except ValueError:
+            invalid += 1
+    return networks, invalid
+
+
+def network_member(network) -> str:
+    """Texto de una red para ipset/nft/iptables (sin prefijo si es una sola IP)"""
+    if network.prefixlen == network.max_prefixlen:
+        return str(network.network_address)
+    return network.with_prefixlen
+
+
+class IpRanges:
+    """Rangos WARP agregados, inmutables
+
+    Las redes se agregan por familia con ``ipaddress.collapse_addresses``
+    (solapadas y adyacentes se funden: ``10.0.0.0/24`` + ``10.0.1.0/24`` →
+    ``10.0.0.0/23``) y se guardan como intervalos ``[inicio, fin]`` ordenados
+    y disjuntos: ``ip in ranges`` es una búsqueda binaria con ``bisect``.
+    """
+
+    def __init__(self, networks: Iterable = ()):
+        by_version = {4: [], 6: []}
+        for network in networks:
+            by_version[network.version].append(network)
+
+        members = []
+        self._intervals = {}
+        self.addresses = 0
+        for version, family in FAMILIES.items():
+            collapsed = list(ipaddress.collapse_addresses(by_version[version]))
+            members.extend(network_member(network) for network in collapsed)
+            self._intervals[family] = ([int(n.network_address) for n in collapsed],
+                                       [int(n.broadcast_address) for n in collapsed])
+            self.addresses += sum(n.num_addresses for n in collapsed)
+        # Miembros a instalar: el mínimo de prefijos que cubre la lista
+        self.networks: Tuple[str, ...] = tuple(members)
+
+    @classmethod
+    def parse(cls, lines: Iterable[str]) -> Tuple['IpRanges', int]:
+        """Construir desde líneas de texto, devolver (rangos, líneas inválidas)"""
+        networks, invalid = parse_networks(lines)
+        return cls(networks), invalid
+
+    def __contains__(self, ip: str) -> bool:
+        family = socket.AF_INET6 if ':' in ip else socket.AF_INET
+        starts, ends = self._intervals[family]
+        if not starts:
+            return False
+        try:
+            value = int.from_bytes(socket.inet_pton(family, ip), 'big')
+        except (OSError, TypeError):
+            return False
+        i = bisect_right(starts, value) - 1
+        return i >= 0 and value <= ends[i]
+
+    def __len__(self) -> int:
+        return len(self.networks)
+
+    def __iter__(self):
+        return iter(self.networks)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, IpRanges):
+            return self.networks == other.networks
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.networks)
+
+    def __repr__(self) -> str:
+        return f"IpRanges({list(self.networks)!r})"
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Descarga de listas de dominios
+Descargas en paralelo con sesión compartida, GET condicional y caché en disco;
+el contenido se procesa en streaming, sin cargarlo entero en memoria
+"""
+
+import hashlib
+import json
+import logging
+import lzma
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterable, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import unquote, urlparse
+
+if TYPE_CHECKING:
+    import requests
+
+from list_parser import CHUNK_SIZE, decompress_chunks, iter_file_chunks, iter_lines
+
+# Recibe las líneas de la lista y genera sus dominios
+ListParser = Callable[[Iterable[str]], Iterable[str]]
+
+# Estado de cada descarga
+STATUS_UPDATED = 'updated'            # contenido nuevo, parseado
+STATUS_NOT_MODIFIED = 'not_modified'  # 304: resultado de la caché
+STATUS_UNCHANGED = 'unchanged'        # 200 con el mismo hash: sin volver a parsear
+STATUS_STALE = 'stale'                # error de red: último resultado conocido
+STATUS_ERROR = 'error'                # error y sin caché
+
+# Cuerpo descargado que no se puede leer (gzip/xz corrupto o truncado)
+BODY_ERRORS = (OSError, EOFError, zlib.error, lzma.LZMAError)
+
+
+class FetchResult(NamedTuple):
+    url: str
+    kind: str
+    domains: Set[str]
+    status: str
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+
+def local_path(url: str) -> Optional[Path]:
+    """Ruta local de una URL ``file://`` o de una ruta sin esquema"""
+    parsed = urlparse(url)
+    if parsed.scheme == 'file':
+        return Path(unquote(parsed.path))
+    if not parsed.scheme:
+        return Path(url)
+    return None
+
+
+class ListDownloader:
+    """Descargador de listas con caché por URL y hash de contenido
+
+    Por cada lista se guardan en ``cache_dir`` el cuerpo descargado, los
+    dominios ya parseados (uno por línea) y unos metadatos JSON con
+    ``ETag``/``Last-Modified`` y el SHA-256 del cuerpo. En la siguiente
+    actualización se envían ``If-None-Match``/``If-Modified-Since``; si el
+    servidor responde 304 o el cuerpo tiene el mismo hash, se reutilizan
+    los dominios sin parsear.
+
+    El cuerpo se vuelca a disco por bloques mientras se calcula el hash y
+    después se parsea en streaming desde el archivo (descomprimiendo gzip o
+    xz si hace falta): la memoria no depende del tamaño de la lista.
+    Además de HTTP(S) se aceptan rutas locales y URLs ``file://``. La
+    sesión HTTP (y ``requests``) se crea con la primera descarga remota.
+    """
+
+    def __init__(self, cache_dir: Path, workers: int = 4, timeout: float = 30,
+                 session: Optional['requests.Session'] = None,
+                 logger: Optional[logging.Logger] = None):
+        self.cache_dir = Path(cache_dir)
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger('AntiTebas')
+        self._session = session
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self) -> 'requests.Session':
+        with self._session_lock:
+            if self._session is None:
+                self._session = self._create_session()
+            return self._session
+
+    def _create_session(self) -> 'requests.Session':
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        # Conexiones reutilizables para todos los hilos
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['User-Agent'] = 'AntiTebasPlugin'
+        return session
+
+    # ------------------------------------------------------------------
+    # Caché
+    # ------------------------------------------------------------------
+
+    def _cache_key(self, url: str, kind: str) -> str:
+        # El tipo forma parte de la clave: una URL puede parsearse de dos formas
+        return hashlib.sha256(f"{kind}:{url}".encode()).hexdigest()[:32]
+
+    def _paths(self, url: str, kind: str) -> Tuple[Path, Path, Path]:
+        key = self._cache_key(url, kind)
+        return (self.cache_dir / f"{key}.json", self.cache_dir / f"{key}.body",
+                self.cache_dir / f"{key}.domains")
+
+    def load_meta(self, url: str, kind: str) -> Optional[dict]:
+        meta_file, _, domains_file = self._paths(url, kind)
+        try:
+            meta = json.loads(meta_file.read_text())
+        except (OSError, ValueError):
+            return None
+        if meta.get('url') != url or not domains_file.exists():
+            return None
+        return meta
+
+    def load_domains(self, url: str, kind: str) -> Set[str]:
+        """Dominios parseados en la última descarga válida"""
+        _, _, domains_file = self._paths(url, kind)
+        with open(domains_file, encoding='utf-8') as f:
+            return {line.rstrip('\n') for line in f if line.strip()}
+
+    def _write_meta(self, url: str, meta: dict):
+        meta_file, _, _ = self._paths(url, meta['kind'])
+        try:
+            tmp = meta_file.with_suffix('.json.tmp')
+            tmp.write_text(json.dumps(meta))
+            os.replace(tmp, meta_file)
+        except OSError as e:
+            self.logger.warning(f"⚠️ No se pudo guardar la caché de {url}: {e}")
+
+    def _update_validators(self, url: str, meta: dict, headers):
+        """Guardar ETag/Last-Modified nuevos sin reescribir el cuerpo"""
+        etag, last_modified = headers.get('ETag'), headers.get('Last-Modified')
+        if (etag or meta.get('etag')) == meta.get('etag') and \
+                (last_modified or meta.get('last_modified')) == meta.get('last_modified'):
+            return
+        self._write_meta(url, dict(meta, etag=etag or meta.get('etag'),
+                                   last_modified=last_modified or meta.get('last_modified')))
+
+    def _spool(self, chunks: Iterable[bytes], path: Path) -> str:
+        """Volcar bloques a ``path`` calculando su SHA-256"""
+        digest = hashlib.sha256()
+        with open(path, 'wb') as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                f.write(chunk)
+        return digest.hexdigest()
+
+    def _parse_body(self, body_file: Path, domains_file: Path, parser: ListParser) -> Set[str]:
+        """Parsear el cuerpo en streaming y guardar los dominios
+
+        Si el cuerpo no se puede leer, la excepción se propaga y los
+        dominios cacheados de la descarga anterior no se tocan.
+        """
+        domains = set()
+        tmp = domains_file.with_suffix('.domains.tmp')
+        try:
+            with open(tmp, 'w', encoding='utf-8') as out:
+                for domain in parser(iter_lines(decompress_chunks(iter_file_chunks(body_file)))):
+                    if domain not in domains:
+                        domains.add(domain)
+                        out.write(f"{domain}\n")
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        os.replace(tmp, domains_file)
+        return domains
+
+    def _open_source(self, url: str, meta: Optional[dict]):
+        """Abrir la lista: devolver (bloques, cabeceras, respuesta) o None si es 304"""
+        path = local_path(url)
+        if path is not None:
+            return iter_file_chunks(path), {}, None
+
+        headers = {}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+        if response.status_code == 304 and meta:
+            response.close()
+            self._update_validators(url, meta, response.headers)
+            return None
+        try:
+            response.raise_for_status()
+        except OSError:  # requests.RequestException hereda de OSError
+            response.close()
+            raise
+        return response.iter_content(CHUNK_SIZE), response.headers, response
+
+    # ------------------------------------------------------------------
+    # Descarga
+    # ------------------------------------------------------------------
+
+    def fetch(self, url: str, kind: str, parser: ListParser) -> FetchResult:
+        """Descargar una lista (condicional) y devolver sus dominios"""
+        start = time.perf_counter()
+        result = self._fetch(url, kind, parser)
+        return result._replace(seconds=time.perf_counter() - start)
+
+    def _fetch(self, url: str, kind: str, parser: ListParser) -> FetchResult:
+        meta = self.load_meta(url, kind)
+        _, body_file, domains_file = self._paths(url, kind)
+        tmp_body = body_file.with_suffix('.body.tmp')
+
+        try:
+            source = self._open_source(url, meta)
+            if source is None:
+                return FetchResult(url, kind, self.load_domains(url, kind), STATUS_NOT_MODIFIED)
+            chunks, headers, response = source
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                content_hash = self._spool(chunks, tmp_body)
+            finally:
+                if response is not None:
+                    response.close()
+        except OSError as e:  # incluye requests.RequestException
+            tmp_body.unlink(missing_ok=True)
+            if meta:
+                return FetchResult(url, kind, self.load_domains(url, kind), STATUS_STALE, str(e))
+            return FetchResult(url, kind, set(), STATUS_ERROR, str(e))
+
+        if meta and meta.get('sha256') == content_hash:
+            tmp_body.unlink(missing_ok=True)
+            self._update_validators(url, meta, headers)
+            return FetchResult(url, kind, self.load_domains(url, kind), STATUS_UNCHANGED)
+
+        # Parsear antes de sustituir la caché: un cuerpo corrupto solo afecta a esta URL
+        try:
+            domains = self._parse_body(tmp_body, domains_file, parser)
+        except BODY_ERRORS as e:
+            tmp_body.unlink(missing_ok=True)
+            error = f"contenido no válido: {e}"
+            if meta:
+                return FetchResult(url, kind, self.load_domains(url, kind), STATUS_STALE, error)
+            return FetchResult(url, kind, set(), STATUS_ERROR, error)
+        os.replace(tmp_body, body_file)
+        self._write_meta(url, {
+            'url': url,
+            'kind': kind,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'sha256': content_hash,
+            'count': len(domains),
+        })
+        return FetchResult(url, kind, domains, STATUS_UPDATED)
+
+    def fetch_all(self, jobs: Iterable[Tuple[str, str, ListParser]]) -> List[FetchResult]:
+        """Descargar en paralelo una lista de ``(url, tipo, parser)``"""
+        jobs = list(jobs)
+        if not jobs:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(jobs)),
+                                thread_name_prefix='download') as executor:
+            return list(executor.map(lambda job: self.fetch(*job), jobs))
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+
+def split_urls(value: str) -> List[str]:
+    """Separar una lista de URLs de la configuración (separadas por comas)"""
+    return [url.strip() for url in value.split(',') if url.strip()]
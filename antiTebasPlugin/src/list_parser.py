@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Parser incremental de listas de dominios
+Trocea, descomprime (gzip/xz) y parsea listas bloque a bloque con generadores
+"""
+
+import lzma
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+CHUNK_SIZE = 65536
+
+GZIP_MAGIC = b'\x1f\x8b'
+XZ_MAGIC = b'\xfd7zXZ\x00'
+
+BLOCK_IPS = ('0.0.0.0', '127.0.0.1')
+
+
+def read_chunks(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Leer un archivo abierto en bloques de ``chunk_size`` bytes"""
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_file_chunks(path: Path, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        yield from read_chunks(f, chunk_size)
+
+
+def decompress_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Descomprimir al vuelo si el contenido es gzip o xz (por su cabecera)"""
+    chunks = iter(chunks)
+    head = b''
+    # Reunir lo justo para reconocer la cabecera
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= len(XZ_MAGIC):
+            break
+
+    if head.startswith(GZIP_MAGIC):
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif head.startswith(XZ_MAGIC):
+        decompressor = lzma.LZMADecompressor()
+    else:
+        if head:
+            yield head
+        yield from chunks
+        return
+
+    # Salida limitada por llamada: un bloque muy comprimido no dispara la memoria
+    for chunk in _prepend(head, chunks):
+        if isinstance(decompressor, lzma.LZMADecompressor):
+            data = decompressor.decompress(chunk, CHUNK_SIZE)
+            while True:
+                if data:
+                    yield data
+                if decompressor.needs_input or decompressor.eof:
+                    break
+                data = decompressor.decompress(b'', CHUNK_SIZE)
+        else:
+            data = decompressor.decompress(chunk, CHUNK_SIZE)
+            while True:
+                if data:
+                    yield data
+                if not decompressor.unconsumed_tail:
+                    break
+                data = decompressor.decompress(decompressor.unconsumed_tail, CHUNK_SIZE)
+    if not isinstance(decompressor, lzma.LZMADecompressor):
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+    if not decompressor.eof:
+        raise EOFError("contenido comprimido truncado")
+
+
+def _prepend(first: bytes, rest: Iterator[bytes]) -> Iterator[bytes]:
+    if first:
+        yield first
+    yield from rest
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Dividir bloques de bytes en líneas de texto sin cargar el contenido entero"""
+    partial = b''
+    for chunk in chunks:
+        lines = (partial + chunk).split(b'\n')
+        partial = lines.pop()
+        for line in lines:
+            yield line.decode('utf-8', errors='replace')
+    if partial:
+        yield partial.decode('utf-8', errors='replace')
+
+
+def parse_hosts(lines: Iterable[str]) -> Iterator[str]:
+    """Candidatos de las entradas de bloqueo de una lista en formato hosts
+
+    Los nombres se devuelven sin validar; ver ``domain_validator.validate_stream``.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        parts = line.split()
+        # Si es entrada de bloqueo (0.0.0.0, 127.0.0.1), devolver el dominio
+        if len(parts) >= 2 and parts[0] in BLOCK_IPS:
+            yield parts[1]
+
+
+def parse_blocklist(lines: Iterable[str]) -> Iterator[str]:
+    """Candidatos de una lista de bloqueos en formato hosts, plano o con wildcards"""
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        # Formatos admitidos:
+        # 1. Formato hosts (0.0.0.0 domain.com o 127.0.0.1 domain.com)
+        # 2. Formato plano (solo dominio por línea)
+        # 3. Formato con wildcards (*.domain.com)
+        parts = line.split()
+
+        if len(parts) >= 2 and parts[0] in BLOCK_IPS:
+            domain = parts[1]
+        elif len(parts) == 1:
+            domain = parts[0]
+            # Eliminar wildcards al principio
+            if domain.startswith('*.'):
+                domain = domain[2:]
+        else:
+            continue
+
+        if domain:
+            yield domain
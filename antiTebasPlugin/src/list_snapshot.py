@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Instantáneas de las listas WARP
+Dominios e IPs publicados como una instantánea inmutable y versionada que
+se sustituye entera; vigilancia de cambios en los archivos de lista
+"""
+
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from compiled_index import source_signature
+from ip_ranges import IpRanges
+
+
+class ListSnapshot(NamedTuple):
+    """Listas en vigor: nunca se modifican, se publica una nueva versión
+
+    El monitor lee ``controller.lists`` una vez por consulta (una lectura de
+    atributo, atómica): ve la instantánea anterior o la nueva, nunca un
+    índice a medio construir, y no necesita ningún lock.
+    """
+    version: int
+    domains: object               # CompiledIndex, DomainIndex u OverlayIndex (solo lectura)
+    ips: IpRanges
+    updated: Optional[str] = None
+
+    def replace(self, **changes) -> 'ListSnapshot':
+        """Nueva instantánea con los cambios y la versión siguiente"""
+        return self._replace(version=self.version + 1, **changes)
+
+
+class ListWatcher:
+    """Detecta cambios en los archivos de lista por (mtime_ns, tamaño)
+
+    ``mark`` registra el estado actual (p. ej. justo después de que el
+    propio controlador escriba la lista) y ``changed`` indica si algún
+    archivo ha cambiado desde entonces: ediciones a mano, otra herramienta
+    o un archivo nuevo.
+    """
+
+    def __init__(self, paths: Iterable[Path]):
+        self.paths = [Path(p) for p in paths]
+        self._lock = threading.Lock()
+        self._signatures: Dict[Path, Optional[List[int]]] = {}
+        self.mark()
+
+    def mark(self):
+        with self._lock:
+            self._signatures = {path: source_signature(path) for path in self.paths}
+
+    def changed(self) -> List[Path]:
+        """Archivos modificados desde el último ``mark``"""
+        with self._lock:
+            return [path for path in self.paths if source_signature(path) != self._signatures.get(path)]
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Parser del log de Pi-hole
+Extrae consultas y respuestas de lotes de líneas y correlaciona consultas
+con sus líneas reply/cached (IPs y cadenas CNAME)
+"""
+
+import ipaddress
+import re
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+# "reply www.example.com is 1.2.3.4", "cached cdn.example.net is <CNAME>"
+# (con log-queries=extra la línea lleva además "<id> <cliente>/<puerto>")
+ANSWER_PATTERN = re.compile(r'\s(reply|cached|cached-stale)\s+(\S+)\s+is\s+(\S+)')
+
+CNAME_MARK = '<CNAME>'
+
+# Consulta o respuesta en cualquier punto de la línea (tras la fecha, el
+# proceso y, con log-queries=extra, el id y el cliente); sin ".*" inicial,
+# así ``finditer`` salta de una coincidencia a la siguiente en todo el lote
+EVENT_PATTERN = re.compile(
+    r' (?:query\[([A-Z]+)\] (\S+) from (\S+)'
+    r'|(?:reply|cached|cached-stale) (\S+) is (\S+))'
+)
+
+# Fecha al principio de la línea, en los dos formatos del log:
+#   dnsmasq (syslog): "Jan 10 12:00:00 dnsmasq[812]: query[A] a.com from 192.168.1.10"
+#   FTL:              "2024-01-10 12:00:00.123 [812/T900] query[A] a.com from 192.168.1.10"
+STAMP_PATTERN = re.compile(
+    r'(?:([A-Z][a-z]{2}) +(\d{1,2})|(\d{4}-\d\d-\d\d)) (\d\d:\d\d:\d\d(?:\.\d+)?)'
+)
+
+MONTHS = {name: i for i, name in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1)}
+
+
+class LogAnswer(NamedTuple):
+    """IP de respuesta vista en el log para un dominio WARP"""
+    root: str       # dominio consultado (o que inició la cadena CNAME)
+    name: str       # nombre que lleva la IP (puede ser el destino de un CNAME)
+    ip: str
+
+
+def parse_answer_line(line: str) -> Optional[Tuple[str, str]]:
+    """Extraer (nombre, valor) de una línea reply/cached, o None"""
+    match = ANSWER_PATTERN.search(line)
+    if match is None:
+        return None
+    return match.group(2), match.group(3)
+
+
+class LogQuery:
+    """Consulta DNS leída del log
+
+    Registro compacto (``__slots__``) que además se lee como el diccionario
+    de las demás fuentes (``query['domain']``, ``query.get('query_type')``).
+    ``timestamp`` es la fecha real de la línea en segundos epoch.
+    """
+
+    __slots__ = ('timestamp', 'query_type', 'domain', 'client_ip')
+
+    def __init__(self, timestamp: float, query_type: str, domain: str, client_ip: str):
+        self.timestamp = timestamp
+        self.query_type = query_type
+        self.domain = domain
+        self.client_ip = client_ip
+
+    def __getitem__(self, key: str):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, LogQuery):
+            return all(getattr(self, k) == getattr(other, k) for k in self.__slots__)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return (f"LogQuery({self.timestamp!r}, {self.query_type!r}, "
+                f"{self.domain!r}, {self.client_ip!r})")
+
+
+# Elemento de ``LogParser.parse``: consulta, respuesta (nombre, valor) o None
+# en lugar de una o varias líneas que no son ni lo uno ni lo otro
+LogEvent = Union[LogQuery, Tuple[str, str], None]
+
+
+class LogParser:
+    """Parser por lotes del log de dnsmasq/FTL
+
+    ``parse`` une el lote en un solo texto y lo recorre con ``finditer``
+    sobre ``EVENT_PATTERN``: una pasada del motor de expresiones regulares
+    por lote en lugar de una búsqueda por línea, y la fecha solo se lee en
+    las líneas de consulta. ``parse_line`` (una sola línea) descarta antes
+    con ``'query[' in line``, mucho más barato que la expresión regular.
+
+    La fecha de syslog no lleva año: se toma el actual (el anterior si el
+    mes es posterior al actual, p. ej. líneas de diciembre leídas en enero).
+    La conversión a epoch se cachea por hora y se reutiliza para las
+    líneas del mismo segundo.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time, cache_size: int = 512):
+        self.clock = clock
+        self.cache_size = cache_size
+        self._hours: Dict[Tuple[str, str, str], float] = {}
+        self._last_stamp: Optional[Tuple] = None
+        self._last_epoch = 0.0
+
+    def _hour_epoch(self, mon: Optional[str], day: Optional[str], date: Optional[str], hour: str) -> float:
+        """Epoch del inicio de la hora (hora local), calculado con mktime"""
+        if date is not None:
+            year, month, mday = int(date[:4]), int(date[5:7]), int(date[8:10])
+        else:
+            now = time.localtime(self.clock())
+            month, mday = MONTHS[mon], int(day)
+            year = now.tm_year - 1 if month > now.tm_mon else now.tm_year
+        return time.mktime((year, month, mday, int(hour), 0, 0, 0, 0, -1))
+
+    def timestamp(self, mon: Optional[str], day: Optional[str], date: Optional[str], clock: str) -> float:
+        """Fecha de una línea (``Jan 10`` o ``2024-01-10``, ``12:00:00[.123]``) en epoch"""
+        stamp = (mon, day, date, clock)
+        if stamp == self._last_stamp:
+            return self._last_epoch
+        key = (date or f"{mon} {day}", clock[:2])
+        base = self._hours.get(key)
+        if base is None:
+            if len(self._hours) >= self.cache_size:
+                self._hours.clear()
+            base = self._hours[key] = self._hour_epoch(mon, day, date, clock[:2])
+        epoch = base + int(clock[3:5]) * 60 + (float(clock[6:]) if len(clock) > 8 else int(clock[6:8]))
+        self._last_stamp = stamp
+        self._last_epoch = epoch
+        return epoch
+
+    def parse_line(self, line: str) -> Optional[LogQuery]:
+        """Consulta de una sola línea, o None"""
+        if 'query[' not in line:
+            return None
+        match = EVENT_PATTERN.search(line)
+        if match is None or match.group(1) is None:
+            return None
+        stamp = STAMP_PATTERN.match(line)
+        if stamp is None:
+            return None
+        qtype, domain, client = match.group(1, 2, 3)
+        return LogQuery(self.timestamp(*stamp.groups()), qtype, domain, client)
+
+    def parse(self, lines: Iterable[str]) -> List[LogEvent]:
+        """Consultas y respuestas de un lote de líneas, en orden
+
+        Las líneas intermedias que no son consulta ni respuesta se
+        sustituyen por un único None (cierran la cadena CNAME en curso de
+        ``ReplyCorrelator``). Como en ``parse_line``, una consulta sin fecha
+        no cuenta como consulta.
+        """
+        buffer = '\n'.join(lines)
+        size = len(buffer)
+        events: List[LogEvent] = []
+        append = events.append
+        rfind = buffer.rfind
+        find = buffer.find
+        stamp_match = STAMP_PATTERN.match
+        timestamp = self.timestamp
+        position = 0        # inicio de la línea siguiente a la última coincidencia
+        for match in EVENT_PATTERN.finditer(buffer):
+            start = match.start()
+            if start < position:
+                continue    # segunda coincidencia en la misma línea
+            line_start = rfind('\n', 0, start) + 1
+            if line_start > position:
+                append(None)
+            position = find('\n', start) + 1 or size + 1
+            qtype, domain, client, name, value = match.groups()
+            if qtype is None:
+                append((name, value))
+                continue
+            stamp = stamp_match(buffer, line_start)
+            if stamp is None:
+                append(None)
+                continue
+            append(LogQuery(timestamp(*stamp.groups()), qtype, domain, client))
+        if position <= size and size:
+            append(None)
+        return events
+
+    def queries(self, lines: Iterable[str]) -> List[LogQuery]:
+        """Solo las consultas de un lote de líneas"""
+        return [event for event in self.parse(lines) if type(event) is LogQuery]
+
+
+def is_ip(value: str) -> bool:
+    try:
+        ipaddress.ip_address(value)
+        return True
+    except ValueError:
+        return False
+
+
+class ReplyCorrelator:
+    """Asocia las líneas de respuesta de dnsmasq/FTL con consultas WARP
+
+    Cuando se detecta una consulta WARP se registra con ``track``. Las
+    líneas ``reply``/``cached`` posteriores para ese nombre producen las IPs
+    que recibió el cliente, sin volver a resolver. Si la respuesta es un
+    CNAME, dnsmasq escribe la cadena completa en líneas consecutivas
+    (``a is <CNAME>``, ``b is <CNAME>``, ``c is 1.2.3.4``); los nombres de
+    la cadena se registran como alias del dominio WARP original, de modo
+    que el hostname del CDN también se redirige.
+    """
+
+    def __init__(self, window: float = 10.0, alias_ttl: float = 3600.0, max_tracked: int = 4096):
+        self.window = window
+        self.alias_ttl = alias_ttl
+        self.max_tracked = max_tracked
+        # nombre consultado → (raíz, expira, respondido)
+        self._pending: "OrderedDict[str, Tuple[str, float, bool]]" = OrderedDict()
+        # destino CNAME → (raíz, expira)
+        self._aliases: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        # Estado de la cadena CNAME en curso
+        self._chain_root: Optional[str] = None
+        self._chain_name: Optional[str] = None
+        self._chain_open = False
+
+    def track(self, domain: str, root: Optional[str] = None, now: Optional[float] = None):
+        """Registrar una consulta WARP a la espera de su respuesta"""
+        now = time.monotonic() if now is None else now
+        self._pending[domain] = (root or domain, now + self.window, False)
+        self._pending.move_to_end(domain)
+        while len(self._pending) > self.max_tracked:
+            self._pending.popitem(last=False)
+
+    def alias_root(self, name: str, now: Optional[float] = None) -> Optional[str]:
+        """Dominio WARP del que ``name`` es destino CNAME, si sigue vigente"""
+        entry = self._aliases.get(name)
+        if entry is None:
+            return None
+        root, expires = entry
+        if expires < (time.monotonic() if now is None else now):
+            del self._aliases[name]
+            return None
+        return root
+
+    def _root_for(self, name: str, now: float) -> Optional[str]:
+        entry = self._pending.get(name)
+        if entry is not None:
+            root, expires, _answered = entry
+            self._pending[name] = (root, expires, True)
+            return root
+        return self.alias_root(name, now)
+
+    def _add_alias(self, name: str, root: str, now: float):
+        self._aliases[name] = (root, now + self.alias_ttl)
+        self._aliases.move_to_end(name)
+        while len(self._aliases) > self.max_tracked:
+            self._aliases.popitem(last=False)
+
+    def feed(self, line: str, now: Optional[float] = None) -> Optional[LogAnswer]:
+        """Procesar una línea del log, devolver la IP de respuesta si es WARP"""
+        return self.feed_answer(parse_answer_line(line), now)
+
+    def feed_answer(self, parsed: Optional[Tuple[str, str]], now: Optional[float] = None) -> Optional[LogAnswer]:
+        """Como ``feed`` con la línea ya parseada: (nombre, valor), o None si no es respuesta"""
+        if parsed is None:
+            # Cualquier otra línea cierra la cadena CNAME en curso
+            self._chain_root = None
+            return None
+
+        now = time.monotonic() if now is None else now
+        name, value = parsed
+
+        root = self._root_for(name, now)
+        if root is None and self._chain_root is not None:
+            # Continuación de la cadena: tras un CNAME, o más IPs del mismo nombre
+            if self._chain_open or name == self._chain_name:
+                root = self._chain_root
+                self._add_alias(name, root, now)
+
+        if root is None:
+            self._chain_root = None
+            return None
+
+        self._chain_root = root
+        self._chain_name = name
+        self._chain_open = value == CNAME_MARK
+
+        if self._chain_open or not is_ip(value):
+            return None
+        return LogAnswer(root, name, value)
+
+    def expire(self, now: Optional[float] = None) -> List[str]:
+        """Descartar consultas sin respuesta, devolver los dominios que no la tuvieron"""
+        now = time.monotonic() if now is None else now
+        unanswered = []
+        while self._pending:
+            domain, (root, expires, answered) = next(iter(self._pending.items()))
+            if expires > now:
+                break
+            del self._pending[domain]
+            if not answered:
+                unanswered.append(domain)
+        return unanswered
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Lector incremental del log de Pi-hole
+Lectura por bloques, despertar por inotify y tolerancia a rotación/truncado
+"""
+
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import struct
+import time
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+# Constantes de <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def load_inotify():
+    """Cargar inotify desde libc, o None si no está disponible"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class InotifyWatcher:
+    """Espera cambios en un archivo vigilando su directorio con inotify
+
+    Vigilar el directorio (y no el archivo) permite detectar también la
+    creación del archivo nuevo cuando logrotate lo sustituye.
+    """
+
+    def __init__(self, path: Path, libc):
+        self.name = os.fsencode(path.name)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_CREATE | IN_MOVED_TO
+        if libc.inotify_add_watch(self.fd, os.fsencode(path.parent), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch falló en {path.parent}")
+
+    def wait(self, timeout: float) -> bool:
+        """Esperar un evento sobre el archivo, devolver True si lo hubo"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select([self.fd], [], [], remaining)
+            if not readable:
+                return False
+            if self._drain():
+                return True
+
+    def _drain(self) -> bool:
+        """Leer los eventos pendientes, indicar si alguno es del archivo"""
+        relevant = False
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return False
+        pos = 0
+        while pos + EVENT_HEADER.size <= len(data):
+            _wd, _mask, _cookie, length = EVENT_HEADER.unpack_from(data, pos)
+            pos += EVENT_HEADER.size
+            name = data[pos:pos + length].rstrip(b'\0')
+            pos += length
+            if name == self.name:
+                relevant = True
+        return relevant
+
+    def close(self):
+        os.close(self.fd)
+
+
+class LogTailer:
+    """Seguir un archivo de log que crece, devolviendo líneas en lotes
+
+    - Lee bloques grandes y los divide en líneas de una vez.
+    - Detecta rotación (cambio de inodo) y truncado (tamaño menor que la
+      posición): termina el archivo anterior y sigue con el nuevo.
+    - Guarda inodo y posición en ``state_file`` para continuar tras un
+      reinicio sin perder ni repetir líneas.
+    - Despierta con inotify; si no está disponible, consulta cada
+      ``poll_interval`` segundos.
+    """
+
+    def __init__(self, path: Path, state_file: Optional[Path] = None, block_size: int = 65536,
+                 max_batch_bytes: int = 1048576, poll_interval: float = 0.25,
+                 state_interval: float = 5.0, use_inotify: bool = True,
+                 logger: Optional[logging.Logger] = None):
+        self.path = Path(path)
+        self.state_file = Path(state_file) if state_file else None
+        self.block_size = block_size
+        self.max_batch_bytes = max_batch_bytes
+        self.poll_interval = poll_interval
+        self.state_interval = state_interval
+        self.use_inotify = use_inotify
+        self.logger = logger or logging.getLogger('AntiTebas')
+
+        self.file = None
+        self.inode = None
+        self.offset = 0          # posición tras la última línea completa entregada
+        self._partial = b''
+        self._watcher = None
+        self._last_state_save = 0.0
+        self._missing_logged = False
+        self._caught_up_at = time.time()   # última vez que se leyó hasta el final
+
+    # ------------------------------------------------------------------
+    # Estado persistente
+    # ------------------------------------------------------------------
+
+    def load_state(self) -> Optional[dict]:
+        if not self.state_file or not self.state_file.exists():
+            return None
+        try:
+            return json.loads(self.state_file.read_text())
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"⚠️ Estado del lector ilegible ({self.state_file}): {e}")
+            return None
+
+    def save_state(self):
+        if not self.state_file or self.inode is None:
+            return
+        try:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.state_file.with_suffix('.tmp')
+            tmp.write_text(json.dumps({'inode': self.inode, 'offset': self.offset}))
+            os.replace(tmp, self.state_file)
+            self._last_state_save = time.monotonic()
+        except OSError as e:
+            self.logger.warning(f"⚠️ No se pudo guardar el estado del lector: {e}")
+
+    # ------------------------------------------------------------------
+    # Apertura y rotación
+    # ------------------------------------------------------------------
+
+    def open(self, start_at_end: bool = True) -> bool:
+        """Abrir el log retomando la posición guardada si sigue siendo válida"""
+        try:
+            self.file = open(self.path, 'rb')
+        except FileNotFoundError:
+            if not self._missing_logged:
+                self.logger.warning(f"⚠️ Archivo de log no encontrado: {self.path} - esperando")
+                self._missing_logged = True
+            return False
+        self._missing_logged = False
+
+        st = os.fstat(self.file.fileno())
+        self.inode = st.st_ino
+        self._partial = b''
+
+        state = self.load_state()
+        if state and state.get('inode') == st.st_ino and 0 <= state.get('offset', -1) <= st.st_size:
+            self.offset = state['offset']
+            self.logger.info(f"Retomando {self.path} en el byte {self.offset}")
+        elif state or not start_at_end:
+            # El archivo cambió mientras estábamos parados: leerlo entero
+            self.offset = 0
+        else:
+            self.offset = st.st_size
+
+        self.file.seek(self.offset)
+        if self.use_inotify and self._watcher is None:
+            libc = load_inotify()
+            if libc is not None:
+                try:
+                    self._watcher = InotifyWatcher(self.path, libc)
+                except OSError as e:
+                    self.logger.warning(f"⚠️ inotify no disponible ({e}) - usando sondeo")
+        return True
+
+    def _check_rotation(self) -> bool:
+        """Detectar rotación o truncado; devolver True si se cambió de archivo"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+
+        if st.st_ino != self.inode:
+            try:
+                new_file = open(self.path, 'rb')
+            except FileNotFoundError:
+                return False
+            self.logger.info(f"🔄 Log rotado: {self.path} (inodo {self.inode} → {st.st_ino})")
+            self.file.close()
+            self.file = new_file
+            self.inode = os.fstat(self.file.fileno()).st_ino
+            self.offset = 0
+            self._partial = b''
+            return True
+
+        if st.st_size < self.offset + len(self._partial):
+            self.logger.info(f"✂️ Log truncado: {self.path} - leyendo desde el principio")
+            self.file.seek(0)
+            self.offset = 0
+            self._partial = b''
+            return True
+
+        return False
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def _read_available(self) -> List[str]:
+        """Leer lo disponible en el archivo abierto (hasta max_batch_bytes)"""
+        chunks = [self._partial] if self._partial else []
+        read = 0
+        while read < self.max_batch_bytes:
+            block = self.file.read(self.block_size)
+            if not block:
+                self._caught_up_at = time.time()
+                break
+            chunks.append(block)
+            read += len(block)
+
+        if not read:
+            return []
+
+        data = b''.join(chunks)
+        end = data.rfind(b'\n') + 1
+        self._partial = data[end:]
+        if not end:
+            return []
+
+        # data empieza en self.offset (inicio de la línea parcial anterior)
+        self.offset += end
+        return data[:end].decode('utf-8', errors='replace').splitlines()
+
+    def read_lines(self) -> List[str]:
+        """Devolver las líneas completas nuevas (lista vacía si no hay)"""
+        if self.file is None and not self.open():
+            return []
+
+        lines = self._read_available()
+        if not lines and self._check_rotation():
+            # Terminar de leer lo que quede del archivo nuevo
+            lines = self._read_available()
+
+        if self.state_file and time.monotonic() - self._last_state_save >= self.state_interval:
+            self.save_state()
+        return lines
+
+    def lag(self) -> Tuple[int, float]:
+        """Bytes escritos aún sin procesar y segundos desde que se estaba al día"""
+        if self.file is None:
+            return 0, 0.0
+        try:
+            size = os.fstat(self.file.fileno()).st_size
+        except (OSError, ValueError):
+            return 0, 0.0
+        pending = max(0, size - self.offset)
+        if not pending:
+            return 0, 0.0
+        return pending, max(0.0, time.time() - self._caught_up_at)
+
+    def wait(self, timeout: Optional[float] = None):
+        """Esperar nuevos datos (inotify) o el intervalo de sondeo"""
+        timeout = self.poll_interval if timeout is None else timeout
+        if self._watcher is not None:
+            self._watcher.wait(timeout)
+        else:
+            time.sleep(timeout)
+
+    def batches(self, running: Callable[[], bool], idle_timeout: float = 1.0) -> Iterator[List[str]]:
+        """Generar lotes de líneas mientras ``running()`` sea cierto
+
+        Produce una lista vacía en cada espera sin datos, para que el
+        consumidor pueda hacer tareas periódicas.
+        """
+        while running():
+            lines = self.read_lines()
+            yield lines
+            if not lines:
+                self.wait(idle_timeout if self._watcher is not None else None)
+
+    def close(self):
+        self.save_state()
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Pipeline de procesamiento por etapas
+Etapas con hilos propios conectadas por colas acotadas
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+# Política de desbordamiento de cada etapa
+OVERFLOW_BLOCK = 'block'   # esperar hueco: contrapresión hacia la etapa anterior
+OVERFLOW_DROP = 'drop'     # descartar el elemento nuevo
+
+
+class Stage:
+    """Etapa del pipeline: cola acotada + N hilos que ejecutan ``handler``
+
+    Con ``key`` la etapa agrupa trabajo repetido: si ya hay un elemento con
+    la misma clave en cola, el nuevo se descarta como coalescido.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], None], workers: int = 1,
+                 queue_size: int = 1000, overflow: str = OVERFLOW_DROP,
+                 key: Optional[Callable[[Any], Hashable]] = None,
+                 logger: Optional[logging.Logger] = None):
+        if overflow not in (OVERFLOW_BLOCK, OVERFLOW_DROP):
+            raise ValueError(f"Política de desbordamiento desconocida: {overflow}")
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.overflow = overflow
+        self.key = key
+        self.logger = logger or logging.getLogger('AntiTebas')
+        self.queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self._queued_keys = set()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        self._last_drop_log = 0.0
+
+        self.stats = {
+            'processed': 0,
+            'dropped': 0,
+            'coalesced': 0,
+            'errors': 0,
+            'max_depth': 0,
+        }
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def snapshot(self) -> Dict[str, int]:
+        """Copia coherente de los contadores (se actualizan desde varios hilos)"""
+        with self._lock:
+            return dict(self.stats)
+
+    def put(self, item: Any) -> bool:
+        """Encolar un elemento según la política de la etapa"""
+        item_key = None
+        if self.key is not None:
+            item_key = self.key(item)
+            with self._lock:
+                if item_key in self._queued_keys:
+                    self.stats['coalesced'] += 1
+                    return False
+                self._queued_keys.add(item_key)
+
+        try:
+            if self.overflow == OVERFLOW_BLOCK:
+                self.queue.put((item_key, item))
+            else:
+                self.queue.put_nowait((item_key, item))
+        except queue.Full:
+            with self._lock:
+                self._queued_keys.discard(item_key)
+                self.stats['dropped'] += 1
+                dropped = self.stats['dropped']
+            self._log_drop(dropped)
+            return False
+
+        depth = self.queue.qsize()
+        with self._lock:
+            if depth > self.stats['max_depth']:
+                self.stats['max_depth'] = depth
+        return True
+
+    def _log_drop(self, dropped: int):
+        now = time.monotonic()
+        if now - self._last_drop_log >= 10:
+            self._last_drop_log = now
+            self.logger.warning(f"⚠️ Etapa {self.name} saturada: {dropped} elementos descartados")
+
+    def _worker(self):
+        while self._running:
+            try:
+                item_key, item = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item_key is not None:
+                with self._lock:
+                    self._queued_keys.discard(item_key)
+            counter = 'errors'
+            try:
+                self.handler(item)
+                counter = 'processed'
+            except Exception as e:
+                self.logger.error(f"Error en etapa {self.name}: {e}")
+            finally:
+                with self._lock:
+                    self.stats[counter] += 1
+                self.queue.task_done()
+
+    def start(self):
+        self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 2.0):
+        self._running = False
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+
+class Pipeline:
+    """Conjunto de etapas con nombre; los handlers pasan trabajo con ``submit``"""
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger('AntiTebas')
+        self.stages: Dict[str, Stage] = {}
+
+    def add_stage(self, name: str, handler: Callable[[Any], None], **kwargs) -> Stage:
+        stage = Stage(name, handler, logger=self.logger, **kwargs)
+        self.stages[name] = stage
+        return stage
+
+    def submit(self, name: str, item: Any) -> bool:
+        return self.stages[name].put(item)
+
+    def depths(self) -> Dict[str, int]:
+        """Profundidad actual de cada cola"""
+        return {name: stage.depth for name, stage in self.stages.items()}
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: dict(stage.snapshot(), depth=stage.depth, workers=stage.workers)
+            for name, stage in self.stages.items()
+        }
+
+    def join(self, timeout: float = 5.0) -> bool:
+        """Esperar a que todas las colas se vacíen (en orden de etapas)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if all(stage.queue.unfinished_tasks == 0 for stage in self.stages.values()):
+                return True
+            time.sleep(0.01)
+        return False
+
+    def start(self):
+        for stage in self.stages.values():
+            stage.start()
+
+    def stop(self):
+        for stage in self.stages.values():
+            stage.stop()
@@ -4,23 +4,42 @@ AntiTebasPlugin - Controlador Principal
 Gestiona listas, detecta consultas y coordina redirección WARP
 """
 
-import re
 import sys
 import time
 import logging
-import requests
 import threading
-import subprocess
 import socket
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Set, Optional
+from typing import Dict, Iterable, Iterator, Set, Optional
+
+from compiled_index import compile_index, load_index
+from domain_index import DomainIndex, OverlayIndex, read_overlay, write_overlay
+from dns_resolver import ResolverPool
+from control_socket import ControlServer, DEFAULT_SOCKET, format_response
+from dns_interceptor import DnsInterceptor, QueryNotifier, check_manager, manager_url
+from ip_ranges import IpRanges
+from log_parser import LogAnswer, LogParser, LogQuery, ReplyCorrelator
+from metrics import MetricsRegistry, MetricsServer
+from list_downloader import (ListDownloader, split_urls, STATUS_UPDATED, STATUS_NOT_MODIFIED,
+                             STATUS_UNCHANGED, STATUS_STALE)
+from domain_validator import is_valid_domain, normalize_domain, validate_stream
+from list_parser import parse_hosts, parse_blocklist
+from list_snapshot import ListSnapshot, ListWatcher
+from pipeline import Pipeline, OVERFLOW_BLOCK, OVERFLOW_DROP
+from query_dedup import QueryDeduplicator
+from query_sources import QuerySource, LogQuerySource, FtlQuerySource
+from redirect_backends import RedirectBackend, IptablesBackend, create_backend
+from redirect_table import RedirectTable
+from warmup import WarmupScheduler, parse_schedule
 
 # Configuración
 PLUGIN_DIR = Path("/etc/pihole/plugins/warp")
 CONFIG_FILE = PLUGIN_DIR / "warp-config.conf"
 QUERY_LOG = Path("/var/log/pihole.log")
 FTL_LOG = Path("/var/log/pihole-FTL.log")
+FTL_DB = Path("/etc/pihole/pihole-FTL.db")
 
 class AntiTebasController:
     """Controlador principal AntiTebas integrado en Pi-hole"""
@@ -28,15 +47,74 @@ class AntiTebasController:
     def __init__(self):
         self.config = self.load_config()
         self.setup_logging()
-        self.warp_domains = set()
-        self.warp_ips = set()
-        self.resolved_ips = {}  # Cache dominio → IP
+        # Listas en vigor: instantánea inmutable que se sustituye entera
+        self.lists = ListSnapshot(0, DomainIndex(), IpRanges())
         self.warp_proxy_host = self.config['WARP_PROXY_HOST']
         self.warp_proxy_port = int(self.config['WARP_PROXY_PORT'])
         self.running = False
+        self.pipeline = None
         
-        # Cargar listas locales
-        self.load_warp_lists()
+        # Ventana de deduplicación por (dominio, tipo) delante de la clasificación
+        self.dedup = QueryDeduplicator(
+            window=float(self.config['DEDUP_WINDOW']),
+            max_entries=int(self.config['DEDUP_MAX_ENTRIES'])
+        )
+        # Primera respuesta por dominio y TTL para la métrica de cobertura
+        self.coverage_window = QueryDeduplicator(
+            window=float(self.config['RESOLVER_DEFAULT_TTL']),
+            max_entries=int(self.config['DEDUP_MAX_ENTRIES'])
+        )
+        
+        # Backend de redirección (ipset, iptables)
+        self.redirect_backend = self.create_redirect_backend(self.config['REDIRECT_BACKEND'])
+        
+        # IPs redirigidas con última aparición y TTL: caducan y la tabla está acotada
+        self.redirect_table = RedirectTable(
+            max_size=int(self.config['REDIRECT_MAX_ENTRIES']),
+            min_ttl=int(self.config['REDIRECT_MIN_TTL']),
+            max_ttl=int(self.config['REDIRECT_MAX_TTL'])
+        )
+        
+        # Resolución DNS fuera del hilo del monitor (caché TTL/LRU acotada)
+        self.resolver = ResolverPool(
+            workers=int(self.config['RESOLVER_WORKERS']),
+            cache_size=int(self.config['RESOLVER_CACHE_SIZE']),
+            default_ttl=int(self.config['RESOLVER_DEFAULT_TTL']),
+            negative_ttl=int(self.config['RESOLVER_NEGATIVE_TTL']),
+            logger=self.logger
+        )
+        
+        # Respuestas (IPs y CNAME) tomadas del propio log de Pi-hole
+        self.answer_source = self.config['ANSWER_SOURCE'].strip().lower()
+        
+        # Origen de las consultas: log de Pi-hole o base de datos de FTL
+        self.query_source_name = self.config['QUERY_SOURCE'].strip().lower()
+        if self.query_source_name not in ('log', 'ftl'):
+            self.logger.warning(f"⚠️ QUERY_SOURCE desconocido: {self.query_source_name} - usando log")
+            self.query_source_name = 'log'
+        if self.query_source_name == 'ftl' and self.answer_source == 'log':
+            # La base de FTL no guarda las IPs de respuesta
+            self.logger.info("QUERY_SOURCE=ftl: las respuestas se obtienen resolviendo (ANSWER_SOURCE=resolve)")
+            self.answer_source = 'resolve'
+        self.correlator = ReplyCorrelator(window=float(self.config['ANSWER_WAIT']))
+        self.log_parser = LogParser()
+        
+        # Descarga de listas externas (paralela, condicional y con caché)
+        self.downloader = ListDownloader(
+            Path(self.config['LIST_CACHE_DIR']),
+            workers=int(self.config['DOWNLOAD_WORKERS']),
+            timeout=float(self.config['DOWNLOAD_TIMEOUT']),
+            logger=self.logger
+        )
+        
+        # Notificación de consultas WARP al traffic manager (si está configurado)
+        self.notifier = self.create_notifier()
+        # El monitor principal solo notifica si se pide: el modo interceptor
+        # notifica las mismas líneas del log y los eventos llegarían dos veces
+        self.notify_from_monitor = self.config['NOTIFY_FROM_MONITOR'].lower() == 'true'
+        
+        # Pre-resolución de dominios WARP para redirigir antes de la primera conexión
+        self.warmup = self.create_warmup()
         
         # Estadísticas
         self.stats = {
@@ -45,6 +123,210 @@ class AntiTebasController:
             'last_update': None
         }
         
+        # Cargar listas locales (índice compilado proyectado con mmap si sigue vigente);
+        # lists_lock solo serializa a quienes escriben, el monitor no lo toma
+        self.lists_lock = threading.RLock()
+        self.list_watcher = ListWatcher([Path(self.config['DOMAIN_LIST_FILE']), Path(self.config['IP_LIST_FILE']),
+                                         Path(self.config['MANUAL_DOMAINS_FILE'])])
+        self.load_warp_lists()
+        
+        # Métricas internas (servidas en /metrics mientras el monitor corre)
+        self.metrics = MetricsRegistry()
+        self.metrics_server = None
+        self.query_source = None
+        self.setup_metrics()
+        
+        # Socket de control para warp-domains (test/add/remove/stats/reload/flush)
+        self.control_server = None
+        
+    def setup_metrics(self):
+        """Registrar contadores, histogramas y gauges del monitor"""
+        m = self.metrics
+        self.m_lines_read = m.counter('source_items_read_total', 'Líneas del log o filas de FTL leídas')
+        self.m_queries = m.counter('queries_parsed_total', 'Consultas DNS parseadas')
+        self.m_warp_queries = m.counter('warp_queries_total', 'Consultas a dominios WARP')
+        self.m_deduped = m.counter('queries_deduplicated_total',
+                                   'Consultas WARP repetidas dentro de la ventana de deduplicación')
+        self.m_log_answers = m.counter('log_answers_total', 'IPs de respuesta tomadas del log')
+        self.m_coverage = m.counter('redirect_coverage_total',
+                                    'Respuestas WARP cuyas IPs ya estaban redirigidas (hit) o no (miss) '
+                                    'al llegar al cliente', ['result'])
+        self.m_redirects = m.counter('redirect_changes_total', 'Cambios de IPs aplicados en el backend')
+        self.m_in_ranges = m.counter('redirect_ips_in_ranges_total',
+                                     'IPs resueltas ya cubiertas por un rango de IP_LIST_FILE (sin regla propia)')
+        self.m_stage_seconds = m.histogram('stage_duration_seconds',
+                                           'Duración por lote (classify) o elemento (resolve, apply)', ['stage'])
+        self.m_dns_seconds = m.histogram('dns_lookup_seconds', 'Duración de las resoluciones DNS (sin caché)')
+        self.m_apply_seconds = m.histogram('rule_apply_seconds', 'Duración de cada aplicación en lote de reglas')
+        self.m_list_fetch_seconds = m.histogram('list_fetch_seconds', 'Descarga y parseo de cada lista',
+                                                ['kind', 'status'])
+        self.m_list_update_seconds = m.histogram('list_update_seconds', 'Actualización completa de las listas')
+        self.m_list_domains = m.gauge('list_domains', 'Dominios de la última descarga por tipo de lista', ['kind'])
+        
+        m.gauge('warp_domains', 'Dominios WARP en el índice', func=lambda: len(self.warp_domains))
+        m.gauge('list_version', 'Versión de la instantánea de listas en vigor', func=lambda: self.lists.version)
+        m.gauge('redirect_rules', 'Reglas de redirección instaladas', func=lambda: self.redirect_backend.rule_count())
+        m.gauge('redirect_ips', 'IPs redirigidas a WARP', func=lambda: len(self.redirect_backend.installed))
+        m.gauge('redirect_networks', 'Rangos CIDR redirigidos a WARP', func=lambda: len(self.redirect_backend.networks))
+        m.gauge('redirect_pending', 'IPs pendientes de aplicar', func=lambda: len(self.redirect_backend.pending))
+        m.gauge('redirect_tracked', 'IPs en la tabla de redirecciones', func=lambda: len(self.redirect_table))
+        m.gauge('redirect_aged', 'IPs retiradas por caducidad o por tamaño de la tabla', ['reason'],
+                func=lambda: dict(self.redirect_table.stats))
+        m.gauge('source_lag', 'Retraso de la lectura respecto al origen', ['unit'],
+                func=lambda: self.query_source.lag() if self.query_source else {})
+        m.gauge('pipeline_queue_depth', 'Elementos en cola por etapa', ['stage'],
+                func=lambda: self.pipeline.depths() if self.pipeline else {})
+        m.gauge('pipeline_dropped', 'Elementos descartados por cola llena', ['stage'],
+                func=lambda: {name: s['dropped'] for name, s in self.pipeline.stats().items()} if self.pipeline else {})
+        m.gauge('notify_events', 'Eventos enviados, agrupados, descartados y con error al traffic manager',
+                ['event'], func=lambda: dict(self.notifier.stats) if self.notifier else {})
+        m.gauge('notify_pending', 'Eventos pendientes de enviar al traffic manager',
+                func=lambda: self.notifier.pending() if self.notifier else 0)
+        m.gauge('warmup_events', 'Dominios precalentados: encolados, resueltos, sin IPs y descartados',
+                ['event'], func=lambda: dict(self.warmup.stats) if self.warmup else {})
+        m.gauge('warmup_pending', 'Dominios pendientes de precalentar',
+                func=lambda: self.warmup.pending() if self.warmup else 0)
+        m.gauge('dedup_entries', 'Entradas en la ventana de deduplicación', func=lambda: len(self.dedup))
+        m.gauge('resolver_cache_entries', 'Entradas en la caché DNS', func=lambda: len(self.resolver))
+        m.gauge('resolver_events', 'Aciertos, fallos, agrupaciones y errores de la caché DNS', ['event'],
+                func=lambda: dict(self.resolver.stats))
+        
+        # Medir solo las resoluciones reales (los aciertos de caché no llegan aquí)
+        resolve_func = self.resolver.resolve_func
+        
+        def timed_resolve(domain):
+            with self.m_dns_seconds.time():
+                return resolve_func(domain)
+        
+        self.resolver.resolve_func = timed_resolve
+    
+    def start_metrics_server(self):
+        """Abrir el endpoint HTTP local de métricas si está habilitado"""
+        if self.config['METRICS_ENABLED'].lower() != 'true':
+            return
+        self.metrics_server = MetricsServer(
+            self.metrics,
+            host=self.config['METRICS_HOST'],
+            port=int(self.config['METRICS_PORT']),
+            logger=self.logger
+        )
+        if not self.metrics_server.start():
+            self.metrics_server = None
+    
+    def create_notifier(self) -> Optional[QueryNotifier]:
+        """Notificador del traffic manager; None si TRAFFIC_MANAGER_HOST está vacío"""
+        host = self.config['TRAFFIC_MANAGER_HOST'].strip()
+        if not host:
+            return None
+        return QueryNotifier(
+            manager_url(host, int(self.config['TRAFFIC_MANAGER_PORT'])),
+            timeout=float(self.config['NOTIFY_TIMEOUT']),
+            interval=float(self.config['NOTIFY_INTERVAL']),
+            batch_size=int(self.config['NOTIFY_BATCH_SIZE']),
+            spill_size=int(self.config['NOTIFY_SPILL_SIZE']),
+            logger=self.logger
+        )
+    
+    def create_warmup(self) -> Optional[WarmupScheduler]:
+        """Precalentamiento de redirecciones; None si WARMUP_ENABLED no es true"""
+        if self.config['WARMUP_ENABLED'].lower() != 'true':
+            return None
+        windows, invalid = parse_schedule(self.config['WARMUP_SCHEDULE'])
+        if invalid:
+            self.logger.warning(f"⚠️ {invalid} entradas no válidas en WARMUP_SCHEDULE ignoradas")
+        return WarmupScheduler(
+            lambda domain: self.resolver.lookup(domain, timeout=10),
+            self.queue_redirect,
+            concurrency=int(self.config['WARMUP_CONCURRENCY']),
+            rate=float(self.config['WARMUP_RATE']),
+            hot_size=int(self.config['WARMUP_HOT_SIZE']),
+            refresh_interval=float(self.config['WARMUP_REFRESH_INTERVAL']),
+            logger=self.logger,
+            windows=windows,
+            lead=float(self.config['WARMUP_LEAD']),
+            on_window=self.schedule_warmup
+        )
+    
+    def schedule_warmup(self) -> int:
+        """Encolar los dominios calientes y las primeras entradas de la lista"""
+        if self.warmup is None:
+            return 0
+        limit = int(self.config['WARMUP_LIST_LIMIT'])
+        queued = self.warmup.schedule(self.warmup.hot_domains())
+        queued += self.warmup.schedule(islice(self.apex_domains(), limit))
+        if queued:
+            self.logger.info(f"🔥 {queued} dominios WARP encolados para precalentar redirecciones")
+        return queued
+    
+    def apex_domains(self) -> Iterator[str]:
+        """Entradas de la lista sin ningún dominio padre también en la lista"""
+        domains = self.lists.domains
+        for domain in domains:
+            pos = domain.find('.')
+            while pos != -1 and domain[pos + 1:] not in domains:
+                pos = domain.find('.', pos + 1)
+            if pos == -1:
+                yield domain
+    
+    def control_handlers(self):
+        """Operaciones del socket de control"""
+        return {
+            'test': self.control_test,
+            'add': self.control_add,
+            'remove': self.control_remove,
+            'list': self.control_list,
+            'stats': self.control_stats,
+            'reload': self.control_reload,
+            'flush': self.control_flush,
+        }
+    
+    def control_test(self, request: Dict) -> Dict:
+        domain = request.get('domain', '')
+        match = self.warp_domains.match(normalize_domain(domain) or domain)
+        return {'domain': domain, 'warp': match is not None, 'match': match}
+    
+    def control_add(self, request: Dict) -> Dict:
+        domain = request.get('domain', '')
+        ok = self.add_domain(domain)
+        return {'ok': ok, 'domain': normalize_domain(domain) or domain}
+    
+    def control_remove(self, request: Dict) -> Dict:
+        domain = request.get('domain', '')
+        ok = self.remove_domain(domain)
+        return {'ok': ok, 'domain': normalize_domain(domain) or domain}
+    
+    def control_list(self, request: Dict) -> Dict:
+        """Dominios en vigor: la lista con las altas y bajas manuales aplicadas"""
+        return {'domains': sorted(self.warp_domains)}
+    
+    def control_stats(self, request: Dict) -> Dict:
+        return dict(
+            self.stats,
+            domains=len(self.warp_domains),
+            list_version=self.lists.version,
+            redirect_rules=self.redirect_backend.rule_count(),
+            redirect_ips=len(self.redirect_backend.installed),
+            redirect_networks=len(self.redirect_backend.networks),
+            redirect_pending=len(self.redirect_backend.pending),
+            queues=self.pipeline.depths() if self.pipeline else {},
+            lag=self.query_source.lag() if self.query_source else {},
+            resolver=dict(self.resolver.stats),
+        )
+    
+    def control_reload(self, request: Dict) -> Dict:
+        self.load_warp_lists()
+        return {'domains': len(self.warp_domains), 'version': self.lists.version}
+    
+    def control_flush(self, request: Dict) -> Dict:
+        return {'applied': self.flush_redirects()}
+    
+    def start_control_server(self):
+        """Atender el socket de control mientras el monitor corre"""
+        self.control_server = ControlServer(Path(self.config['CONTROL_SOCKET']), self.control_handlers(),
+                                            logger=self.logger)
+        if not self.control_server.start():
+            self.control_server = None
+    
     def load_config(self) -> Dict[str, str]:
         """Cargar configuración del plugin"""
         config = {}
@@ -69,9 +351,60 @@ class AntiTebasController:
         config.setdefault('LOG_LEVEL', 'INFO')
         config.setdefault('DOMAIN_LIST_FILE', str(PLUGIN_DIR / 'lists' / 'warp-domains.txt'))
         config.setdefault('IP_LIST_FILE', str(PLUGIN_DIR / 'lists' / 'warp-ips.txt'))
+        config.setdefault('MANUAL_DOMAINS_FILE',
+                          str(Path(config['DOMAIN_LIST_FILE']).with_name('warp-domains-manual.txt')))
         config.setdefault('DOMAIN_LISTS_URLS', '')
         config.setdefault('SPAIN_BLOCKLIST_URLS', '')
         config.setdefault('UPDATE_INTERVAL', '3600')
+        config.setdefault('REDIRECT_BACKEND', 'ipset')
+        config.setdefault('REDIRECT_MAX_ENTRIES', '65536')
+        config.setdefault('REDIRECT_MIN_TTL', '300')
+        config.setdefault('REDIRECT_MAX_TTL', '86400')
+        config.setdefault('REDIRECT_SWEEP_INTERVAL', '30')
+        config.setdefault('REDIRECT_SWEEP_BATCH', '1000')
+        config.setdefault('DEDUP_WINDOW', '5')
+        config.setdefault('DEDUP_MAX_ENTRIES', '50000')
+        config.setdefault('REDIRECT_PORT', '8080')
+        config.setdefault('REDIRECT_FLUSH_INTERVAL', '0.5')
+        config.setdefault('RESOLVER_WORKERS', '4')
+        config.setdefault('RESOLVER_CACHE_SIZE', '10000')
+        config.setdefault('RESOLVER_DEFAULT_TTL', '300')
+        config.setdefault('RESOLVER_NEGATIVE_TTL', '30')
+        config.setdefault('ANSWER_SOURCE', 'log')
+        config.setdefault('ANSWER_WAIT', '10')
+        config.setdefault('TAIL_STATE_FILE', str(PLUGIN_DIR / 'state' / 'pihole-log.offset'))
+        config.setdefault('TAIL_POLL_INTERVAL', '0.25')
+        config.setdefault('QUERY_SOURCE', 'log')
+        config.setdefault('FTL_DB_FILE', str(FTL_DB))
+        config.setdefault('FTL_STATE_FILE', str(PLUGIN_DIR / 'state' / 'ftl.last-id'))
+        config.setdefault('FTL_POLL_INTERVAL', '1')
+        config.setdefault('FTL_BATCH_SIZE', '1000')
+        config.setdefault('LIST_CACHE_DIR', str(PLUGIN_DIR / 'cache' / 'lists'))
+        config.setdefault('LIST_WATCH_INTERVAL', '5')
+        config.setdefault('LIST_SNAPSHOT_FILE', str(Path(config['LIST_CACHE_DIR']) / 'warp-domains.idx'))
+        config.setdefault('DOWNLOAD_WORKERS', '4')
+        config.setdefault('DOWNLOAD_TIMEOUT', '30')
+        config.setdefault('PIPELINE_BATCH_QUEUE', '64')
+        config.setdefault('PIPELINE_QUEUE_SIZE', '2048')
+        config.setdefault('METRICS_ENABLED', 'true')
+        config.setdefault('METRICS_HOST', '127.0.0.1')
+        config.setdefault('METRICS_PORT', '9617')
+        config.setdefault('CONTROL_SOCKET', str(DEFAULT_SOCKET))
+        config.setdefault('TRAFFIC_MANAGER_HOST', '')
+        config.setdefault('TRAFFIC_MANAGER_PORT', '8080')
+        config.setdefault('NOTIFY_TIMEOUT', '2')
+        config.setdefault('NOTIFY_INTERVAL', '0.5')
+        config.setdefault('NOTIFY_BATCH_SIZE', '100')
+        config.setdefault('NOTIFY_SPILL_SIZE', '10000')
+        config.setdefault('NOTIFY_FROM_MONITOR', 'false')
+        config.setdefault('WARMUP_ENABLED', 'true')
+        config.setdefault('WARMUP_CONCURRENCY', '2')
+        config.setdefault('WARMUP_RATE', '10')
+        config.setdefault('WARMUP_LIST_LIMIT', '500')
+        config.setdefault('WARMUP_HOT_SIZE', '200')
+        config.setdefault('WARMUP_REFRESH_INTERVAL', '240')
+        config.setdefault('WARMUP_SCHEDULE', '')
+        config.setdefault('WARMUP_LEAD', '900')
         
         # Construir URL de Pi-hole
         protocol = 'https' if config.get('PIHOLE_SSL', 'false').lower() == 'true' else 'http'
@@ -102,195 +435,270 @@ class AntiTebasController:
         
         self.logger = logging.getLogger('AntiTebas')
         
+    @property
+    def warp_domains(self):
+        """Índice de dominios de la instantánea en vigor (solo lectura)"""
+        return self.lists.domains
+    
+    @property
+    def warp_ips(self) -> IpRanges:
+        """Rangos de IPs WARP de la instantánea en vigor (solo lectura)"""
+        return self.lists.ips
+    
+    def publish_lists(self, **changes) -> ListSnapshot:
+        """Sustituir la instantánea de listas por una nueva versión ya construida"""
+        with self.lists_lock:
+            self.lists = self.lists.replace(**changes)
+            if 'ips' in changes:
+                self.redirect_backend.set_networks(self.lists.ips.networks)
+        self.dedup.clear()
+        if 'domains' in changes and self.warmup is not None and self.warmup.started:
+            self.schedule_warmup()
+        return self.lists
+    
     def load_warp_lists(self):
         """Cargar listas de dominios e IPs WARP"""
-        # Cargar dominios
-        domain_file = Path(self.config['DOMAIN_LIST_FILE'])
-        if domain_file.exists():
-            with open(domain_file, 'r') as f:
-                self.warp_domains = {
-                    line.strip() 
-                    for line in f 
-                    if line.strip() and not line.startswith('#')
-                }
-            self.logger.info(f"Cargados {len(self.warp_domains)} dominios WARP")
-        
-        # Cargar IPs
-        ip_file = Path(self.config['IP_LIST_FILE'])
-        if ip_file.exists():
-            with open(ip_file, 'r') as f:
-                self.warp_ips = {
-                    line.strip() 
-                    for line in f 
-                    if line.strip() and not line.startswith('#')
-                }
-            self.logger.info(f"Cargadas {len(self.warp_ips)} IPs WARP")
+        changes = {}
+        with self.lists_lock:
+            # Firmas antes de leer: un cambio durante la carga se vuelve a detectar
+            self.list_watcher.mark()
+            
+            # Cargar dominios
+            domain_file = Path(self.config['DOMAIN_LIST_FILE'])
+            if domain_file.exists():
+                index = load_index(Path(self.config['LIST_SNAPSHOT_FILE']), domain_file)
+                if index is not None:
+                    changes['updated'] = index.meta.get('updated')
+                    origin = "índice compilado"
+                else:
+                    with open(domain_file, 'r') as f:
+                        domains = {
+                            line.strip() 
+                            for line in f 
+                            if line.strip() and not line.startswith('#')
+                        }
+                    index = self.compile_domain_index(domains)
+                    origin = "lista"
+                changes['domains'] = index
+                self.logger.info(f"Cargados {len(index)} dominios WARP ({origin})")
+            
+            # Altas y bajas manuales pendientes de fundir con la lista
+            manual_file = Path(self.config['MANUAL_DOMAINS_FILE'])
+            if manual_file.exists():
+                base = changes.get('domains', DomainIndex())
+                overlay = OverlayIndex(base, *read_overlay(manual_file))
+                if overlay.changes:
+                    changes['domains'] = overlay
+                    self.logger.info(f"Cargados {overlay.changes} cambios manuales de dominios")
+            
+            # Cargar IPs y rangos CIDR (agregados en el mínimo de prefijos)
+            ip_file = Path(self.config['IP_LIST_FILE'])
+            if ip_file.exists():
+                with open(ip_file, 'r') as f:
+                    ranges, invalid = IpRanges.parse(f)
+                if invalid:
+                    self.logger.warning(f"⚠️ {invalid} líneas no válidas en {ip_file.name}")
+                changes['ips'] = ranges
+                self.logger.info(f"Cargados {len(ranges)} rangos de IPs WARP ({ranges.addresses} direcciones)")
+            
+            if changes:
+                snapshot = self.publish_lists(**changes)
+                if snapshot.updated:
+                    self.stats['last_update'] = snapshot.updated
+    
+    def reload_if_changed(self) -> bool:
+        """Recargar las listas si sus archivos cambiaron (p. ej. editados a mano)"""
+        changed = self.list_watcher.changed()
+        if not changed:
+            return False
+        self.logger.info(f"🔄 Listas modificadas ({', '.join(p.name for p in changed)}) - recargando")
+        self.load_warp_lists()
+        return True
+    
+    def list_watch_loop(self):
+        """Vigilar los archivos de lista mientras el monitor corre"""
+        interval = float(self.config['LIST_WATCH_INTERVAL'])
+        if interval <= 0:
+            return
+        while self.running:
+            time.sleep(interval)
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                self.logger.error(f"Error recargando listas: {e}")
+    
+    def compile_domain_index(self, domains: Set[str]):
+        """Compilar los dominios junto a la lista de texto y proyectar el índice
+
+        Llamar con ``lists_lock`` después de escribir ``DOMAIN_LIST_FILE``. Si
+        no se puede escribir el índice se usa un ``DomainIndex`` en memoria.
+        Devuelve el índice sin publicarlo.
+        """
+        index_file = Path(self.config['LIST_SNAPSHOT_FILE'])
+        if compile_index(index_file, domains, Path(self.config['DOMAIN_LIST_FILE']),
+                         updated=self.stats['last_update']):
+            index = load_index(index_file)
+            if index is not None:
+                return index
+        self.logger.warning(f"⚠️ No se pudo compilar el índice de dominios en {index_file} - usando memoria")
+        return DomainIndex(domains)
     
     def is_warp_domain(self, domain: str) -> bool:
         """Verificar si un dominio debe usar WARP"""
-        # Verificación exacta
-        if domain in self.warp_domains:
-            return True
-            
-        # Verificación de subdominio
-        for warp_domain in self.warp_domains:
-            if domain.endswith(f".{warp_domain}"):
-                return True
-                
-        return False
+        # Verificación exacta y de subdominio por etiquetas, sobre la instantánea en vigor
+        return self.lists.domains.matches(domain)
+    
+    def parse_hosts_list(self, lines: Iterable[str]) -> Iterator[str]:
+        """Parsear una lista en formato hosts (solo entradas de bloqueo)"""
+        return validate_stream(parse_hosts(lines))
+    
+    def parse_blocklist(self, lines: Iterable[str]) -> Iterator[str]:
+        """Parsear una lista de bloqueos España (hosts, plana o con wildcards)"""
+        return validate_stream(parse_blocklist(lines))
+    
+    def list_jobs(self, key: str, kind: str, parser):
+        return [(url, kind, parser) for url in split_urls(self.config.get(key, ''))]
+    
+    def download_lists(self, jobs) -> Dict[str, Set[str]]:
+        """Descargar en paralelo, devolver los dominios agrupados por tipo"""
+        domains = {kind: set() for _url, kind, _parser in jobs}
+        for result in self.downloader.fetch_all(jobs):
+            domains[result.kind].update(result.domains)
+            self.m_list_fetch_seconds.observe(result.seconds, kind=result.kind, status=result.status)
+            if result.status == STATUS_UPDATED:
+                self.logger.info(f"Lista procesada: +{len(result.domains)} dominios desde {result.url}")
+            elif result.status in (STATUS_NOT_MODIFIED, STATUS_UNCHANGED):
+                self.logger.debug(f"Lista sin cambios ({len(result.domains)} dominios): {result.url}")
+            elif result.status == STATUS_STALE:
+                self.logger.warning(f"⚠️ Error descargando {result.url}: {result.error} - usando caché")
+            else:
+                self.logger.error(f"Error descargando {result.url}: {result.error}")
+        return domains
     
     def download_domain_lists(self):
         """Descargar listas de dominios desde URLs externas"""
-        urls = self.config.get('DOMAIN_LISTS_URLS', '').split(',')
-        new_domains = set()
-        
-        for url in urls:
-            url = url.strip()
-            if not url:
-                continue
-                
-            try:
-                self.logger.info(f"Descargando lista desde: {url}")
-                response = requests.get(url, timeout=30)
-                response.raise_for_status()
-                
-                # Parsear archivo hosts
-                for line in response.text.split('\n'):
-                    line = line.strip()
-                    if not line or line.startswith('#'):
-                        continue
-                        
-                    parts = line.split()
-                    if len(parts) >= 2:
-                        ip = parts[0]
-                        domain = parts[1]
-                        
-                        # Si es entrada de bloqueo (0.0.0.0, 127.0.0.1), agregar dominio
-                        if ip in ['0.0.0.0', '127.0.0.1'] and self.is_valid_domain(domain):
-                            new_domains.add(domain)
-                            
-                self.logger.info(f"Lista procesada: +{len(new_domains)} dominios desde {url}")
-                
-            except Exception as e:
-                self.logger.error(f"Error descargando {url}: {e}")
-        
-        return new_domains
+        jobs = self.list_jobs('DOMAIN_LISTS_URLS', 'hosts', self.parse_hosts_list)
+        return self.download_lists(jobs).get('hosts', set())
     
     def download_spain_blocklists(self):
         """Descargar listas públicas de dominios bloqueados en España"""
-        urls = self.config.get('SPAIN_BLOCKLIST_URLS', '').split(',')
-        blocked_domains = set()
-        
-        for url in urls:
-            url = url.strip()
-            if not url:
-                continue
-                
-            try:
-                self.logger.info(f"Descargando lista de bloqueos España desde: {url}")
-                response = requests.get(url, timeout=30)
-                response.raise_for_status()
-                
-                # Track domains from this specific URL
-                domains_from_url = set()
-                
-                # Parsear diferentes formatos de blocklists
-                for line in response.text.split('\n'):
-                    line = line.strip()
-                    if not line or line.startswith('#'):
-                        continue
-                    
-                    # Intentar diferentes formatos:
-                    # 1. Formato hosts (0.0.0.0 domain.com o 127.0.0.1 domain.com)
-                    # 2. Formato plano (solo dominio por línea)
-                    # 3. Formato con wildcards (*.domain.com)
-                    
-                    parts = line.split()
-                    
-                    if len(parts) >= 2 and parts[0] in ['0.0.0.0', '127.0.0.1']:
-                        # Formato hosts
-                        domain = parts[1]
-                        if self.is_valid_domain(domain):
-                            domains_from_url.add(domain)
-                    elif len(parts) == 1:
-                        # Formato plano
-                        domain = parts[0]
-                        # Eliminar wildcards al principio
-                        if domain.startswith('*.'):
-                            domain = domain[2:]
-                        if domain and self.is_valid_domain(domain):
-                            domains_from_url.add(domain)
-                
-                blocked_domains.update(domains_from_url)
-                self.logger.info(f"Lista España procesada: +{len(domains_from_url)} dominios bloqueados desde {url}")
-                
-            except Exception as e:
-                self.logger.error(f"Error descargando lista España {url}: {e}")
-        
-        return blocked_domains
+        jobs = self.list_jobs('SPAIN_BLOCKLIST_URLS', 'spain', self.parse_blocklist)
+        return self.download_lists(jobs).get('spain', set())
     
     def is_valid_domain(self, domain: str) -> bool:
         """Verificar si un dominio es válido"""
-        if not domain or len(domain) > 253:
-            return False
-        pattern = r'^[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?(\.[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?)*$'
-        return re.match(pattern, domain) is not None
+        return is_valid_domain(domain)
     
     def resolve_domain_to_ip(self, domain: str) -> Set[str]:
-        """Resolver dominio a IPs"""
-        ips = set()
+        """Resolver dominio a IPs (IPv4 e IPv6) de forma bloqueante, usando la caché"""
         try:
-            import socket
-            result = socket.getaddrinfo(domain, None)
-            for item in result:
-                ip = item[4][0]
-                if ':' not in ip:  # Solo IPv4 por simplicidad
-                    ips.add(ip)
-                    
-            # Cachear resultado
-            self.resolved_ips[domain] = ips
-            self.logger.debug(f"Resuelto {domain} → {ips}")
-            
+            return self.resolver.resolve(domain, timeout=10)
         except Exception as e:
             self.logger.debug(f"No se pudo resolver {domain}: {e}")
-            
-        return ips
+            return set()
+    
+    def on_domain_resolved(self, domain: str, ips: Set[str], ttl: int):
+        """Callback del pool de resolución (o etapa apply): encolar redirección de las IPs"""
+        # El hilo de flush instala el lote sin bloquear el monitor
+        with self.m_stage_seconds.time(stage='apply'):
+            # Las IPs dentro de un rango de la lista ya están redirigidas: sin regla propia
+            ranges = self.warp_ips
+            if ranges:
+                uncovered = {ip for ip in ips if ip not in ranges}
+                if len(uncovered) != len(ips):
+                    self.m_in_ranges.inc(len(ips) - len(uncovered))
+                ips = uncovered
+            self.track_redirects(ips, ttl, domain)
+            queued = self.redirect_backend.add_ips(ips, ttl=self.redirect_table.clamp_ttl(ttl))
+        if queued:
+            self.logger.info(f"✅ {queued} IPs encoladas para redirección WARP ({domain})")
+    
+    def track_redirects(self, ips: Iterable[str], ttl: Optional[int] = None, domain: Optional[str] = None):
+        """Renovar IPs en la tabla de redirecciones y retirar las desalojadas por tamaño"""
+        evicted = self.redirect_table.touch(ips, ttl, domain)
+        if evicted:
+            # Como al caducar: la próxima consulta de esos dominios no se deduplica
+            for owner in {owner for _, owner in evicted if owner}:
+                self.dedup.invalidate(owner)
+            self.redirect_backend.remove_ips([ip for ip, _ in evicted])
+            self.logger.debug(f"Tabla de redirecciones llena: {len(evicted)} IPs desalojadas")
+    
+    def expire_redirects(self) -> int:
+        """Retirar un lote de IPs caducadas, devolver cuántas"""
+        entries = self.redirect_table.pop_expired(int(self.config['REDIRECT_SWEEP_BATCH']))
+        if not entries:
+            return 0
+        expired = [ip for ip, _ in entries]
+        # Estado de redirección cambiado: la próxima consulta del dominio no se deduplica
+        for domain in {domain for _, domain in entries if domain}:
+            self.dedup.invalidate(domain)
+        if self.redirect_backend.native_timeouts:
+            # El kernel ya las ha retirado (timeout por elemento): solo olvidarlas
+            self.redirect_backend.forget(expired)
+        else:
+            self.redirect_backend.remove_ips(expired)
+            self.logger.info(f"♻️ {len(expired)} IPs caducadas retiradas de la redirección WARP")
+        return len(expired)
+    
+    def request_resolution(self, domain: str):
+        """Pedir la resolución de un dominio WARP sin bloquear"""
+        if self.pipeline is not None:
+            self.pipeline.submit('resolve', domain)
+        else:
+            self.resolver.submit(domain, self.on_domain_resolved)
+    
+    def queue_redirect(self, domain: str, ips: Set[str], ttl: int):
+        """Pasar IPs de un dominio WARP a la etapa apply (o aplicarlas directamente)"""
+        if self.pipeline is not None:
+            self.pipeline.submit('apply', (domain, ips, ttl))
+        else:
+            self.on_domain_resolved(domain, ips, ttl)
+    
+    def create_redirect_backend(self, name: str) -> RedirectBackend:
+        """Crear backend de redirección configurado"""
+        try:
+            return create_backend(name, redirect_port=int(self.config['REDIRECT_PORT']), logger=self.logger)
+        except ValueError as e:
+            self.logger.error(f"❌ {e} - usando iptables")
+            return IptablesBackend(redirect_port=int(self.config['REDIRECT_PORT']), logger=self.logger)
     
     def setup_iptables_rule(self, ip: str) -> bool:
-        """Configurar regla iptables para IP específica"""
+        """Encolar redirección para IP específica (se instala en el próximo flush)"""
+        self.redirect_backend.add_ips([ip])
+        return True
+    
+    def flush_redirects(self) -> int:
+        """Instalar en lote las redirecciones pendientes"""
         try:
-            # Crear cadena personalizada si no existe
-            subprocess.run([
-                "iptables", "-t", "nat", "-N", "WARP_REDIRECT"
-            ], check=False, capture_output=True)
-            
-            # Verificar si la regla ya existe
-            check_cmd = [
-                "iptables", "-t", "nat", "-C", "WARP_REDIRECT",
-                "-d", ip, "-p", "tcp", "-j", "REDIRECT", "--to-port", "8080"
-            ]
-            
-            result = subprocess.run(check_cmd, check=False, capture_output=True)
-            if result.returncode == 0:
-                # Regla ya existe
-                return True
-            
-            # Agregar nueva regla
-            add_cmd = [
-                "iptables", "-t", "nat", "-A", "WARP_REDIRECT",
-                "-d", ip, "-p", "tcp", "-j", "REDIRECT", "--to-port", "8080"
-            ]
-            
-            result = subprocess.run(add_cmd, check=True, capture_output=True)
-            self.logger.info(f"Regla iptables agregada para IP: {ip}")
-            return True
-            
-        except subprocess.CalledProcessError as e:
-            self.logger.error(f"❌ Error configurando cadena iptables: {e}")
-            return False
+            start = time.perf_counter()
+            changed = self.redirect_backend.flush()
+            if changed:
+                self.m_apply_seconds.observe(time.perf_counter() - start)
+                self.m_redirects.inc(changed)
+            return changed
+        except Exception as e:
+            self.logger.error(f"❌ Error aplicando redirecciones: {e}")
+            return 0
+    
+    def redirect_flush_loop(self):
+        """Aplicar redirecciones pendientes periódicamente en hilo separado"""
+        flush_interval = float(self.config.get('REDIRECT_FLUSH_INTERVAL', '0.5'))
+        sweep_interval = float(self.config['REDIRECT_SWEEP_INTERVAL'])
+        sweep_batch = int(self.config['REDIRECT_SWEEP_BATCH'])
+        next_sweep = time.monotonic() + sweep_interval
+        
+        while self.running:
+            if time.monotonic() >= next_sweep:
+                # Un lote por ciclo; si quedan más caducadas, seguir en el siguiente
+                expired = self.expire_redirects()
+                next_sweep = time.monotonic() + (0 if expired >= sweep_batch else sweep_interval)
+            self.flush_redirects()
+            time.sleep(flush_interval)
     
     def check_pihole_connectivity(self) -> bool:
         """Verificar conectividad con Pi-hole"""
+        import requests  # solo al comprobar: su importación retrasa el arranque
+        
         try:
             pihole_url = self.config.get('PIHOLE_URL', 'http://localhost')
             api_endpoint = f"{pihole_url}/admin/api.php"
@@ -318,27 +726,11 @@ class AntiTebasController:
         except Exception:
             return False
     
-    def parse_pihole_log_line(self, line: str) -> Optional[Dict]:
-        """Parsear línea del log de Pi-hole"""
-        # Formato típico: "timestamp query[A] domain from client_ip"
-        # Ejemplo: "Oct 29 10:15:30 query[A] google.com from 192.168.1.100"
-        
-        # Pattern para consultas DNS
-        query_pattern = r'(\w+\s+\d+\s+\d+:\d+:\d+).*query\[([A-Z]+)\]\s+(\S+)\s+from\s+(\S+)'
-        match = re.search(query_pattern, line)
-        
-        if match:
-            timestamp_str, query_type, domain, client_ip = match.groups()
-            
-            return {
-                'timestamp': datetime.now().isoformat(),
-                'domain': domain,
-                'client_ip': client_ip,
-                'query_type': query_type,
-                'raw_line': line.strip()
-            }
-        
-        return None
+    def parse_pihole_log_line(self, line: str) -> Optional[LogQuery]:
+        """Parsear línea del log de Pi-hole (dnsmasq o FTL)"""
+        # Ejemplo: "Oct 29 10:15:30 dnsmasq[812]: query[A] google.com from 192.168.1.100"
+        # Para lotes de líneas, classify_lines usa LogParser.parse (una pasada por lote)
+        return self.log_parser.parse_line(line)
     
     def process_dns_query(self, query_data: Dict):
         """Procesar consulta DNS y configurar redirección"""
@@ -347,91 +739,288 @@ class AntiTebasController:
         
         # Actualizar estadísticas
         self.stats['total_queries'] += 1
+        self.m_queries.inc()
         
-        # Verificar si es dominio WARP
-        if self.is_warp_domain(domain):
-            self.logger.info(f"🎯 Dominio WARP detectado: {domain} desde {client_ip}")
-            self.stats['warp_queries'] += 1
-            
-            # Resolver dominio a IPs
-            ips = self.resolve_domain_to_ip(domain)
-            
-            # Configurar redirección para cada IP
-            for ip in ips:
-                if self.setup_iptables_rule(ip):
-                    self.logger.info(f"✅ Redirección configurada: {ip} → WARP")
-                else:
-                    self.logger.warning(f"❌ Error configurando redirección para {ip}")
-            
+        # Veredicto reciente de la misma consulta (ventana de deduplicación)
+        query_type = query_data.get('query_type', 'A')
+        is_warp = self.dedup.lookup(domain, query_type)
+        repeated = is_warp is not None
+        if not repeated:
+            is_warp = self.is_warp_domain(domain)
+            self.dedup.record(domain, query_type, is_warp)
+        
+        # Destino CNAME de un dominio WARP (sin deduplicar: el alias puede ser nuevo)
+        if not is_warp and self.correlator.alias_root(domain):
+            is_warp, repeated = True, False
+        
+        if not is_warp:
+            return False
+        
+        self.stats['warp_queries'] += 1
+        self.m_warp_queries.inc()
+        
+        if self.answer_source == 'log':
+            # Las IPs llegan en las líneas reply/cached siguientes del log (también
+            # en las repetidas: un CDN puede responder con IPs nuevas)
+            self.correlator.track(domain)
+        
+        if repeated:
+            self.m_deduped.inc()
             return True
-            
-        return False
+        
+        self.logger.info(f"🎯 Dominio WARP detectado: {domain} desde {client_ip}")
+        if self.notifier is not None and self.notify_from_monitor:
+            self.notifier.notify(domain, client_ip, query_type, timestamp=query_data.get('timestamp'))
+        if self.warmup is not None:
+            self.warmup.touch(domain)
+        if self.answer_source != 'log':
+            # ¿La respuesta que recibe el cliente ya estaba redirigida?
+            cached = self.resolver.get_cached(domain)
+            self.record_coverage(domain, cached[0] if cached else ())
+            # Resolver fuera de este hilo; la redirección se encola al terminar
+            self.request_resolution(domain)
+        
+        return True
+    
+    def process_log_answer(self, line: str):
+        """Procesar línea reply/cached: redirigir la IP que recibió el cliente"""
+        self.apply_log_answer(self.correlator.feed(line))
+    
+    def apply_log_answer(self, answer: Optional[LogAnswer]):
+        """Redirigir la IP de una respuesta WARP del log"""
+        if answer:
+            self.m_log_answers.inc()
+            self.record_coverage(answer.root, (answer.ip,))
+            if answer.name != answer.root:
+                self.logger.debug(f"Respuesta vía CNAME {answer.name}: {answer.ip} para {answer.root}")
+            self.queue_redirect(answer.root, {answer.ip}, self.resolver.default_ttl)
+    
+    def record_coverage(self, domain: str, ips: Iterable[str]):
+        """Contar si la primera respuesta WARP de un dominio ya estaba redirigida (p. ej. precalentada)
+
+        Solo cuenta la primera respuesta de cada dominio por ventana de TTL:
+        las siguientes (otras líneas de la misma respuesta, reconexiones)
+        ya encuentran la redirección que instaló la primera.
+        """
+        if self.coverage_window.lookup(domain, '') is not None:
+            return
+        self.coverage_window.record(domain, '', True)
+        ips = list(ips)
+        installed = self.redirect_backend.installed
+        ranges = self.warp_ips
+        covered = bool(ips) and all(ip in installed or ip in ranges for ip in ips)
+        self.m_coverage.inc(result='hit' if covered else 'miss')
+    
+    def resolve_unanswered_queries(self):
+        """Resolver consultas WARP cuya respuesta no apareció en el log"""
+        for domain in self.correlator.expire():
+            self.logger.debug(f"Sin respuesta en el log para {domain} - resolviendo")
+            self.request_resolution(domain)
+    
+    def process_log_line(self, line: str):
+        """Procesar una línea del log: consulta o respuesta"""
+        query_data = self.parse_pihole_log_line(line)
+        if query_data:
+            self.process_dns_query(query_data)
+        else:
+            self.process_log_answer(line)
+    
+    def classify_lines(self, lines):
+        """Etapa classify: parsear un lote de líneas y detectar dominios WARP"""
+        with self.m_stage_seconds.time(stage='classify'):
+            for event in self.log_parser.parse(lines):
+                if type(event) is LogQuery:
+                    self.process_dns_query(event)
+                else:
+                    self.apply_log_answer(self.correlator.feed_answer(event))
+            self.resolve_unanswered_queries()
+    
+    def classify_queries(self, queries):
+        """Etapa classify con QUERY_SOURCE=ftl: consultas ya parseadas"""
+        with self.m_stage_seconds.time(stage='classify'):
+            for query_data in queries:
+                self.process_dns_query(query_data)
+    
+    def classify_handler(self):
+        return self.classify_queries if self.query_source_name == 'ftl' else self.classify_lines
+    
+    def resolve_stage(self, domain: str):
+        """Etapa resolve: resolución bloqueante en un hilo de la etapa"""
+        try:
+            with self.m_stage_seconds.time(stage='resolve'):
+                ips, ttl = self.resolver.lookup(domain, timeout=10)
+        except Exception as e:
+            self.logger.debug(f"No se pudo resolver {domain}: {e}")
+            return
+        if ips:
+            self.pipeline.submit('apply', (domain, ips, ttl))
+    
+    def build_pipeline(self) -> Pipeline:
+        """Crear el pipeline classify → resolve → apply"""
+        queue_size = int(self.config['PIPELINE_QUEUE_SIZE'])
+        pipeline = Pipeline(logger=self.logger)
+        # Una sola instancia: el correlador de respuestas depende del orden del log
+        pipeline.add_stage('classify', self.classify_handler(), workers=1,
+                           queue_size=int(self.config['PIPELINE_BATCH_QUEUE']), overflow=OVERFLOW_BLOCK)
+        # Dominios repetidos en cola se agrupan; si se llena, se descarta trabajo
+        pipeline.add_stage('resolve', self.resolve_stage, workers=int(self.config['RESOLVER_WORKERS']),
+                           queue_size=queue_size, overflow=OVERFLOW_DROP, key=lambda domain: domain)
+        pipeline.add_stage('apply', lambda item: self.on_domain_resolved(*item), workers=1,
+                           queue_size=queue_size, overflow=OVERFLOW_DROP)
+        return pipeline
+    
+    def create_query_source(self, persist: bool = True) -> QuerySource:
+        """Crear la fuente de consultas según QUERY_SOURCE
+        
+        Con ``persist=False`` no se guarda la posición (se empieza por el final).
+        """
+        if self.query_source_name == 'ftl':
+            # Filas nuevas de pihole-FTL.db por id, con el último id persistido
+            return FtlQuerySource(
+                Path(self.config['FTL_DB_FILE']),
+                state_file=Path(self.config['FTL_STATE_FILE']) if persist else None,
+                batch_size=int(self.config['FTL_BATCH_SIZE']),
+                poll_interval=float(self.config['FTL_POLL_INTERVAL']),
+                logger=self.logger
+            )
+        # Lectura por bloques; sobrevive a logrotate y retoma la posición guardada
+        return LogQuerySource(
+            QUERY_LOG,
+            state_file=Path(self.config['TAIL_STATE_FILE']) if persist else None,
+            poll_interval=float(self.config['TAIL_POLL_INTERVAL']),
+            logger=self.logger
+        )
     
     def monitor_pihole_log(self):
-        """Monitorear log de Pi-hole en tiempo real"""
-        self.logger.info("Iniciando monitor de consultas DNS")
+        """Monitorear consultas de Pi-hole en tiempo real (log o base de datos FTL)"""
+        self.logger.info(f"Iniciando monitor de consultas DNS (fuente: {self.query_source_name})")
+        
+        source = self.query_source = self.create_query_source()
+        classify = self.classify_handler()
         
         try:
-            # Abrir archivo de log
-            with open(QUERY_LOG, 'r') as f:
-                # Ir al final del archivo
-                f.seek(0, 2)
+            for batch in source.batches(lambda: self.running):
+                self.m_lines_read.inc(len(batch))
+                if self.pipeline is not None:
+                    # Cola acotada y bloqueante: si classify se retrasa, el lector
+                    # espera y los datos siguen en el origen (sin pérdidas)
+                    self.pipeline.submit('classify', batch)
+                else:
+                    classify(batch)
                 
-                while self.running:
-                    line = f.readline()
-                    
-                    if line:
-                        # Procesar línea
-                        query_data = self.parse_pihole_log_line(line)
-                        if query_data:
-                            self.process_dns_query(query_data)
-                    else:
-                        # No hay nuevas líneas, esperar un poco
-                        time.sleep(0.1)
-                        
-        except FileNotFoundError:
-            self.logger.error(f"Archivo de log no encontrado: {QUERY_LOG}")
         except Exception as e:
-            self.logger.error(f"Error monitoreando log: {e}")
+            self.logger.error(f"Error monitoreando consultas: {e}")
+        finally:
+            source.close()
     
-
+    def run_interceptor(self, interceptor: DnsInterceptor):
+        """Modo interceptor: detectar y notificar consultas WARP, sin redirección"""
+        self.logger.info("Iniciando monitor de consultas DNS (interceptor)")
+        self.running = True
+        source = self.query_source = self.create_query_source(persist=False)
+        
+        try:
+            for batch in source.batches(lambda: self.running):
+                if source.raw_lines:
+                    batch = self.log_parser.queries(batch)
+                interceptor.process_queries(batch)
+        except KeyboardInterrupt:
+            self.logger.info("⏹️ Interrupción recibida")
+        finally:
+            self.running = False
+            source.close()
+    
+    def intercept_command(self, args) -> int:
+        """Entrada de dns-interceptor.sh: monitor, check o test [dominio] [cliente]"""
+        host = self.config['TRAFFIC_MANAGER_HOST'].strip()
+        port = int(self.config['TRAFFIC_MANAGER_PORT'])
+        command = args[0] if args else 'monitor'
+        
+        def manager_available() -> bool:
+            if host and check_manager(host, port):
+                return True
+            self.logger.warning(f"⚠️ Servidor WARP no accesible en {host}:{port}")
+            return False
+        
+        if command == 'check':
+            print("Servidor WARP disponible" if manager_available() else "Servidor WARP no disponible")
+            return 0
+        
+        if command not in ('monitor', 'test'):
+            print("Uso: dns-interceptor.sh [monitor|check|test [domain]]")
+            print("  monitor - Monitorear consultas DNS en tiempo real")
+            print("  check   - Verificar conectividad con servidor WARP")
+            print("  test    - Probar intercepción de dominio")
+            return 1
+        
+        if self.notifier is not None:
+            self.notifier.start()
+        interceptor = DnsInterceptor(self.is_warp_domain, self.notifier, logger=self.logger)
+        try:
+            if command == 'test':
+                test_domain = args[1] if len(args) > 1 else 'google.com'
+                test_client = args[2] if len(args) > 2 else '127.0.0.1'
+                print(f"Probando intercepción para: {test_domain}")
+                return 0 if interceptor.intercept(test_domain, test_client, 'A') else 1
+            
+            if not manager_available():
+                self.logger.error("❌ No se puede iniciar monitor - Servidor WARP no disponible")
+                return 1
+            self.run_interceptor(interceptor)
+            return 0
+        finally:
+            if self.notifier is not None:
+                self.notifier.stop()
     
     def update_domain_lists(self):
         """Actualizar listas de dominios (locales + externas + España)"""
         self.logger.info("📋 Actualizando listas de dominios...")
+        start = time.perf_counter()
         
-        # Descargar listas externas generales
-        external_domains = self.download_domain_lists()
-        
-        # Descargar listas específicas de España (dominios bloqueados)
-        spain_blocked_domains = self.download_spain_blocklists()
-        
-        # Combinar con listas locales existentes
-        self.warp_domains.update(external_domains)
-        self.warp_domains.update(spain_blocked_domains)
+        # Descargar a la vez listas externas generales y de España (dominios bloqueados)
+        jobs = self.list_jobs('DOMAIN_LISTS_URLS', 'hosts', self.parse_hosts_list)
+        jobs += self.list_jobs('SPAIN_BLOCKLIST_URLS', 'spain', self.parse_blocklist)
+        downloaded = self.download_lists(jobs)
+        external_domains = downloaded.get('hosts', set())
+        spain_blocked_domains = downloaded.get('spain', set())
         
         # Guardar listas actualizadas
         domain_file = Path(self.config['DOMAIN_LIST_FILE'])
         domain_file.parent.mkdir(parents=True, exist_ok=True)
         
-        with open(domain_file, 'w') as f:
-            f.write("# Lista de dominios WARP - Actualizada automáticamente\n")
-            f.write(f"# Última actualización: {datetime.now().isoformat()}\n")
-            f.write(f"# Dominios externos: {len(external_domains)}\n")
-            f.write(f"# Dominios bloqueados España: {len(spain_blocked_domains)}\n\n")
-            for domain in sorted(self.warp_domains):
-                f.write(f"{domain}\n")
+        with self.lists_lock:
+            # Combinar con listas locales existentes (una copia: la instantánea en vigor no cambia)
+            domains = set(self.warp_domains)
+            domains.update(external_domains)
+            domains.update(spain_blocked_domains)
+            
+            self.stats['last_update'] = datetime.now().isoformat()
+            with open(domain_file, 'w') as f:
+                f.write("# Lista de dominios WARP - Actualizada automáticamente\n")
+                f.write(f"# Última actualización: {self.stats['last_update']}\n")
+                f.write(f"# Dominios externos: {len(external_domains)}\n")
+                f.write(f"# Dominios bloqueados España: {len(spain_blocked_domains)}\n\n")
+                for domain in sorted(domains):
+                    f.write(f"{domain}\n")
+            # Los cambios manuales ya están en la lista: la capa se vacía
+            Path(self.config['MANUAL_DOMAINS_FILE']).unlink(missing_ok=True)
+            self.list_watcher.mark()
+            self.publish_lists(domains=self.compile_domain_index(domains), updated=self.stats['last_update'])
         
-        self.stats['last_update'] = datetime.now().isoformat()
+        self.m_list_domains.set(len(external_domains), kind='hosts')
+        self.m_list_domains.set(len(spain_blocked_domains), kind='spain')
+        self.m_list_update_seconds.observe(time.perf_counter() - start)
         self.logger.info(f"✅ Listas actualizadas: {len(self.warp_domains)} dominios totales")
         self.logger.info(f"   - Externos: {len(external_domains)}")
         self.logger.info(f"   - Bloqueados España: {len(spain_blocked_domains)}")
         
     def add_domain(self, domain: str) -> bool:
         """Agregar dominio manualmente a la lista WARP"""
-        if self.is_valid_domain(domain):
-            self.warp_domains.add(domain)
-            self.save_domain_lists()
+        normalized = normalize_domain(domain)
+        if normalized:
+            domain = normalized
+            with self.lists_lock:
+                self.save_manual_domains(self.manual_overlay().with_added(domain))
             self.logger.info(f"➕ Dominio agregado: {domain}")
             return True
         else:
@@ -440,25 +1029,52 @@ class AntiTebasController:
     
     def remove_domain(self, domain: str) -> bool:
         """Eliminar dominio de la lista WARP"""
+        domain = normalize_domain(domain) or domain
         if domain in self.warp_domains:
-            self.warp_domains.remove(domain)
-            self.save_domain_lists()
+            with self.lists_lock:
+                self.save_manual_domains(self.manual_overlay().with_removed(domain))
             self.logger.info(f"➖ Dominio eliminado: {domain}")
             return True
         else:
             self.logger.warning(f"❌ Dominio no encontrado: {domain}")
             return False
     
-    def save_domain_lists(self):
-        """Guardar listas de dominios"""
+    def manual_overlay(self) -> OverlayIndex:
+        """Capa de cambios manuales de la instantánea en vigor (vacía si no hay)"""
+        domains = self.lists.domains
+        return domains if isinstance(domains, OverlayIndex) else OverlayIndex(domains)
+    
+    def save_manual_domains(self, overlay: OverlayIndex):
+        """Guardar y publicar la capa manual sin reescribir ni recompilar la lista
+
+        Llamar con ``lists_lock``. Sin cambios pendientes se publica el
+        índice base y se borra el archivo de la capa.
+        """
+        manual_file = Path(self.config['MANUAL_DOMAINS_FILE'])
+        if overlay.changes:
+            manual_file.parent.mkdir(parents=True, exist_ok=True)
+            write_overlay(manual_file, overlay)
+        else:
+            manual_file.unlink(missing_ok=True)
+        self.list_watcher.mark()
+        self.publish_lists(domains=overlay if overlay.changes else overlay.base)
+    
+    def save_domain_lists(self, domains: Optional[Set[str]] = None):
+        """Guardar listas de dominios y recompilar el índice (``domains`` sustituye a la lista)"""
         domain_file = Path(self.config['DOMAIN_LIST_FILE'])
         domain_file.parent.mkdir(parents=True, exist_ok=True)
         
-        with open(domain_file, 'w') as f:
-            f.write("# Lista de dominios WARP\n")
-            f.write(f"# Actualizada: {datetime.now().isoformat()}\n\n")
-            for domain in sorted(self.warp_domains):
-                f.write(f"{domain}\n")
+        with self.lists_lock:
+            if domains is None:
+                domains = set(self.warp_domains)
+            with open(domain_file, 'w') as f:
+                f.write("# Lista de dominios WARP\n")
+                f.write(f"# Actualizada: {datetime.now().isoformat()}\n\n")
+                for domain in sorted(domains):
+                    f.write(f"{domain}\n")
+            Path(self.config['MANUAL_DOMAINS_FILE']).unlink(missing_ok=True)
+            self.list_watcher.mark()
+            self.publish_lists(domains=self.compile_domain_index(domains))
     
     def periodic_update(self):
         """Actualización periódica de listas en hilo separado"""
@@ -486,33 +1102,24 @@ class AntiTebasController:
                 time.sleep(60)  # Esperar 1 minuto antes de reintentar
     
     def setup_iptables_chain(self):
-        """Configurar cadena iptables inicial"""
-        try:
-            # Crear cadena personalizada
-            subprocess.run([
-                "iptables", "-t", "nat", "-N", "WARP_REDIRECT"
-            ], check=False, capture_output=True)
-            
-            # Insertar cadena en PREROUTING si no está ya
-            check_cmd = ["iptables", "-t", "nat", "-C", "PREROUTING", "-j", "WARP_REDIRECT"]
-            result = subprocess.run(check_cmd, check=False, capture_output=True)
-            
-            if result.returncode != 0:
-                subprocess.run([
-                    "iptables", "-t", "nat", "-I", "PREROUTING", "-j", "WARP_REDIRECT"
-                ], check=True)
-                
-            self.logger.info("✅ Cadena iptables configurada")
+        """Configurar cadena iptables inicial mediante el backend de redirección"""
+        if self.redirect_backend.setup():
+            self.logger.info(f"✅ Cadena iptables configurada (backend {self.redirect_backend.name})")
+            # Rangos de la lista (también tras cambiar de backend o habilitar IPv6)
+            self.redirect_backend.set_networks(self.warp_ips.networks)
             return True
-            
-        except subprocess.CalledProcessError as e:
-            self.logger.error(f"❌ Error configurando cadena iptables: {e}")
+        
+        if isinstance(self.redirect_backend, IptablesBackend):
+            self.logger.error("❌ Error configurando cadena iptables")
             return False
-
-    def start(self):
-        """Iniciar el controlador WARP"""
-        self.logger.info("🚀 === AntiTebas Plugin iniciando ===")
         
+        # Sin ipset disponible: volver a una regla por IP
+        self.logger.warning(f"⚠️ Backend {self.redirect_backend.name} no disponible - usando iptables")
+        self.redirect_backend = IptablesBackend(redirect_port=int(self.config['REDIRECT_PORT']), logger=self.logger)
+        return self.setup_iptables_chain()
+
+    def check_connectivity(self):
+        """Comprobaciones de arranque (Pi-hole y proxy WARP), solo informativas"""
         # Verificar conectividad con Pi-hole
         if self.check_pihole_connectivity():
             self.logger.info("✅ Conectividad con Pi-hole verificada")
@@ -524,20 +1131,55 @@ class AntiTebasController:
             self.logger.info(f"✅ Proxy WARP accesible en {self.warp_proxy_host}:{self.warp_proxy_port}")
         else:
             self.logger.warning(f"⚠️ Proxy WARP no accesible en {self.warp_proxy_host}:{self.warp_proxy_port}")
+    
+    def start(self):
+        """Iniciar el controlador WARP"""
+        self.logger.info("🚀 === AntiTebas Plugin iniciando ===")
+        
+        # Las comprobaciones de red (hasta 5 s cada una) no retrasan el monitor
+        threading.Thread(target=self.check_connectivity, daemon=True).start()
+        
+        # Endpoint local de métricas, socket de control y notificador
+        self.start_metrics_server()
+        self.start_control_server()
+        if self.notifier is not None and self.notify_from_monitor:
+            self.notifier.start()
         
         # Configurar iptables
         if not self.setup_iptables_chain():
             self.logger.error("❌ Error configurando iptables - continuando de todos modos")
         
-        # Cargar/actualizar listas iniciales
-        self.update_domain_lists()
+        # Las IPs ya instaladas (de una ejecución anterior) caducan si no se vuelven a ver
+        self.track_redirects(list(self.redirect_backend.installed))
         
         self.running = True
         
+        # Las listas ya están cargadas (instantánea o lista local): la primera
+        # actualización de las externas se hace en segundo plano
+        self.logger.info(f"📋 Monitorizando con {len(self.warp_domains)} dominios; "
+                         f"actualizando listas en segundo plano")
+        
         # Iniciar actualización periódica en hilo separado
         update_thread = threading.Thread(target=self.periodic_update, daemon=True)
         update_thread.start()
         
+        # Recargar las listas editadas a mano (firma mtime/tamaño de los archivos)
+        watch_thread = threading.Thread(target=self.list_watch_loop, daemon=True)
+        watch_thread.start()
+        
+        # Aplicar redirecciones en lote en hilo separado
+        flush_thread = threading.Thread(target=self.redirect_flush_loop, daemon=True)
+        flush_thread.start()
+        
+        # Etapas de procesamiento con colas acotadas
+        self.pipeline = self.build_pipeline()
+        self.pipeline.start()
+        
+        # Precalentar redirecciones de la lista cargada (y de cada recarga posterior)
+        if self.warmup is not None:
+            self.warmup.start()
+            self.schedule_warmup()
+        
         # Iniciar monitoreo principal
         try:
             self.monitor_pihole_log()
@@ -550,6 +1192,18 @@ class AntiTebasController:
         """Detener el controlador"""
         self.logger.info("🛑 Deteniendo AntiTebas Plugin")
         self.running = False
+        if self.warmup is not None:
+            self.warmup.stop()
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        self.resolver.shutdown()
+        self.flush_redirects()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if self.control_server is not None:
+            self.control_server.stop()
+        if self.notifier is not None:
+            self.notifier.stop()
 
 
 def main():
@@ -594,12 +1248,22 @@ def main():
                 print("Uso: remove <dominio>")
                 sys.exit(1)
                 
+        elif command == "list":
+            # Sin monitor: la lista del disco con la capa manual (MANUAL_DOMAINS_FILE)
+            controller = AntiTebasController()
+            print(format_response('list', dict(controller.control_list({}), ok=True)))
+            
         elif command == "test":
             test_domain = sys.argv[2] if len(sys.argv) > 2 else "google.com"
             controller = AntiTebasController()
-            result = controller.is_warp_domain(test_domain)
+            # Mismo tratamiento que la operación test del socket (p. ej. WWW.Foo.com.)
+            result = controller.control_test({'domain': test_domain})['warp']
             print(f"Dominio {test_domain}: {'🎯 WARP' if result else '🌐 Normal'}")
             
+        elif command == "intercept":
+            controller = AntiTebasController()
+            sys.exit(controller.intercept_command(sys.argv[2:]))
+            
         elif command == "stats":
             controller = AntiTebasController()
             stats = controller.stats
@@ -615,8 +1279,10 @@ def main():
             print("  update         - Actualizar listas de dominios")
             print("  add <dominio>  - Agregar dominio a lista WARP")
             print("  remove <dom>   - Eliminar dominio de lista WARP")
+            print("  list           - Ver dominios WARP (con los cambios manuales)")
             print("  test [dominio] - Probar si dominio usa WARP")
             print("  stats          - Ver estadísticas")
+            print("  intercept [monitor|check|test [dominio]] - Interceptor DNS")
             sys.exit(1)
     else:
         # Modo monitor (por defecto)
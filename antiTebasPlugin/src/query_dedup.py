@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Deduplicación de consultas
+Ventana temporal por (dominio, tipo) delante de la clasificación: las
+consultas repetidas dentro de la ventana reutilizan el veredicto anterior
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Set, Tuple
+
+
+class QueryDeduplicator:
+    """Veredictos recientes por (dominio, tipo de consulta) con memoria fija
+
+    ``lookup`` devuelve el veredicto (WARP o no) si la entrada sigue dentro
+    de su ventana; ``None`` indica que hay que clasificar la consulta de
+    nuevo y registrarla con ``record``. Como mucho se guardan
+    ``max_entries`` entradas (se desalojan las menos recientes). Las
+    entradas de un dominio se invalidan cuando cambia su estado de
+    redirección (``invalidate``) y todas cuando cambia la lista (``clear``).
+    Con ``window=0`` no se deduplica nada.
+    """
+
+    def __init__(self, window: float = 5.0, max_entries: int = 50000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.max_entries = max_entries
+        self.clock = clock
+
+        # (dominio, tipo) → (fin de la ventana, veredicto)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, bool]]" = OrderedDict()
+        self._types: Set[str] = set()
+        self._lock = threading.Lock()
+
+        self.stats = {'hits': 0, 'misses': 0, 'evicted': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, domain: str, query_type: str) -> Optional[bool]:
+        if not self.enabled:
+            return None
+        key = (domain, query_type)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[1]
+
+    def record(self, domain: str, query_type: str, verdict: bool):
+        if not self.enabled:
+            return
+        key = (domain, query_type)
+        with self._lock:
+            self._entries[key] = (self.clock() + self.window, verdict)
+            self._entries.move_to_end(key)
+            self._types.add(query_type)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evicted'] += 1
+
+    def invalidate(self, domain: str):
+        """Olvidar las entradas de un dominio (todos los tipos de consulta)"""
+        with self._lock:
+            for query_type in self._types:
+                self._entries.pop((domain, query_type), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Fuentes de consultas DNS
+Log de Pi-hole (pihole.log) o base de datos SQLite de FTL (pihole-FTL.db)
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from log_tailer import LogTailer
+
+# Columna ``type`` de la tabla queries de FTL
+FTL_QUERY_TYPES = {
+    1: 'A', 2: 'AAAA', 3: 'ANY', 4: 'SRV', 5: 'SOA', 6: 'PTR', 7: 'TXT', 8: 'NAPTR',
+    9: 'MX', 10: 'DS', 11: 'RRSIG', 12: 'DNSKEY', 13: 'NS', 14: 'OTHER', 15: 'SVCB', 16: 'HTTPS',
+}
+
+
+class QuerySource:
+    """Origen de consultas: produce lotes mientras ``running()`` sea cierto
+
+    ``batches`` devuelve una lista vacía en cada espera sin datos, para que
+    el consumidor pueda hacer tareas periódicas.
+    """
+
+    name = ''
+    # True si los lotes son líneas del log (con respuestas reply/cached);
+    # False si son consultas ya parseadas (diccionarios)
+    raw_lines = False
+
+    def batches(self, running: Callable[[], bool]) -> Iterator[List]:
+        raise NotImplementedError
+
+    def lag(self) -> Dict[str, float]:
+        """Retraso respecto al origen, por unidad (p. ej. ``bytes``, ``seconds``)"""
+        return {}
+
+    def close(self):
+        pass
+
+
+class LogQuerySource(QuerySource):
+    """Líneas de pihole.log leídas con LogTailer"""
+
+    name = 'log'
+    raw_lines = True
+
+    def __init__(self, path: Path, state_file: Optional[Path] = None, poll_interval: float = 0.25,
+                 logger: Optional[logging.Logger] = None):
+        self.tailer = LogTailer(path, state_file=state_file, poll_interval=poll_interval, logger=logger)
+
+    def batches(self, running: Callable[[], bool]) -> Iterator[List[str]]:
+        return self.tailer.batches(running)
+
+    def lag(self) -> Dict[str, float]:
+        pending, seconds = self.tailer.lag()
+        return {'bytes': pending, 'seconds': seconds}
+
+    def close(self):
+        self.tailer.close()
+
+
+class FtlQuerySource(QuerySource):
+    """Consultas nuevas de la tabla ``queries`` de pihole-FTL.db
+
+    Lee por lotes las filas con ``id`` mayor que el último visto y guarda
+    ese id en ``state_file`` para continuar tras un reinicio sin perder ni
+    repetir consultas. La base se abre en solo lectura; si FTL la tiene
+    bloqueada se reintenta en la siguiente espera. ``timestamp`` va en
+    segundos epoch, como en las consultas del log (``LogQuery``).
+    """
+
+    name = 'ftl'
+
+    def __init__(self, db_path: Path, state_file: Optional[Path] = None, batch_size: int = 1000,
+                 poll_interval: float = 1.0, state_interval: float = 5.0,
+                 logger: Optional[logging.Logger] = None):
+        self.db_path = Path(db_path)
+        self.state_file = Path(state_file) if state_file else None
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.state_interval = state_interval
+        self.logger = logger or logging.getLogger('AntiTebas')
+
+        self.conn: Optional[sqlite3.Connection] = None
+        self.last_id: Optional[int] = None
+        self._last_state_save = 0.0
+        self._error_logged = False
+        self._backlog = False      # el último lote vino completo: quedan filas
+        self._lag = {'rows': 0, 'seconds': 0.0}
+
+    # ------------------------------------------------------------------
+    # Estado persistente (high-water mark)
+    # ------------------------------------------------------------------
+
+    def load_state(self) -> Optional[int]:
+        if not self.state_file or not self.state_file.exists():
+            return None
+        try:
+            return int(json.loads(self.state_file.read_text())['last_id'])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.warning(f"⚠️ Estado de FTL ilegible ({self.state_file}): {e}")
+            return None
+
+    def save_state(self):
+        if not self.state_file or self.last_id is None:
+            return
+        try:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.state_file.with_suffix('.tmp')
+            tmp.write_text(json.dumps({'last_id': self.last_id}))
+            os.replace(tmp, self.state_file)
+            self._last_state_save = time.monotonic()
+        except OSError as e:
+            self.logger.warning(f"⚠️ No se pudo guardar el estado de FTL: {e}")
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+
+    def open(self, start_at_end: bool = True) -> bool:
+        """Abrir la base en solo lectura y fijar el id desde el que leer"""
+        try:
+            self.conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, timeout=1.0,
+                                        check_same_thread=False)
+            max_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM queries").fetchone()[0]
+        except sqlite3.Error as e:
+            self._log_error(f"⚠️ Base de datos FTL no disponible ({self.db_path}): {e}")
+            self.close_connection()
+            return False
+        self._error_logged = False
+
+        if self.last_id is not None:
+            # Reconexión: seguir desde donde íbamos
+            return True
+
+        saved = self.load_state()
+        if saved is not None and saved <= max_id:
+            self.last_id = saved
+            self.logger.info(f"Retomando {self.db_path} tras la consulta {saved}")
+        elif saved is not None:
+            # La base se recreó (id menor que el guardado): leerla desde el principio
+            self.logger.info(f"🔄 Base FTL reiniciada ({saved} > {max_id}) - leyendo desde el principio")
+            self.last_id = 0
+        else:
+            self.last_id = max_id if start_at_end else 0
+        return True
+
+    def _log_error(self, message: str):
+        if not self._error_logged:
+            self.logger.warning(message)
+            self._error_logged = True
+
+    def read_queries(self) -> List[Dict]:
+        """Devolver hasta ``batch_size`` consultas nuevas"""
+        if self.conn is None and not self.open():
+            return []
+
+        try:
+            rows = self.conn.execute(
+                "SELECT id, timestamp, type, domain, client FROM queries "
+                "WHERE id > ? ORDER BY id LIMIT ?",
+                (self.last_id, self.batch_size)
+            ).fetchall()
+            if not rows:
+                # Detectar una base recreada (ids reiniciados)
+                max_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM queries").fetchone()[0]
+                if max_id < self.last_id:
+                    self.logger.info("🔄 Base FTL reiniciada - leyendo desde el principio")
+                    self.last_id = 0
+        except sqlite3.OperationalError as e:
+            # Base bloqueada por FTL o reemplazada: reintentar más tarde
+            self._log_error(f"⚠️ Error leyendo la base FTL: {e}")
+            self.close_connection()
+            return []
+        self._error_logged = False
+
+        queries = []
+        for query_id, timestamp, query_type, domain, client in rows:
+            if domain:
+                queries.append({
+                    'id': query_id,
+                    'timestamp': float(timestamp),
+                    'domain': domain,
+                    'client_ip': client,
+                    'query_type': FTL_QUERY_TYPES.get(query_type, str(query_type)),
+                })
+        if rows:
+            self.last_id = rows[-1][0]
+        self._backlog = len(rows) >= self.batch_size
+        self._update_lag(rows)
+
+        if self.state_file and time.monotonic() - self._last_state_save >= self.state_interval:
+            self.save_state()
+        return queries
+
+    def _update_lag(self, rows):
+        if not self._backlog:
+            self._lag = {'rows': 0, 'seconds': 0.0}
+            return
+        try:
+            max_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM queries").fetchone()[0]
+        except sqlite3.Error:
+            return
+        self._lag = {'rows': max(0, max_id - self.last_id),
+                     'seconds': max(0.0, time.time() - rows[-1][1])}
+
+    def lag(self) -> Dict[str, float]:
+        return dict(self._lag)
+
+    def batches(self, running: Callable[[], bool]) -> Iterator[List[Dict]]:
+        while running():
+            queries = self.read_queries()
+            yield queries
+            if not self._backlog:
+                time.sleep(self.poll_interval)
+
+    def close_connection(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def close(self):
+        self.save_state()
+        self.close_connection()
+
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Backends de redirección
+Instalan en el kernel la redirección de IPs WARP hacia el proxy transparente
+"""
+
+import logging
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from rule_applier import RuleApplier
+
+CHAIN_NAME = "WARP_REDIRECT"
+IPSET_NAME_V4 = "WARP_IPS"
+IPSET_NAME_V6 = "WARP_IPS6"
+IPSET_NETS_V4 = "WARP_NETS"
+IPSET_NETS_V6 = "WARP_NETS6"
+NFT_TABLE = "antitebas"
+NFT_CHAIN = "warp_redirect"
+NFT_SET_V4 = "warp_ips"
+NFT_SET_V6 = "warp_ips6"
+NFT_NETS_V4 = "warp_nets"
+NFT_NETS_V6 = "warp_nets6"
+
+Runner = Callable[..., subprocess.CompletedProcess]
+
+
+def run_command(cmd: List[str], input_data: Optional[str] = None) -> subprocess.CompletedProcess:
+    """Ejecutar comando del sistema capturando salida (runner por defecto)"""
+    return subprocess.run(cmd, input=input_data, capture_output=True, text=True, check=False)
+
+
+def is_ipv6(ip: str) -> bool:
+    return ':' in ip
+
+
+class RedirectBackend:
+    """Base de los backends de redirección
+
+    Las IPs se encolan con ``add_ips``/``remove_ips`` (sin lanzar procesos)
+    y se aplican en lote con ``flush``, que el controlador llama desde un
+    hilo propio.
+    Los rangos CIDR de la lista de IPs se fijan con ``set_networks`` y se
+    instalan aparte, sin timeout ni entrada en la tabla de redirecciones.
+    El ``runner`` permite sustituir la ejecución de comandos en tests.
+    """
+
+    name = "base"
+    # True si el kernel retira las IPs caducadas por sí mismo
+    native_timeouts = False
+
+    def __init__(self, redirect_port: int = 8080, runner: Runner = run_command,
+                 logger: Optional[logging.Logger] = None):
+        self.redirect_port = int(redirect_port)
+        self.runner = runner
+        self.logger = logger or logging.getLogger('AntiTebas')
+        self.installed: Set[str] = set()
+        self.pending: Set[str] = set()
+        self.pending_removal: Set[str] = set()
+        # Rangos CIDR instalados y rangos deseados pendientes de aplicar (None = sin cambios)
+        self.networks: Set[str] = set()
+        self.pending_networks: Optional[Set[str]] = None
+        self.ipv6_enabled = False
+        self._lock = threading.Lock()
+
+    def setup(self) -> bool:
+        """Preparar cadena/sets en el kernel (IPv6 es opcional)"""
+        if not self._setup_family("iptables"):
+            return False
+
+        self.ipv6_enabled = self._setup_family("ip6tables")
+        if not self.ipv6_enabled:
+            self.logger.warning("⚠️ ip6tables no disponible - solo se redirigirá IPv4")
+        return True
+
+    def _setup_family(self, iptables: str) -> bool:
+        """Preparar una familia (iptables o ip6tables)"""
+        raise NotImplementedError
+
+    def add_ips(self, ips: Iterable[str], ttl: Optional[int] = None) -> int:
+        """Encolar IPs para redirección, devolver cuántas son nuevas
+
+        ``ttl`` solo lo usan los backends con ``native_timeouts``.
+        """
+        queued = 0
+        with self._lock:
+            for ip in ips:
+                self.pending_removal.discard(ip)
+                if ip not in self.installed and ip not in self.pending:
+                    self.pending.add(ip)
+                    queued += 1
+        return queued
+
+    def remove_ips(self, ips: Iterable[str]) -> int:
+        """Encolar IPs para dejar de redirigirlas, devolver cuántas se encolaron"""
+        queued = 0
+        with self._lock:
+            for ip in ips:
+                self.pending.discard(ip)
+                if ip in self.installed and ip not in self.pending_removal:
+                    self.pending_removal.add(ip)
+                    queued += 1
+        return queued
+
+    def set_networks(self, networks: Iterable[str]):
+        """Fijar los rangos CIDR a redirigir (se aplican en el próximo flush)"""
+        with self._lock:
+            self.pending_networks = set(networks)
+
+    def flush(self) -> int:
+        """Aplicar altas y bajas pendientes, devolver cuántos cambios se aplicaron"""
+        changed = self._flush_networks()
+        with self._lock:
+            if not self.pending and not self.pending_removal:
+                return changed
+            additions, self.pending = self.pending, set()
+            removals, self.pending_removal = self.pending_removal, set()
+
+        if not self.ipv6_enabled:
+            additions = {ip for ip in additions if not is_ipv6(ip)}
+            if not additions and not removals:
+                return changed
+
+        added, removed = self._commit(additions, removals)
+        with self._lock:
+            self.installed.update(added)
+            self.installed.difference_update(removed)
+            # Reintentar en el próximo flush los cambios que fallaron
+            self.pending.update(additions - added)
+            self.pending_removal.update(removals - removed)
+        return changed + len(added) + len(removed)
+
+    def _flush_networks(self) -> int:
+        """Ajustar los rangos instalados a los deseados, devolver cuántos cambiaron"""
+        with self._lock:
+            desired, self.pending_networks = self.pending_networks, None
+            if desired is None:
+                return 0
+            additions = {net for net in desired - self.networks if self.ipv6_enabled or not is_ipv6(net)}
+            removals = self.networks - desired
+        if not additions and not removals:
+            return 0
+
+        added, removed = self._commit_networks(additions, removals)
+        with self._lock:
+            self.networks.update(added)
+            self.networks.difference_update(removed)
+            # Reintentar en el próximo flush salvo que ya haya rangos nuevos
+            if (added != additions or removed != removals) and self.pending_networks is None:
+                self.pending_networks = desired
+        return len(added) + len(removed)
+
+    def _commit(self, additions: Set[str], removals: Set[str]) -> Tuple[Set[str], Set[str]]:
+        """Aplicar un lote, devolver (IPs agregadas, IPs eliminadas)"""
+        raise NotImplementedError
+
+    def _commit_networks(self, additions: Set[str], removals: Set[str]) -> Tuple[Set[str], Set[str]]:
+        """Aplicar altas y bajas de rangos CIDR, devolver (agregados, eliminados)"""
+        raise NotImplementedError
+
+    def rule_count(self) -> int:
+        """Número de reglas de redirección instaladas en la cadena"""
+        raise NotImplementedError
+
+    def _run(self, cmd: List[str], input_data: Optional[str] = None) -> subprocess.CompletedProcess:
+        return self.runner(cmd, input_data=input_data)
+
+    def _ensure_chain(self, iptables: str) -> bool:
+        """Crear WARP_REDIRECT y saltar a ella desde PREROUTING"""
+        self._run([iptables, "-t", "nat", "-N", CHAIN_NAME])
+
+        result = self._run([iptables, "-t", "nat", "-C", "PREROUTING", "-j", CHAIN_NAME])
+        if result.returncode != 0:
+            result = self._run([iptables, "-t", "nat", "-I", "PREROUTING", "-j", CHAIN_NAME])
+            if result.returncode != 0:
+                self.logger.error(f"❌ Error enlazando {CHAIN_NAME} en PREROUTING ({iptables}): "
+                                  f"{(result.stderr or '').strip()}")
+                return False
+        return True
+
+
+class IptablesBackend(RedirectBackend):
+    """Una regla REDIRECT por IP en la cadena WARP_REDIRECT (modo clásico)
+
+    Cada rango CIDR es también una regla (``-d 104.16.0.0/13``). Los cambios se reconcilian con ``RuleApplier``: un ``iptables-save`` al
+    arrancar y un ``iptables-restore --noflush`` por familia en cada flush.
+    """
+
+    name = "iptables"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.appliers = {
+            iptables: RuleApplier(self.runner, self.redirect_port, iptables, self.logger)
+            for iptables in ("iptables", "ip6tables")
+        }
+
+    def _setup_family(self, iptables: str) -> bool:
+        if not self._ensure_chain(iptables):
+            return False
+
+        # Reconciliación de arranque: adoptar reglas existentes, eliminar duplicados
+        live = self.appliers[iptables].reconcile()
+        with self._lock:
+            self.installed.update(ip for ip in live if '/' not in ip)
+            self.networks.update(net for net in live if '/' in net)
+        return True
+
+    def _commit(self, additions: Set[str], removals: Set[str]) -> Tuple[Set[str], Set[str]]:
+        added: Set[str] = set()
+        removed: Set[str] = set()
+        for iptables, applier in self.appliers.items():
+            v6 = iptables == "ip6tables"
+            family_add = {ip for ip in additions if is_ipv6(ip) == v6}
+            family_del = {ip for ip in removals if is_ipv6(ip) == v6}
+            if not family_add and not family_del:
+                continue
+
+            applier.add(family_add)
+            applier.discard(family_del)
+            applier.commit()
+            if applier.live is None:
+                # Transacción fallida: no marcar nada como aplicado
+                applier.discard(family_add)
+                applier.add(family_del)
+                continue
+            added.update(ip for ip in family_add if ip in applier.live)
+            removed.update(ip for ip in family_del if ip not in applier.live)
+        return added, removed
+
+    # Los rangos son reglas de la misma cadena: mismo diff y misma transacción
+    _commit_networks = _commit
+
+    def rule_count(self) -> int:
+        return sum(len(applier.live or {}) for applier in self.appliers.values())
+
+
+class IpsetBackend(RedirectBackend):
+    """Una regla por set que consulta un ipset hash:ip (IPs) o hash:net (rangos)
+
+    El kernel resuelve la pertenencia con una búsqueda hash y las IPs nuevas
+    se cargan en lote con un solo ``ipset restore`` por flush.
+    """
+
+    name = "ipset"
+
+    SETS = {
+        "iptables": [(IPSET_NAME_V4, "hash:ip", "inet"), (IPSET_NETS_V4, "hash:net", "inet")],
+        "ip6tables": [(IPSET_NAME_V6, "hash:ip", "inet6"), (IPSET_NETS_V6, "hash:net", "inet6")],
+    }
+
+    def _setup_family(self, iptables: str) -> bool:
+        for set_name, set_type, family in self.SETS[iptables]:
+            if not self._setup_set(iptables, set_name, set_type, family):
+                return False
+        return True
+
+    def _setup_set(self, iptables: str, set_name: str, set_type: str, family: str) -> bool:
+        result = self._run(["ipset", "create", set_name, set_type, "family", family, "-exist"])
+        if result.returncode != 0:
+            self.logger.error(f"❌ Error creando ipset {set_name}: {(result.stderr or '').strip()}")
+            return False
+
+        # Adoptar las IPs (o rangos) que el set conserva de una ejecución anterior
+        result = self._run(["ipset", "save", set_name])
+        if result.returncode == 0:
+            prefix = f"add {set_name} "
+            members = {line[len(prefix):].split()[0] for line in (result.stdout or '').splitlines()
+                       if line.startswith(prefix)}
+            with self._lock:
+                (self.networks if set_type == "hash:net" else self.installed).update(members)
+
+        if not self._ensure_chain(iptables):
+            return False
+
+        rule = ["-p", "tcp", "-m", "set", "--match-set", set_name, "dst",
+                "-j", "REDIRECT", "--to-port", str(self.redirect_port)]
+        if self._run([iptables, "-t", "nat", "-C", CHAIN_NAME] + rule).returncode != 0:
+            result = self._run([iptables, "-t", "nat", "-A", CHAIN_NAME] + rule)
+            if result.returncode != 0:
+                self.logger.error(f"❌ Error agregando regla ipset ({iptables}): "
+                                  f"{(result.stderr or '').strip()}")
+                return False
+        return True
+
+    def _restore(self, additions: Set[str], removals: Set[str], set_v4: str, set_v6: str,
+                 what: str) -> Tuple[Set[str], Set[str]]:
+        """Cargar un lote con un solo ``ipset restore``"""
+        lines = [
+            f"del {set_v6 if is_ipv6(ip) else set_v4} {ip}"
+            for ip in sorted(removals)
+        ] + [
+            f"add {set_v6 if is_ipv6(ip) else set_v4} {ip}"
+            for ip in sorted(additions)
+        ]
+        result = self._run(["ipset", "restore", "-exist"], input_data="\n".join(lines) + "\n")
+        if result.returncode != 0:
+            self.logger.error(f"❌ Error aplicando lote ipset (+{len(additions)} -{len(removals)}): "
+                              f"{(result.stderr or '').strip()}")
+            return set(), set()
+
+        self.logger.info(f"ipset WARP actualizado: +{len(additions)} -{len(removals)} {what}")
+        return set(additions), set(removals)
+
+    def _commit(self, additions: Set[str], removals: Set[str]) -> Tuple[Set[str], Set[str]]:
+        return self._restore(additions, removals, IPSET_NAME_V4, IPSET_NAME_V6, "IPs")
+
+    def _commit_networks(self, additions: Set[str], removals: Set[str]) -> Tuple[Set[str], Set[str]]:
+        return self._restore(additions, removals, IPSET_NETS_V4, IPSET_NETS_V6, "rangos")
+
+    def rule_count(self) -> int:
+        return 4 if self.ipv6_enabled else 2
+
+
+class NftablesBackend(RedirectBackend):
+    """Tabla nftables propia con sets ``ipv4_addr``/``ipv6_addr`` con timeout
+
+    Una regla por set redirige al proxy y cada IP se carga con su TTL como
+    timeout del elemento: el kernel la retira al caducar, sin barridos ni
+    borrados desde el controlador. Los rangos CIDR van en sets aparte con
+    ``flags interval`` y sin timeout. Cada flush es una única transacción
+    ``nft -f -``.
+    """
+
+    name = "nft"
+    native_timeouts = True
+
+    SETS = {False: NFT_SET_V4, True: NFT_SET_V6}
+    NET_SETS = {False: NFT_NETS_V4, True: NFT_NETS_V6}
+
+    def __init__(self, *args, default_timeout: int = 300, clock: Callable[[], float] = time.monotonic,
+                 **kwargs):
+        super().__init__(*args, **kwargs)
+        self.default_timeout = default_timeout
+        self.clock = clock
+        # Caducidad de cada elemento en el kernel (copia local) y timeouts pendientes
+        self._expiry: Dict[str, float] = {}
+        self._timeouts: Dict[str, int] = {}
+
+    def setup(self) -> bool:
+        """Crear tabla, sets y reglas en una transacción
+
+        Los sets de IPs se conservan; los de rangos se vacían y se vuelven a
+        cargar desde la lista en el siguiente flush.
+        """
+        table = f"inet {NFT_TABLE}"
+        script = "\n".join([
+            f"add table {table}",
+            f"add set {table} {NFT_SET_V4} {{ type ipv4_addr; flags timeout; }}",
+            f"add set {table} {NFT_SET_V6} {{ type ipv6_addr; flags timeout; }}",
+            f"add set {table} {NFT_NETS_V4} {{ type ipv4_addr; flags interval; }}",
+            f"add set {table} {NFT_NETS_V6} {{ type ipv6_addr; flags interval; }}",
+            f"flush set {table} {NFT_NETS_V4}",
+            f"flush set {table} {NFT_NETS_V6}",
+            f"add chain {table} {NFT_CHAIN} {{ type nat hook prerouting priority dstnat; policy accept; }}",
+            f"flush chain {table} {NFT_CHAIN}",
+        ] + [
+            f"add rule {table} {NFT_CHAIN} {match} daddr @{set_name} meta l4proto tcp "
+            f"redirect to :{self.redirect_port}"
+            for match, set_name in (("ip", NFT_SET_V4), ("ip6", NFT_SET_V6),
+                                    ("ip", NFT_NETS_V4), ("ip6", NFT_NETS_V6))
+        ]) + "\n"
+        result = self._run(["nft", "-f", "-"], input_data=script)
+        if result.returncode != 0:
+            self.logger.error(f"❌ Error creando la tabla nftables {NFT_TABLE}: {(result.stderr or '').strip()}")
+            return False
+        with self._lock:
+            self.networks.clear()
+        self.ipv6_enabled = True
+        return True
+
+    def add_ips(self, ips: Iterable[str], ttl: Optional[int] = None) -> int:
+        """Encolar IPs nuevas o cuyo elemento caducaría antes que ``ahora + ttl``
+
+        La tabla de redirecciones renueva la caducidad a ``última aparición +
+        ttl`` con cada respuesta: el timeout del kernel tiene que seguirla o
+        el elemento caducaría antes que la respuesta DNS en caché del
+        cliente. Las renovaciones se agrupan en el siguiente flush.
+        """
+        ttl = int(ttl or self.default_timeout)
+        now = self.clock()
+        queued = 0
+        with self._lock:
+            for ip in ips:
+                self.pending_removal.discard(ip)
+                if self._expiry.get(ip, 0) >= now + ttl:
+                    continue
+                if ip not in self.pending:
+                    self.pending.add(ip)
+                    queued += 1
+                self._timeouts[ip] = max(ttl, self._timeouts.get(ip, 0))
+        return queued
+
+    def forget(self, ips: Iterable[str]):
+        """Olvidar IPs que el kernel ya ha retirado por timeout"""
+        now = self.clock()
+        with self._lock:
+            for ip in ips:
+                if self._expiry.get(ip, 0) <= now:
+                    self._expiry.pop(ip, None)
+                    self.installed.discard(ip)
+
+    def _elements(self, ips: Iterable[str], timeouts: Optional[Dict[str, int]] = None,
+                  sets: Optional[Dict[bool, str]] = None) -> List[Tuple[str, str]]:
+        """(set, elementos) por familia para una sentencia ``element``"""
+        statements = []
+        for v6, set_name in (sets or self.SETS).items():
+            family = sorted(ip for ip in ips if is_ipv6(ip) == v6)
+            if not family:
+                continue
+            if timeouts is None:
+                statements.append((set_name, ", ".join(family)))
+            else:
+                statements.append((set_name, ", ".join(f"{ip} timeout {timeouts[ip]}s" for ip in family)))
+        return statements
+
+    def _commit(self, additions: Set[str], removals: Set[str]) -> Tuple[Set[str], Set[str]]:
+        with self._lock:
+            timeouts = {ip: self._timeouts.pop(ip, self.default_timeout) for ip in additions}
+
+        # "add" antes de "delete" para que el borrado no falle si el elemento ya
+        # caducó; las IPs renovadas se borran y se vuelven a crear con el timeout nuevo
+        table = f"inet {NFT_TABLE}"
+        lines = []
+        for set_name, elements in self._elements(removals | additions):
+            lines.append(f"add element {table} {set_name} {{ {elements} }}")
+            lines.append(f"delete element {table} {set_name} {{ {elements} }}")
+        for set_name, elements in self._elements(additions, timeouts):
+            lines.append(f"add element {table} {set_name} {{ {elements} }}")
+
+        result = self._run(["nft", "-f", "-"], input_data="\n".join(lines) + "\n")
+        if result.returncode != 0:
+            self.logger.error(f"❌ Error aplicando lote nftables (+{len(additions)} -{len(removals)}): "
+                              f"{(result.stderr or '').strip()}")
+            with self._lock:
+                for ip, timeout in timeouts.items():
+                    self._timeouts[ip] = max(timeout, self._timeouts.get(ip, 0))
+            return set(), set()
+
+        now = self.clock()
+        with self._lock:
+            for ip in removals:
+                self._expiry.pop(ip, None)
+            for ip, timeout in timeouts.items():
+                self._expiry[ip] = now + timeout
+        self.logger.info(f"nftables WARP actualizado: +{len(additions)} -{len(removals)} IPs")
+        return set(additions), set(removals)
+
+    def _commit_networks(self, additions: Set[str], removals: Set[str]) -> Tuple[Set[str], Set[str]]:
+        # Bajas antes que altas: un rango nuevo puede solapar a uno retirado
+        table = f"inet {NFT_TABLE}"
+        lines = [f"delete element {table} {set_name} {{ {elements} }}"
+                 for set_name, elements in self._elements(removals, sets=self.NET_SETS)]
+        lines += [f"add element {table} {set_name} {{ {elements} }}"
+                  for set_name, elements in self._elements(additions, sets=self.NET_SETS)]
+        result = self._run(["nft", "-f", "-"], input_data="\n".join(lines) + "\n")
+        if result.returncode != 0:
+            self.logger.error(f"❌ Error aplicando rangos nftables (+{len(additions)} -{len(removals)}): "
+                              f"{(result.stderr or '').strip()}")
+            return set(), set()
+        self.logger.info(f"nftables WARP actualizado: +{len(additions)} -{len(removals)} rangos")
+        return set(additions), set(removals)
+
+    def rule_count(self) -> int:
+        return 4
+
+
+BACKENDS: Dict[str, type] = {
+    IptablesBackend.name: IptablesBackend,
+    IpsetBackend.name: IpsetBackend,
+    NftablesBackend.name: NftablesBackend,
+}
+
+
+def create_backend(name: str, **kwargs) -> RedirectBackend:
+    """Instanciar backend de redirección por nombre"""
+    try:
+        backend_class = BACKENDS[name.strip().lower()]
+    except KeyError:
+        raise ValueError(f"Backend de redirección desconocido: {name} "
+                         f"(disponibles: {', '.join(sorted(BACKENDS))})")
+    return backend_class(**kwargs)
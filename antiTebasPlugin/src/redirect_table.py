@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Tabla de redirecciones
+IPs redirigidas con su última aparición y TTL DNS: caducan por lotes y
+la tabla se mantiene acotada desalojando las menos recientes (LRU)
+"""
+
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional, Tuple
+
+
+class RedirectTable:
+    """IPs redirigidas con caducidad ``última aparición + TTL``
+
+    - ``touch`` registra (o renueva) IPs y devuelve las desalojadas, como
+      pares (ip, dominio), si se supera ``max_size``.
+    - ``expire`` devuelve hasta ``limit`` IPs caducadas, usando un montículo
+      por fecha de caducidad (coste proporcional a las IPs que caducan, no
+      al tamaño de la tabla).
+
+    El TTL se limita a [``min_ttl``, ``max_ttl``]: las conexiones suelen
+    durar más que el TTL de la respuesta DNS.
+    """
+
+    def __init__(self, max_size: int = 65536, min_ttl: int = 300, max_ttl: int = 86400,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.clock = clock
+
+        # ip → (caduca, dominio), ordenado de menos a más reciente
+        self._entries: "OrderedDict[str, Tuple[float, Optional[str]]]" = OrderedDict()
+        # (caduca, ip); las entradas renovadas quedan obsoletas y se ignoran al salir
+        self._heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+        self.stats = {'expired': 0, 'evicted': 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, ip: str) -> bool:
+        return ip in self._entries
+
+    def clamp_ttl(self, ttl: Optional[int]) -> int:
+        return min(max(ttl or 0, self.min_ttl), self.max_ttl)
+
+    def touch(self, ips: Iterable[str], ttl: Optional[int] = None,
+              domain: Optional[str] = None) -> List[Tuple[str, Optional[str]]]:
+        """Registrar IPs vistas ahora; devolver las desalojadas por tamaño (ip, dominio)"""
+        ttl = self.clamp_ttl(ttl)
+        expires = self.clock() + ttl
+        evicted = []
+        with self._lock:
+            for ip in ips:
+                current = self._entries.get(ip)
+                if current is not None and current[0] >= expires:
+                    # Ya caduca más tarde (TTL mayor de otra respuesta)
+                    self._entries.move_to_end(ip)
+                    continue
+                self._entries[ip] = (expires, domain)
+                self._entries.move_to_end(ip)
+                heapq.heappush(self._heap, (expires, ip))
+
+            while len(self._entries) > self.max_size:
+                ip, (_, owner) = self._entries.popitem(last=False)
+                evicted.append((ip, owner))
+            self.stats['evicted'] += len(evicted)
+            self._compact()
+        return evicted
+
+    def expire(self, limit: int = 1000) -> List[str]:
+        """Quitar y devolver hasta ``limit`` IPs caducadas"""
+        return [ip for ip, _ in self.pop_expired(limit)]
+
+    def pop_expired(self, limit: int = 1000) -> List[Tuple[str, Optional[str]]]:
+        """Como ``expire``, pero devolviendo pares (ip, dominio)"""
+        now = self.clock()
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(expired) < limit:
+                expires, ip = heapq.heappop(self._heap)
+                entry = self._entries.get(ip)
+                if entry is not None and entry[0] == expires:
+                    del self._entries[ip]
+                    expired.append((ip, entry[1]))
+            self.stats['expired'] += len(expired)
+        return expired
+
+    def remove(self, ips: Iterable[str]):
+        with self._lock:
+            for ip in ips:
+                self._entries.pop(ip, None)
+
+    def domain(self, ip: str) -> Optional[str]:
+        entry = self._entries.get(ip)
+        return entry[1] if entry else None
+
+    def _compact(self):
+        """Reconstruir el montículo si acumula demasiadas entradas obsoletas"""
+        if len(self._heap) > 2 * len(self._entries) + 1024:
+            self._heap = [(expires, ip) for ip, (expires, _) in self._entries.items()]
+            heapq.heapify(self._heap)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Aplicador de reglas por lotes
+Reconcilia la cadena WARP_REDIRECT con iptables-save / iptables-restore
+"""
+
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+CHAIN_NAME = "WARP_REDIRECT"
+
+
+class RuleApplier:
+    """Estado deseado de la cadena WARP_REDIRECT para una familia
+
+    Las IPs deseadas se acumulan en memoria. ``commit`` compara ese estado
+    con el contenido real de la cadena (leído una sola vez con
+    ``iptables-save``) y aplica altas y bajas en una única transacción
+    ``iptables-restore --noflush``, que el kernel aplica de forma atómica.
+    """
+
+    def __init__(self, runner: Callable, redirect_port: int = 8080, iptables: str = "iptables",
+                 logger: Optional[logging.Logger] = None):
+        self.runner = runner
+        self.redirect_port = int(redirect_port)
+        self.iptables = iptables
+        self.logger = logger or logging.getLogger('AntiTebas')
+        self.host_prefix = "/128" if iptables == "ip6tables" else "/32"
+        self.desired: Set[str] = set()
+        # IP → reglas presentes en el kernel (puede haber duplicados)
+        self.live: Optional[Dict[str, List[str]]] = None
+
+    def rule(self, ip: str, action: str = "-A") -> str:
+        """Regla en formato iptables-save para una IP o un rango CIDR"""
+        destination = ip if '/' in ip else ip + self.host_prefix
+        return (f"{action} {CHAIN_NAME} -d {destination} -p tcp "
+                f"-j REDIRECT --to-ports {self.redirect_port}")
+
+    def parse_save(self, output: str) -> Dict[str, List[str]]:
+        """Extraer reglas REDIRECT por IP de la salida de iptables-save"""
+        live: Dict[str, List[str]] = {}
+        prefix = f"-A {CHAIN_NAME} "
+        for line in output.splitlines():
+            if not line.startswith(prefix) or "REDIRECT" not in line:
+                continue
+            parts = line.split()
+            try:
+                ip = parts[parts.index("-d") + 1]
+            except (ValueError, IndexError):
+                # Regla sin destino (p. ej. regla de ipset): no es nuestra
+                continue
+            # Las IPs sueltas aparecen como /32 (/128); los rangos conservan su prefijo
+            if ip.endswith(self.host_prefix):
+                ip = ip[:-len(self.host_prefix)]
+            live.setdefault(ip, []).append(line)
+        return live
+
+    def load_live(self) -> bool:
+        """Leer la cadena actual del kernel (una llamada a iptables-save)"""
+        result = self.runner([f"{self.iptables}-save", "-t", "nat"])
+        if result.returncode != 0:
+            self.logger.error(f"❌ Error leyendo reglas con {self.iptables}-save: "
+                              f"{(result.stderr or '').strip()}")
+            self.live = None
+            return False
+        self.live = self.parse_save(result.stdout or '')
+        return True
+
+    def add(self, ips: Iterable[str]):
+        self.desired.update(ips)
+
+    def discard(self, ips: Iterable[str]):
+        self.desired.difference_update(ips)
+
+    def diff(self) -> Tuple[List[str], List[str]]:
+        """Calcular reglas a agregar y a eliminar respecto al estado real"""
+        live = self.live or {}
+        additions = [self.rule(ip) for ip in sorted(self.desired) if ip not in live]
+        removals = []
+        for ip, lines in sorted(live.items()):
+            # Bajas de IPs no deseadas y duplicados de ejecuciones anteriores
+            keep = 1 if ip in self.desired else 0
+            removals.extend("-D" + line[2:] for line in lines[keep:])
+        return additions, removals
+
+    def commit(self) -> Tuple[Set[str], Set[str]]:
+        """Aplicar el diff en una transacción, devolver (IPs agregadas, IPs eliminadas)"""
+        if self.live is None and not self.load_live():
+            return set(), set()
+
+        additions, removals = self.diff()
+        if not additions and not removals:
+            return set(), set()
+
+        payload = "\n".join(["*nat"] + removals + additions + ["COMMIT"]) + "\n"
+        result = self.runner([f"{self.iptables}-restore", "--noflush"], input_data=payload)
+        if result.returncode != 0:
+            self.logger.error(f"❌ Error en {self.iptables}-restore ({len(additions)} altas, "
+                              f"{len(removals)} bajas): {(result.stderr or '').strip()}")
+            # Volver a leer el estado real en el próximo commit
+            self.live = None
+            return set(), set()
+
+        added = {ip for ip in self.desired if ip not in self.live}
+        removed = {ip for ip in self.live if ip not in self.desired}
+        for ip in removed:
+            del self.live[ip]
+        for ip, lines in self.live.items():
+            del lines[1:]
+        for ip in added:
+            self.live[ip] = [self.rule(ip)]
+
+        self.logger.info(f"Reglas {CHAIN_NAME} aplicadas ({self.iptables}): "
+                         f"+{len(added)} -{len(removed)}")
+        return added, removed
+
+    def reconcile(self, adopt_live: bool = True) -> Set[str]:
+        """Reconciliación tras un reinicio: leer la cadena y limpiarla en un paso
+
+        Con ``adopt_live`` las IPs ya presentes en el kernel pasan a ser
+        deseadas (solo se eliminan duplicados); sin él, la cadena se ajusta
+        exactamente a ``desired``. Devuelve las IPs instaladas tras reconciliar.
+        """
+        if not self.load_live():
+            return set()
+        if adopt_live:
+            self.desired.update(self.live)
+        self.commit()
+        return set(self.live or {})
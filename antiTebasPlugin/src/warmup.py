@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+AntiTebasPlugin - Precalentamiento de redirecciones
+Resuelve por adelantado los dominios WARP (entradas de la lista y dominios
+consultados con frecuencia) para que sus IPs estén redirigidas antes de la
+primera conexión del cliente
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Callable, Deque, Iterable, List, Optional, Sequence, Set, Tuple
+
+ResolveFunc = Callable[[str], Tuple[Set[str], int]]
+ResolvedCallback = Callable[[str, Set[str], int], None]
+# (día de la semana o None para todos, hora, minuto)
+Window = Tuple[Optional[int], int, int]
+
+WEEKDAYS = ('lun', 'mar', 'mie', 'jue', 'vie', 'sab', 'dom')
+
+
+def parse_schedule(value: str) -> Tuple[List[Window], int]:
+    """Leer ventanas ``HH:MM`` o ``dia HH:MM`` separadas por comas, devolver (ventanas, inválidas)
+
+    ``"21:00, sab 16:15"`` → ``[(None, 21, 0), (5, 16, 15)]``; los días son
+    ``lun mar mie jue vie sab dom``.
+    """
+    windows = []
+    invalid = 0
+    for entry in value.split(','):
+        parts = entry.split()
+        if not parts:
+            continue
+        try:
+            weekday = WEEKDAYS.index(parts[0].lower()) if len(parts) == 2 else None
+            hour, minute = (int(n) for n in parts[-1].split(':'))
+            if len(parts) > 2 or not (0 <= hour < 24 and 0 <= minute < 60):
+                raise ValueError(entry)
+        except ValueError:
+            invalid += 1
+            continue
+        windows.append((weekday, hour, minute))
+    return windows, invalid
+
+
+def next_trigger(windows: Sequence[Window], lead: float, now: datetime) -> Optional[datetime]:
+    """Próximo instante posterior a ``now`` que queda ``lead`` segundos antes de una ventana"""
+    triggers = []
+    for weekday, hour, minute in windows:
+        for days in range(9):
+            day = now.date() + timedelta(days=days)
+            if weekday is not None and day.weekday() != weekday:
+                continue
+            trigger = datetime(day.year, day.month, day.day, hour, minute) - timedelta(seconds=lead)
+            if trigger > now:
+                triggers.append(trigger)
+                break
+    return min(triggers, default=None)
+
+
+class WarmupScheduler:
+    """Cola de pre-resolución con límite de concurrencia y de ritmo
+
+    - ``schedule`` encola dominios (sin duplicados; como mucho
+      ``max_pending``, el resto se descarta).
+    - ``concurrency`` hilos resuelven la cola, con un cubo de fichas que
+      limita el total a ``rate`` resoluciones por segundo: el
+      precalentamiento no compite con las resoluciones de consultas reales.
+    - ``touch`` registra un dominio consultado; los ``hot_size`` más
+      recientes se vuelven a resolver cada ``refresh_interval`` segundos,
+      para que sus redirecciones no caduquen mientras sigan en uso.
+    - ``windows`` (horarios de partido): ``lead`` segundos antes de cada
+      ventana se llama a ``on_window`` (por defecto, encolar los dominios
+      calientes), para que la oleada de conexiones encuentre las
+      redirecciones ya instaladas.
+    """
+
+    def __init__(self, resolve: ResolveFunc, on_resolved: ResolvedCallback, concurrency: int = 2,
+                 rate: float = 10.0, hot_size: int = 200, refresh_interval: float = 300.0,
+                 max_pending: int = 10000, logger: Optional[logging.Logger] = None,
+                 clock: Callable[[], float] = time.monotonic, windows: Sequence[Window] = (),
+                 lead: float = 900.0, on_window: Optional[Callable[[], object]] = None,
+                 wall_clock: Callable[[], datetime] = datetime.now):
+        self.resolve = resolve
+        self.on_resolved = on_resolved
+        self.concurrency = max(1, concurrency)
+        self.rate = rate
+        self.hot_size = hot_size
+        self.refresh_interval = refresh_interval
+        self.max_pending = max_pending
+        self.logger = logger or logging.getLogger('AntiTebas')
+        self.clock = clock
+        self.windows = list(windows)
+        self.lead = lead
+        self.on_window = on_window
+        self.wall_clock = wall_clock
+        self.planner_poll = 60.0   # tramo máximo de espera del planificador (s)
+
+        self._queue: Deque[str] = deque()
+        self._queued: Set[str] = set()
+        self._hot: "OrderedDict[str, int]" = OrderedDict()   # dominio → consultas, de menos a más reciente
+        self._cond = threading.Condition()
+        self._tokens = 1.0
+        self._last_refill = clock()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        self.stats = {'scheduled': 0, 'resolved': 0, 'failed': 0, 'dropped': 0, 'windows': 0}
+
+    @property
+    def started(self) -> bool:
+        return bool(self._threads)
+
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def schedule(self, domains: Iterable[str], front: bool = False) -> int:
+        """Encolar dominios para resolver; devolver cuántos son nuevos en la cola"""
+        added = 0
+        with self._cond:
+            for domain in domains:
+                if domain in self._queued:
+                    continue
+                if len(self._queue) >= self.max_pending:
+                    self.stats['dropped'] += 1
+                    continue
+                if front:
+                    self._queue.appendleft(domain)
+                else:
+                    self._queue.append(domain)
+                self._queued.add(domain)
+                added += 1
+            self.stats['scheduled'] += added
+            if added:
+                self._cond.notify_all()
+        return added
+
+    def touch(self, domain: str):
+        """Registrar una consulta WARP (dominios calientes)"""
+        with self._cond:
+            self._hot[domain] = self._hot.pop(domain, 0) + 1
+            while len(self._hot) > self.hot_size:
+                self._hot.popitem(last=False)
+
+    def hot_domains(self) -> List[str]:
+        """Dominios calientes, los más consultados primero"""
+        with self._cond:
+            return sorted(self._hot, key=self._hot.__getitem__, reverse=True)
+
+    def _take(self) -> Optional[str]:
+        """Esperar un dominio y una ficha del cubo; None al detener"""
+        with self._cond:
+            while not self._stopping.is_set():
+                if self._queue:
+                    wait = self._refill()
+                    if wait <= 0:
+                        self._tokens -= 1
+                        domain = self._queue.popleft()
+                        self._queued.discard(domain)
+                        return domain
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+        return None
+
+    def _refill(self) -> float:
+        """Rellenar el cubo; devolver los segundos hasta la próxima ficha (0 si hay)"""
+        if self.rate <= 0:
+            return 0.0
+        now = self.clock()
+        self._tokens = min(float(self.concurrency), self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def warm(self, domain: str) -> bool:
+        """Resolver un dominio y entregar sus IPs; devolver si hubo IPs"""
+        try:
+            ips, ttl = self.resolve(domain)
+        except Exception as e:
+            self.logger.debug(f"Precalentamiento de {domain} falló: {e}")
+            ips, ttl = set(), 0
+        if not ips:
+            self.stats['failed'] += 1
+            return False
+        self.stats['resolved'] += 1
+        self.on_resolved(domain, ips, ttl)
+        return True
+
+    def _worker(self):
+        while True:
+            domain = self._take()
+            if domain is None:
+                return
+            try:
+                self.warm(domain)
+            except Exception as e:
+                self.logger.error(f"Error en precalentamiento de {domain}: {e}")
+
+    def _refresher(self):
+        while not self._stopping.wait(self.refresh_interval):
+            hot = self.hot_domains()
+            if hot:
+                self.schedule(hot)
+
+    def _planner(self):
+        """Disparar ``on_window`` antes de cada ventana (espera en tramos: el reloj puede saltar)"""
+        trigger = next_trigger(self.windows, self.lead, self.wall_clock())
+        while trigger is not None:
+            wait = (trigger - self.wall_clock()).total_seconds()
+            if wait > 0:
+                if self._stopping.wait(min(wait, self.planner_poll)):
+                    return
+                continue
+            self.stats['windows'] += 1
+            self.logger.info(f"🔥 Ventana de las {trigger + timedelta(seconds=self.lead):%H:%M}: precalentando")
+            try:
+                if self.on_window is not None:
+                    self.on_window()
+                else:
+                    self.schedule(self.hot_domains())
+            except Exception as e:
+                self.logger.error(f"Error en el precalentamiento programado: {e}")
+            trigger = next_trigger(self.windows, self.lead, max(trigger, self.wall_clock()))
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        for i in range(self.concurrency):
+            self._threads.append(threading.Thread(target=self._worker, name=f"warmup-{i}", daemon=True))
+        if self.refresh_interval > 0:
+            self._threads.append(threading.Thread(target=self._refresher, name='warmup-refresh', daemon=True))
+        if self.windows:
+            self._threads.append(threading.Thread(target=self._planner, name='warmup-planner', daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stopping.set()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Soporte compartido por benchmarks y tests: cargar query-monitor.py con una
+configuración temporal, reloj manual y runner de comandos falso
+"""
+
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'antiTebasPlugin', 'src')
+sys.path.insert(0, SRC_DIR)
+
+
+def load_query_monitor():
+    """Importar query-monitor.py (el guion no es importable por nombre)"""
+    spec = importlib.util.spec_from_file_location('query_monitor', os.path.join(SRC_DIR, 'query-monitor.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_controller(domains=(), extra_config=None):
+    """Crear AntiTebasController con listas y logs en un directorio temporal"""
+    module = load_query_monitor()
+    workdir = Path(tempfile.mkdtemp(prefix='antitebas-test-'))
+
+    config = {
+        'LOG_FILE': str(workdir / 'warp-plugin.log'),
+        'DOMAIN_LIST_FILE': str(workdir / 'warp-domains.txt'),
+        'IP_LIST_FILE': str(workdir / 'warp-ips.txt'),
+        'LIST_CACHE_DIR': str(workdir / 'cache'),
+    }
+    config.update(extra_config or {})
+
+    config_file = workdir / 'warp-config.conf'
+    config_file.write_text(''.join(f"{key}={value}\n" for key, value in config.items()))
+    (workdir / 'warp-domains.txt').write_text(''.join(f"{d}\n" for d in domains))
+
+    module.CONFIG_FILE = config_file
+    controller = module.AntiTebasController()
+    controller.workdir = workdir
+    return controller
+
+
+class FakeClock:
+    """Reloj manual para los parámetros ``clock`` (se avanza con ``now``)"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRunner:
+    """Runner falso para backends y RuleApplier: registra comandos sin ejecutarlos
+
+    - ``outputs``: stdout por programa (p. ej. ``{'iptables-save': ...}``)
+    - ``fail_prefixes``: los comandos que empiezan así terminan con código 1
+    - ``record=False`` solo cuenta los comandos (benchmarks: no retiene las
+      entradas)
+    """
+
+    def __init__(self, outputs=None, fail_prefixes=(), record: bool = True):
+        self.outputs = outputs or {}
+        self.fail_prefixes = [list(p) for p in fail_prefixes]
+        self.record = record
+        self.count = 0
+        self.commands = []
+        self.inputs = []   # entrada de cada comando de ``commands`` (None si no hay)
+
+    def __call__(self, cmd, input_data=None):
+        self.count += 1
+        if self.record:
+            self.commands.append(cmd)
+            self.inputs.append(input_data)
+        failed = any(cmd[:len(p)] == p for p in self.fail_prefixes)
+        return subprocess.CompletedProcess(cmd, 1 if failed else 0, stdout=self.outputs.get(cmd[0], ''),
+                                           stderr='error' if failed else '')
+
+    def calls(self, program):
+        """Pares (comando, entrada) de un programa, en orden"""
+        return [(cmd, data) for cmd, data in zip(self.commands, self.inputs) if cmd[0] == program]
+
+    def inputs_of(self, program):
+        """Entradas no vacías de un programa (lotes de restore, scripts de nft)"""
+        return [data for _, data in self.calls(program) if data]
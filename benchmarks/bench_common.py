@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Utilidades comunes de los benchmarks: controlador con iptables y resolvedor
+falsos, medidas de latencia/memoria y resultados en JSON
+"""
+
+import json
+import logging
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(REPO_DIR, 'antiTebasPlugin', 'src'))
+sys.path.insert(0, BENCH_DIR)
+
+from _support import FakeRunner, make_controller  # noqa: E402
+from redirect_backends import create_backend  # noqa: E402
+
+# "-C" (comprobar regla) falla para que setup() cree cadena y reglas
+CHECK_PREFIXES = [(iptables, '-t', 'nat', '-C') for iptables in ('iptables', 'ip6tables')]
+
+
+def fake_resolve(domain: str):
+    """Resolución instantánea y determinista (1-2 IPv4 por dominio)"""
+    rng = random.Random(domain)
+    ips = {f"104.{rng.randint(16, 31)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+           for _ in range(rng.randint(1, 2))}
+    return ips, 300
+
+
+def bench_controller(domains: Sequence[str] = (), backend: str = 'ipset', extra_config=None):
+    """Controlador con lista de dominios, backend falso y resolvedor falso"""
+    config = {'LOG_LEVEL': 'WARNING', 'REDIRECT_BACKEND': backend}
+    config.update(extra_config or {})
+    controller = make_controller(domains=domains, extra_config=config)
+    controller.logger.setLevel(logging.WARNING)
+    # Solo cuenta los comandos: no retiene los lotes (medidas de memoria)
+    runner = FakeRunner(fail_prefixes=CHECK_PREFIXES, record=False)
+    controller.redirect_backend = create_backend(backend, redirect_port=int(controller.config['REDIRECT_PORT']),
+                                                 runner=runner, logger=controller.logger)
+    controller.redirect_backend.setup()
+    controller.resolver.resolve_func = fake_resolve
+    controller.fake_runner = runner
+    return controller
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_kb() -> int:
+    """Memoria residente máxima del proceso (KB en Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def ns_per_op(func, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return (time.perf_counter() - start) / max(1, len(items)) * 1e9
+
+
+def git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(['git', '-C', REPO_DIR, 'rev-parse', '--short', 'HEAD'],
+                                capture_output=True, text=True, timeout=5)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def save_results(name: str, params: Dict, results: Dict, output: Optional[Path] = None) -> Path:
+    """Guardar resultados en JSON (por defecto benchmarks/results/<nombre>-<commit>.json)"""
+    commit = git_commit()
+    data = {
+        'benchmark': name,
+        'commit': commit,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'params': params,
+        'results': results,
+    }
+    if output is None:
+        output = Path(BENCH_DIR) / 'results' / f"{name}-{commit or 'local'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(data, indent=2, sort_keys=True, default=str) + '\n')
+    return output
+
+
+def flatten(results: Dict, prefix: str = '') -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare_results(previous: Path, results: Dict):
+    """Mostrar la variación de cada métrica frente a un JSON anterior"""
+    old = json.loads(Path(previous).read_text())
+    old_flat = flatten(old['results'])
+    new_flat = flatten(results)
+    print(f"\nComparación con {previous} (commit {old.get('commit')}):")
+    for name, value in new_flat.items():
+        if name not in old_flat:
+            continue
+        before = old_flat[name]
+        change = (value - before) / before * 100 if before else 0.0
+        print(f"  {name:<40} {before:>14,.1f} → {value:>14,.1f} ({change:+.1f}%)")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark: coste de is_warp_domain frente al tamaño de la lista
+
+Compara el índice por etiquetas (DomainIndex) con el recorrido lineal
+original. El índice debe mantener un coste por consulta constante de 1k a
+5M entradas; el recorrido lineal solo se mide en tamaños pequeños.
+
+Uso:
+    python3 benchmarks/bench_domain_index.py [--sizes 1000,10000,...] [--queries N]
+"""
+
+import argparse
+import random
+import sys
+import os
+import time
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from domain_index import DomainIndex
+from generators import TLDS, generate_domains, random_label
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000, 5_000_000]
+LINEAR_MAX_SIZE = 10_000
+
+
+def generate_queries(domains, count: int, seed: int = 2):
+    """Mezcla de subdominios de la lista (aciertos) y dominios ajenos (fallos)"""
+    rng = random.Random(seed)
+    queries = []
+    for i in range(count):
+        if i % 4 == 0:
+            queries.append(f"{random_label(rng)}.{rng.choice(domains)}")
+        else:
+            queries.append(f"www.{random_label(rng)}.{random_label(rng)}.{rng.choice(TLDS)}")
+    return queries
+
+
+def linear_is_warp_domain(warp_domains, domain):
+    if domain in warp_domains:
+        return True
+    for warp_domain in warp_domains:
+        if domain.endswith(f".{warp_domain}"):
+            return True
+    return False
+
+
+def time_lookups(func, queries) -> float:
+    """Devolver nanosegundos por consulta"""
+    start = time.perf_counter()
+    for query in queries:
+        func(query)
+    return (time.perf_counter() - start) / len(queries) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='Tamaños de lista separados por coma')
+    parser.add_argument('--queries', type=int, default=200_000,
+                        help='Número de consultas por tamaño')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+
+    print(f"{'entradas':>10} {'índice ns/op':>14} {'lineal ns/op':>14}")
+    results = []
+    for size in sizes:
+        domains = generate_domains(size)
+        queries = generate_queries(domains, args.queries)
+
+        index = DomainIndex(domains)
+        index_ns = time_lookups(index.matches, queries)
+
+        linear_ns = None
+        if size <= LINEAR_MAX_SIZE:
+            warp_domains = set(domains)
+            sample = queries[:max(1, args.queries // 100)]
+            linear_ns = time_lookups(lambda d: linear_is_warp_domain(warp_domains, d), sample)
+
+        results.append((size, index_ns))
+        linear_txt = f"{linear_ns:14.0f}" if linear_ns is not None else f"{'-':>14}"
+        print(f"{size:>10} {index_ns:14.0f} {linear_txt}")
+
+        del domains, queries, index
+
+    if len(results) > 1:
+        ratio = results[-1][1] / results[0][1]
+        print(f"\nRelación {results[-1][0]} / {results[0][0]} entradas: {ratio:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
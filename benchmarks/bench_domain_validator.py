@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark: dominios validados por segundo
+
+Compara la validación original (re.match con el patrón como cadena en cada
+llamada) con la validación individual precompilada y la validación por
+lotes de domain_validator.
+
+Uso:
+    python3 benchmarks/bench_domain_validator.py [--count N] [--batch N]
+"""
+
+import argparse
+import random
+import re
+import sys
+import os
+import time
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from domain_validator import BATCH_SIZE, is_valid_domain, validate_stream
+
+TLDS = ['com', 'es', 'net', 'org', 'tv', 'io']
+
+
+def original_is_valid_domain(domain: str) -> bool:
+    """Implementación anterior de AntiTebasController.is_valid_domain"""
+    if not domain or len(domain) > 253:
+        return False
+    pattern = r'^[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?(\.[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?)*$'
+    return re.match(pattern, domain) is not None
+
+
+def generate_candidates(count: int, seed: int = 1):
+    """Candidatos como los de una lista real: en su mayoría válidos, algunos no"""
+    rng = random.Random(seed)
+    alphabet = 'abcdefghijklmnopqrstuvwxyz0123456789'
+    candidates = []
+    for i in range(count):
+        labels = [''.join(rng.choice(alphabet) for _ in range(rng.randint(3, 14)))
+                  for _ in range(rng.randint(1, 3))]
+        domain = '.'.join(labels + [rng.choice(TLDS)])
+        if i % 20 == 0:
+            domain = f"-{domain}"
+        elif i % 25 == 0:
+            domain = domain.upper() + '.'
+        candidates.append(domain)
+    return candidates
+
+
+def rate(func, candidates) -> float:
+    start = time.perf_counter()
+    func(candidates)
+    return len(candidates) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--count', type=int, default=1_000_000, help='Número de candidatos')
+    parser.add_argument('--batch', type=int, default=BATCH_SIZE, help='Tamaño de lote')
+    args = parser.parse_args()
+
+    candidates = generate_candidates(args.count)
+
+    variants = [
+        ('original (re.match)', lambda c: [d for d in c if original_is_valid_domain(d)]),
+        ('precompilado', lambda c: [d for d in c if is_valid_domain(d)]),
+        (f'lotes de {args.batch}', lambda c: list(validate_stream(c, args.batch))),
+    ]
+
+    print(f"{'variante':<24} {'dominios/s':>14} {'mejora':>8}")
+    baseline = None
+    for name, func in variants:
+        per_second = rate(func, candidates)
+        baseline = baseline or per_second
+        print(f"{name:<24} {per_second:14,.0f} {per_second / baseline:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
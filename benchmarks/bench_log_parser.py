@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark: líneas de pihole.log parseadas por segundo
+
+Compara el parser original (re.search con el patrón como cadena y ".*"
+inicial, un diccionario por consulta) con LogParser:
+
+- solo consultas: parse_pihole_log_line original frente a parse_line
+  (descarte con 'query[')
+- consultas y respuestas, lo que hace la etapa classify: original más
+  parse_answer_line en las demás líneas, frente a parse por lotes
+  (finditer sobre el lote entero)
+
+Uso:
+    python3 benchmarks/bench_log_parser.py [--lines N] [--batch N]
+"""
+
+import argparse
+import re
+import sys
+import os
+import time
+from datetime import datetime
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from generators import generate_domains, log_lines
+from log_parser import LogParser, parse_answer_line
+
+
+def original_parse_pihole_log_line(line: str):
+    """Implementación anterior de AntiTebasController.parse_pihole_log_line"""
+    query_pattern = r'(\w+\s+\d+\s+\d+:\d+:\d+).*query\[([A-Z]+)\]\s+(\S+)\s+from\s+(\S+)'
+    match = re.search(query_pattern, line)
+    if match:
+        timestamp_str, query_type, domain, client_ip = match.groups()
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'domain': domain,
+            'client_ip': client_ip,
+            'query_type': query_type,
+            'raw_line': line.strip()
+        }
+    return None
+
+
+def original_classify(lines):
+    """Etapa classify anterior: consulta o, si no lo es, respuesta"""
+    events = []
+    for line in lines:
+        query = original_parse_pihole_log_line(line)
+        events.append(query if query else parse_answer_line(line))
+    return events
+
+
+def batches(lines, size: int):
+    return [lines[i:i + size] for i in range(0, len(lines), size)]
+
+
+def rate(func, lines) -> float:
+    start = time.perf_counter()
+    func(lines)
+    return len(lines) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lines', type=int, default=500_000, help='Líneas de log')
+    parser.add_argument('--batch', type=int, default=1000, help='Líneas por lote')
+    args = parser.parse_args()
+
+    lines = list(log_lines(args.lines, generate_domains(1000)))
+    chunks = batches(lines, args.batch)
+    log_parser = LogParser()
+
+    # Mismas consultas (dominio, tipo, cliente) en todas las variantes
+    expected = [(q['domain'], q['query_type'], q['client_ip'])
+                for q in map(original_parse_pihole_log_line, lines) if q]
+    assert expected == [(q.domain, q.query_type, q.client_ip) for chunk in chunks
+                        for q in log_parser.queries(chunk)]
+
+    groups = {
+        'solo consultas': [
+            ('original (re.search)', lambda l: [original_parse_pihole_log_line(line) for line in l]),
+            ('parse_line', lambda l: [log_parser.parse_line(line) for line in l]),
+        ],
+        'consultas y respuestas': [
+            ('original + respuestas', lambda l: [original_classify(chunk) for chunk in chunks]),
+            (f'parse, lotes de {args.batch}', lambda l: [log_parser.parse(chunk) for chunk in chunks]),
+        ],
+    }
+
+    print(f"{len(lines)} líneas, {len(expected)} consultas")
+    for title, variants in groups.items():
+        print(f"\n{title}")
+        print(f"{'variante':<26} {'líneas/s':>14} {'mejora':>8}")
+        baseline = None
+        for name, func in variants:
+            per_second = rate(func, lines)
+            baseline = baseline or per_second
+            print(f"{name:<26} {per_second:14,.0f} {per_second / baseline:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark de extremo a extremo del controlador
+
+Alimenta AntiTebasController con un pihole.log sintético, con iptables/ipset
+y resolvedor falsos, y mide:
+
+- latencia de clasificación por línea (p50/p99) en modo directo
+- líneas/s de extremo a extremo con el pipeline (classify → resolve → apply)
+  hasta el lote aplicado en el backend
+- memoria máxima del proceso
+
+Los resultados se guardan en JSON para comparar entre commits.
+
+Uso:
+    python3 benchmarks/bench_macro.py [--lines N] [--domains N] [--output r.json] [--compare anterior.json]
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from bench_common import (bench_controller, compare_results, peak_rss_kb, percentile,
+                          save_results)
+from generators import generate_domains, log_lines
+
+BATCH_LINES = 1000
+
+
+def measure_latency(controller, lines):
+    """Clasificar línea a línea midiendo cada llamada (modo sin pipeline)"""
+    latencies = []
+    clock = time.perf_counter_ns
+    start = time.perf_counter()
+    for i, line in enumerate(lines):
+        t0 = clock()
+        controller.process_log_line(line)
+        latencies.append(clock() - t0)
+        if i % BATCH_LINES == BATCH_LINES - 1:
+            controller.resolve_unanswered_queries()
+    elapsed = time.perf_counter() - start
+    controller.flush_redirects()
+    return {
+        'lines_per_s': len(lines) / elapsed,
+        'p50_us': percentile(latencies, 50) / 1000,
+        'p99_us': percentile(latencies, 99) / 1000,
+        'max_us': max(latencies) / 1000,
+    }
+
+
+def measure_pipeline(controller, lines):
+    """Líneas/s con el pipeline completo hasta aplicar las redirecciones"""
+    controller.pipeline = controller.build_pipeline()
+    controller.pipeline.start()
+    start = time.perf_counter()
+    for i in range(0, len(lines), BATCH_LINES):
+        controller.pipeline.submit('classify', lines[i:i + BATCH_LINES])
+    controller.pipeline.join(timeout=600)
+    controller.flush_redirects()
+    elapsed = time.perf_counter() - start
+    stats = controller.pipeline.stats()
+    controller.pipeline.stop()
+    controller.pipeline = None
+    return {
+        'lines_per_s': len(lines) / elapsed,
+        'seconds': elapsed,
+        'dropped': sum(stage['dropped'] for stage in stats.values()),
+        'max_depth': {name: stage['max_depth'] for name, stage in stats.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--lines', type=int, default=500_000, help='Líneas de log')
+    parser.add_argument('--domains', type=int, default=100_000, help='Dominios en la lista WARP')
+    parser.add_argument('--warp-ratio', type=float, default=0.05, help='Fracción de consultas WARP')
+    parser.add_argument('--backend', default='ipset', help='Backend de redirección (falso)')
+    parser.add_argument('--output', type=Path, help='Archivo JSON de resultados')
+    parser.add_argument('--compare', type=Path, help='JSON anterior con el que comparar')
+    args = parser.parse_args()
+
+    domains = generate_domains(args.domains)
+    lines = list(log_lines(args.lines, domains, warp_ratio=args.warp_ratio))
+    print(f"{len(lines)} líneas, {len(domains)} dominios WARP, backend {args.backend}")
+
+    # ANSWER_WAIT=0: las consultas sin respuesta se resuelven en el siguiente lote
+    config = {'ANSWER_WAIT': '0'}
+    controller = bench_controller(domains, args.backend, config)
+    direct = measure_latency(controller, lines)
+    print(f"  directo:  {direct['lines_per_s']:12,.0f} líneas/s  "
+          f"p50 {direct['p50_us']:.1f} µs  p99 {direct['p99_us']:.1f} µs")
+    controller.resolver.shutdown()
+
+    controller = bench_controller(domains, args.backend, config)
+    piped = measure_pipeline(controller, lines)
+    print(f"  pipeline: {piped['lines_per_s']:12,.0f} líneas/s  ({piped['dropped']} descartados)")
+    installed = len(controller.redirect_backend.installed)
+    controller.resolver.shutdown()
+
+    results = {
+        'direct': direct,
+        'pipeline': piped,
+        'warp_queries': controller.stats['warp_queries'],
+        'redirects_installed': installed,
+        'backend_commands': controller.fake_runner.count,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+    print(f"  {results['warp_queries']} consultas WARP, {installed} IPs redirigidas "
+          f"en {results['backend_commands']} comandos")
+    print(f"  memoria máxima: {results['peak_rss_kb'] / 1024:.0f} MB")
+
+    output = save_results('macro', vars(args), results, args.output)
+    print(f"\nResultados guardados en {output}")
+    if args.compare:
+        compare_results(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
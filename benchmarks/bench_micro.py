@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks de las funciones calientes del controlador
+
+- is_warp_domain por tamaño de lista
+- parse_pihole_log_line sobre un pihole.log sintético
+- is_valid_domain (individual) y validación por lotes
+- update_domain_lists con listas locales (primera carga y sin cambios)
+- arranque del controlador en un proceso nuevo (sin y con índice compilado)
+- memoria y coste por consulta: set en memoria frente al índice compilado (mmap)
+
+Uso:
+    python3 benchmarks/bench_micro.py [--sizes 1000,100000] [--output r.json] [--compare anterior.json]
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from bench_domain_index import generate_queries
+from bench_common import (BENCH_DIR, bench_controller, compare_results, ns_per_op, peak_rss_kb,
+                          save_results)
+from compiled_index import compile_index, load_index
+from domain_index import DomainIndex
+from domain_validator import validate_stream
+from generators import generate_domains, log_lines, write_blocklist
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+
+
+def bench_is_warp_domain(sizes, queries: int):
+    results = {}
+    for size in sizes:
+        domains = generate_domains(size)
+        controller = bench_controller(domains)
+        results[str(size)] = ns_per_op(controller.is_warp_domain, generate_queries(domains, queries))
+        controller.resolver.shutdown()
+        print(f"  is_warp_domain ({size:>9} entradas): {results[str(size)]:8.0f} ns/op")
+    return results
+
+
+def bench_parse_log_line(lines: int):
+    controller = bench_controller()
+    sample = list(log_lines(lines, generate_domains(1000)))
+    result = ns_per_op(controller.parse_pihole_log_line, sample)
+    controller.resolver.shutdown()
+    print(f"  parse_pihole_log_line: {result:8.0f} ns/línea")
+    return result
+
+
+def bench_is_valid_domain(count: int):
+    controller = bench_controller()
+    candidates = generate_domains(count, seed=7)
+    single = ns_per_op(controller.is_valid_domain, candidates)
+    start = time.perf_counter()
+    for _ in validate_stream(candidates):
+        pass
+    batch = (time.perf_counter() - start) / len(candidates) * 1e9
+    controller.resolver.shutdown()
+    print(f"  is_valid_domain: {single:8.0f} ns/op individual, {batch:8.0f} ns/op por lotes")
+    return {'single_ns': single, 'batch_ns': batch}
+
+
+def bench_update_domain_lists(sizes):
+    results = {}
+    for size in sizes:
+        workdir = Path(tempfile.mkdtemp(prefix='antitebas-bench-'))
+        hosts = workdir / 'hosts.txt'
+        spain = workdir / 'spain.txt'
+        write_blocklist(hosts, size, 'hosts', seed=1)
+        write_blocklist(spain, max(1, size // 10), 'wildcard', seed=5)
+
+        controller = bench_controller(extra_config={
+            'DOMAIN_LISTS_URLS': hosts.as_uri(),
+            'SPAIN_BLOCKLIST_URLS': spain.as_uri(),
+        })
+        start = time.perf_counter()
+        controller.update_domain_lists()
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        controller.update_domain_lists()
+        warm = time.perf_counter() - start
+        controller.resolver.shutdown()
+
+        results[str(size)] = {'cold_s': cold, 'unchanged_s': warm}
+        print(f"  update_domain_lists ({size:>9} entradas): {cold:7.2f} s primera, {warm:7.2f} s sin cambios")
+    return results
+
+
+STARTUP_CODE = '''
+import sys, time
+from pathlib import Path
+start = time.perf_counter()
+sys.path.insert(0, {bench!r})
+from _support import load_query_monitor
+module = load_query_monitor()
+module.CONFIG_FILE = Path({config!r})
+controller = module.AntiTebasController()
+assert controller.is_warp_domain({probe!r})
+print(time.perf_counter() - start)
+'''
+
+
+def startup_seconds(controller, probe: str) -> float:
+    """Importar query-monitor.py y crear el controlador en un intérprete nuevo"""
+    code = STARTUP_CODE.format(bench=BENCH_DIR,
+                               config=str(controller.workdir / 'warp-config.conf'), probe=probe)
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return float(result.stdout.split()[-1])
+
+
+def bench_startup(sizes):
+    results = {}
+    for size in sizes:
+        domains = generate_domains(size)
+        controller = bench_controller(domains)
+        controller.resolver.shutdown()
+        Path(controller.config['LIST_SNAPSHOT_FILE']).unlink()
+        cold = startup_seconds(controller, domains[0])
+        warm = startup_seconds(controller, domains[0])
+
+        results[str(size)] = {'parse_s': cold, 'index_s': warm}
+        print(f"  arranque ({size:>9} entradas): {cold:7.2f} s parseando la lista, {warm:7.2f} s con índice")
+    return results
+
+
+def traced(func):
+    """Ejecutar func y devolver (resultado, bytes de heap que conserva, segundos)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, heap, seconds
+
+
+def bench_index_memory(sizes, queries: int):
+    results = {}
+    for size in sizes:
+        domains = generate_domains(size)
+        sample = generate_queries(domains, queries)
+        path = Path(tempfile.mkdtemp(prefix='antitebas-bench-')) / 'warp-domains.idx'
+
+        # Como al leer la lista de texto: cada dominio es un str nuevo en el heap
+        text = '\n'.join(domains)
+        index, set_heap, set_load = traced(lambda: DomainIndex(text.split('\n')))
+        set_ns = ns_per_op(index.matches, sample)
+        del index
+
+        start = time.perf_counter()
+        compile_index(path, domains)
+        compile_s = time.perf_counter() - start
+        compiled, mapped_heap, mapped_load = traced(lambda: load_index(path))
+        mapped_ns = ns_per_op(compiled.matches, sample)
+
+        results[str(size)] = {
+            'set_heap_bytes': set_heap, 'set_load_s': set_load, 'set_ns': set_ns,
+            'index_file_bytes': compiled.nbytes, 'index_heap_bytes': mapped_heap,
+            'index_load_s': mapped_load, 'index_compile_s': compile_s, 'index_ns': mapped_ns,
+        }
+        print(f"  índice ({size:>9} entradas): set {set_heap / size:6.0f} B/dominio {set_ns:6.0f} ns/op, "
+              f"compilado {compiled.nbytes / size:6.0f} B/dominio (mmap) {mapped_ns:6.0f} ns/op, "
+              f"carga {mapped_load * 1000:.2f} ms")
+        compiled.close()
+        path.unlink()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='Tamaños de lista separados por coma')
+    parser.add_argument('--queries', type=int, default=200_000, help='Consultas por tamaño')
+    parser.add_argument('--lines', type=int, default=200_000, help='Líneas de log')
+    parser.add_argument('--output', type=Path, help='Archivo JSON de resultados')
+    parser.add_argument('--compare', type=Path, help='JSON anterior con el que comparar')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    results = {
+        'is_warp_domain_ns': bench_is_warp_domain(sizes, args.queries),
+        'parse_log_line_ns': bench_parse_log_line(args.lines),
+        'is_valid_domain': bench_is_valid_domain(args.queries),
+        'update_domain_lists': bench_update_domain_lists(sizes),
+        'startup': bench_startup(sizes),
+        'index_memory': bench_index_memory(sizes, args.queries),
+    }
+    results['peak_rss_kb'] = peak_rss_kb()
+    print(f"  memoria máxima: {results['peak_rss_kb'] / 1024:.0f} MB")
+
+    output = save_results('micro', vars(args) | {'sizes': sizes}, results, args.output)
+    print(f"\nResultados guardados en {output}")
+    if args.compare:
+        compare_results(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Generadores de datos sintéticos para los benchmarks
+
+Listas de dominios (hosts, planas o con wildcards) y flujos de pihole.log
+con consultas, reenvíos, respuestas, respuestas de caché y cadenas CNAME.
+
+Uso:
+    python3 benchmarks/generators.py list --count 1000000 --format hosts --output lista.txt
+    python3 benchmarks/generators.py log --lines 500000 --warp-list lista.txt --output pihole.log
+"""
+
+import argparse
+import random
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence
+
+TLDS = ['com', 'es', 'net', 'org', 'tv', 'io']
+ALPHABET = 'abcdefghijklmnopqrstuvwxyz0123456789'
+SUBDOMAINS = ['www', 'cdn', 'live', 'api', 'img', 'static', 'video', 'm']
+QUERY_TYPES = ['A'] * 6 + ['AAAA'] * 3 + ['HTTPS']
+LIST_FORMATS = ('hosts', 'plain', 'wildcard')
+SIZES = [1_000, 10_000, 100_000, 1_000_000, 5_000_000]
+
+
+def random_label(rng: random.Random) -> str:
+    return ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(4, 12)))
+
+
+def generate_domains(count: int, seed: int = 1) -> List[str]:
+    """Generar dominios únicos de 2 a 3 etiquetas"""
+    rng = random.Random(seed)
+    domains = set()
+    while len(domains) < count:
+        labels = [random_label(rng) for _ in range(rng.randint(1, 2))]
+        domains.add('.'.join(labels + [rng.choice(TLDS)]))
+    return list(domains)
+
+
+def blocklist_lines(domains: Sequence[str], fmt: str = 'hosts', seed: int = 3) -> Iterator[str]:
+    """Líneas de una lista en el formato indicado, con comentarios y ruido"""
+    rng = random.Random(seed)
+    yield f"# Lista sintética ({fmt}) - {len(domains)} entradas"
+    yield ''
+    for i, domain in enumerate(domains):
+        if i % 500 == 0:
+            yield f"# sección {i // 500}"
+        if fmt == 'hosts':
+            ip = '0.0.0.0' if rng.random() < 0.9 else '127.0.0.1'
+            yield f"{ip} {domain}"
+        elif fmt == 'wildcard':
+            yield f"*.{domain}" if rng.random() < 0.5 else domain
+        else:
+            yield domain
+
+
+def write_blocklist(path: Path, count: int, fmt: str = 'hosts', seed: int = 1) -> List[str]:
+    """Escribir una lista de ``count`` dominios y devolverlos"""
+    domains = generate_domains(count, seed)
+    with open(path, 'w') as f:
+        for line in blocklist_lines(domains, fmt, seed):
+            f.write(f"{line}\n")
+    return domains
+
+
+def random_ip(rng: random.Random, ipv6: bool = False) -> str:
+    if ipv6:
+        return f"2606:4700:{rng.randint(0, 0xffff):x}::{rng.randint(1, 0xffff):x}"
+    return f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+
+
+def log_lines(count: int, warp_domains: Sequence[str], warp_ratio: float = 0.05,
+              cname_ratio: float = 0.2, seed: int = 2, start: Optional[float] = None) -> Iterator[str]:
+    """Generar ``count`` líneas de pihole.log
+
+    Cada consulta produce su línea ``query``, normalmente ``forwarded`` y una
+    o varias respuestas (``reply`` o ``cached``), a veces a través de una
+    cadena CNAME. ``warp_ratio`` es la fracción de consultas a subdominios
+    de ``warp_domains``.
+    """
+    rng = random.Random(seed)
+    other_domains = generate_domains(5000, seed + 100)
+    timestamp = start if start is not None else time.time()
+    pid = rng.randint(100, 9999)
+    emitted = 0
+
+    while emitted < count:
+        timestamp += rng.random() * 0.01
+        prefix = f"{time.strftime('%b %d %H:%M:%S', time.localtime(timestamp))} dnsmasq[{pid}]:"
+        if warp_domains and rng.random() < warp_ratio:
+            domain = f"{rng.choice(SUBDOMAINS)}.{rng.choice(warp_domains)}"
+        else:
+            domain = f"{rng.choice(SUBDOMAINS)}.{rng.choice(other_domains)}"
+        query_type = rng.choice(QUERY_TYPES)
+        client = f"192.168.1.{rng.randint(2, 254)}"
+
+        block = [f"{prefix} query[{query_type}] {domain} from {client}"]
+        cached = rng.random() < 0.4
+        if not cached:
+            block.append(f"{prefix} forwarded {domain} to 1.1.1.1")
+        verb = 'cached' if cached else 'reply'
+
+        name = domain
+        if rng.random() < cname_ratio:
+            target = f"{random_label(rng)}.cdn.{rng.choice(TLDS)}"
+            block.append(f"{prefix} {verb} {name} is <CNAME>")
+            name = target
+        for _ in range(rng.randint(1, 3)):
+            block.append(f"{prefix} {verb} {name} is {random_ip(rng, query_type == 'AAAA')}")
+
+        for line in block[:count - emitted]:
+            yield line
+        emitted += len(block)
+
+
+def write_log(path: Path, count: int, warp_domains: Sequence[str], **kwargs):
+    with open(path, 'w') as f:
+        for line in log_lines(count, warp_domains, **kwargs):
+            f.write(f"{line}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    list_cmd = sub.add_parser('list', help='Generar una lista de dominios')
+    list_cmd.add_argument('--count', type=int, default=100_000)
+    list_cmd.add_argument('--format', choices=LIST_FORMATS, default='hosts')
+    list_cmd.add_argument('--seed', type=int, default=1)
+    list_cmd.add_argument('--output', type=Path, required=True)
+
+    log_cmd = sub.add_parser('log', help='Generar un pihole.log')
+    log_cmd.add_argument('--lines', type=int, default=100_000)
+    log_cmd.add_argument('--warp-list', type=Path, help='Lista de dominios WARP (una por línea)')
+    log_cmd.add_argument('--warp-ratio', type=float, default=0.05)
+    log_cmd.add_argument('--seed', type=int, default=2)
+    log_cmd.add_argument('--output', type=Path, required=True)
+
+    args = parser.parse_args()
+    if args.command == 'list':
+        write_blocklist(args.output, args.count, args.format, args.seed)
+    else:
+        warp_domains = []
+        if args.warp_list:
+            warp_domains = [line.split()[-1].lstrip('*.') for line in args.warp_list.read_text().splitlines()
+                            if line.strip() and not line.startswith('#')]
+        else:
+            warp_domains = generate_domains(1000)
+        write_log(args.output, args.lines, warp_domains, warp_ratio=args.warp_ratio, seed=args.seed)
+    print(f"Generado {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""
+Utilidades para tests: cargar query-monitor.py con una configuración temporal,
+reloj manual y runner de comandos falso (compartidas con los benchmarks en
+benchmarks/_support.py)
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from _support import SRC_DIR, FakeClock, FakeRunner, load_query_monitor, make_controller  # noqa: E402,F401
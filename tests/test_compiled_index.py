@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Tests para el índice de dominios compilado (mmap) y el arranque rápido:
+importaciones diferidas y actualización de listas en segundo plano
+"""
+
+import sys
+import os
+import subprocess
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from compiled_index import compile_index, load_index
+from domain_index import DomainIndex
+from controller_helper import FakeRunner, load_query_monitor, make_controller
+
+
+def test_index_matches_domain_index():
+    """Test: mismas respuestas que DomainIndex sin copiar la lista al heap"""
+    print("🧪 Test: Búsqueda en el índice compilado")
+
+    controller = make_controller(extra_config={'LOG_LEVEL': 'WARNING'})
+    path = controller.workdir / 'dominios.idx'
+    domains = {'example.com', 'sub.other.org', 'tv', 'a-b.net', 'dazn.com', 'live.dazn.com', 'ñandú.es'}
+    domains |= {f"d{i}.example.net" for i in range(2000)}
+    assert compile_index(path, domains)
+
+    tracemalloc.start()
+    index = load_index(path)
+    heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert heap < 64 * 1024, heap
+    print(f"  ✓ Carga sin construir la lista en memoria ({heap} bytes de heap)")
+
+    reference = DomainIndex(domains)
+    queries = ['example.com', 'www.example.com', 'a.b.c.example.com', 'example.co', 'xexample.com',
+               'other.org', 'x.sub.other.org', 'tv', 'foo.tv', 'a-b.net', 'live.dazn.com',
+               'cdn.live.dazn.com', 'www.ñandú.es', 'd1999.example.net', 'd2000.example.net', '', '.']
+    for query in queries:
+        assert index.match(query) == reference.match(query), query
+    assert 'dazn.com' in index and 'www.dazn.com' not in index
+    assert len(index) == len(domains) and set(index) == domains
+    print("  ✓ Exacto, subdominios por etiquetas e iteración")
+
+    ordered = list(index)
+    assert ordered.index('live.dazn.com') == ordered.index('dazn.com') + 1
+    print("  ✓ Dominios ordenados junto a sus subdominios")
+
+    return True
+
+
+def test_index_validation():
+    """Test: índice válido solo para la lista de la que sale"""
+    print("🧪 Test: Validación del índice compilado")
+
+    controller = make_controller(domains=['dazn.com'], extra_config={'LOG_LEVEL': 'WARNING'})
+    source = controller.workdir / 'lista.txt'
+    path = controller.workdir / 'lista.idx'
+    source.write_text("dazn.com\nlaliga.es\n")
+
+    assert compile_index(path, ['dazn.com', 'laliga.es'], source, updated='2024-01-10T12:00:00')
+    index = load_index(path, source)
+    assert sorted(index) == ['dazn.com', 'laliga.es']
+    assert index.meta['updated'] == '2024-01-10T12:00:00'
+    print("  ✓ Dominios y metadatos recuperados")
+
+    source.write_text("dazn.com\nlaliga.es\nmovistarplus.es\n")
+    assert load_index(path, source) is None
+    print("  ✓ Lista editada a mano: el índice deja de valer")
+
+    path.write_bytes(path.read_bytes()[:-3])
+    assert load_index(path) is None
+    path.write_text("no es un índice\n")
+    assert load_index(path) is None
+    assert load_index(controller.workdir / 'no-existe', source) is None
+    assert compile_index(path, [], source) and len(load_index(path, source)) == 0
+    assert not load_index(path, source).matches('dazn.com')
+    print("  ✓ Índice truncado, dañado o ausente se ignora; lista vacía válida")
+
+    return True
+
+
+def test_controller_boot_from_snapshot():
+    """Test: el controlador arranca desde el índice compilado y lo mantiene al día"""
+    print("🧪 Test: Arranque desde el índice compilado")
+
+    controller = make_controller(domains=['dazn.com', 'laliga.es'], extra_config={'LOG_LEVEL': 'WARNING'})
+    snapshot_file = Path(controller.config['LIST_SNAPSHOT_FILE'])
+    assert snapshot_file.exists()
+    assert type(controller.warp_domains).__name__ == 'CompiledIndex'
+    print("  ✓ Primera carga: lista parseada e índice compilado")
+
+    # add/remove van a la capa manual: ni la lista ni el índice se reescriben
+    compiled = snapshot_file.stat().st_mtime_ns
+    controller.add_domain('movistarplus.es')
+    assert controller.is_warp_domain('www.movistarplus.es')
+    assert snapshot_file.stat().st_mtime_ns == compiled
+    assert type(controller.warp_domains).__name__ == 'OverlayIndex' and len(controller.warp_domains) == 3
+    print("  ✓ add aplica en vivo sin recompilar el índice")
+
+    # Mismo archivo de configuración: la segunda carga usa la instantánea y la capa
+    reloaded = load_query_monitor()
+    reloaded.CONFIG_FILE = controller.workdir / 'warp-config.conf'
+    second = reloaded.AntiTebasController()
+    assert load_index(snapshot_file, Path(controller.config['DOMAIN_LIST_FILE'])) is not None
+    assert second.is_warp_domain('www.movistarplus.es') and len(second.warp_domains) == 3
+    assert controller.remove_domain('laliga.es') and not controller.is_warp_domain('laliga.es')
+    assert snapshot_file.stat().st_mtime_ns == compiled
+    print("  ✓ Cambios manuales persistentes tras reiniciar; remove tampoco recompila")
+
+    hosts = controller.workdir / 'hosts.txt'
+    hosts.write_text("0.0.0.0 cdn.example.net\n")
+    second.config['DOMAIN_LISTS_URLS'] = hosts.as_uri()
+    second.update_domain_lists()
+    index = load_index(snapshot_file, Path(controller.config['DOMAIN_LIST_FILE']))
+    assert 'cdn.example.net' in index and second.is_warp_domain('www.cdn.example.net')
+    assert index.meta['updated'] == second.stats['last_update']
+    assert 'movistarplus.es' in index and type(second.warp_domains).__name__ == 'CompiledIndex'
+    assert not (controller.workdir / 'warp-domains-manual.txt').exists()
+    print("  ✓ update_domain_lists recompila el índice y funde la capa manual")
+
+    # CLI sin monitor: mismo tratamiento del dominio que el socket de control
+    output = subprocess.run(
+        [sys.executable, '-c', 'import sys; sys.argv = ["query-monitor.py", "test", "WWW.Cdn.Example.NET."]; '
+         'from controller_helper import load_query_monitor; from pathlib import Path; '
+         f'm = load_query_monitor(); m.CONFIG_FILE = Path({str(controller.workdir / "warp-config.conf")!r}); '
+         'm.main()'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+    ).stdout
+    assert 'WARP' in output and 'Normal' not in output, output
+    print("  ✓ test desde la CLI normaliza el dominio (mayúsculas, punto final)")
+
+    return True
+
+
+def test_lazy_requests_import():
+    """Test: cargar el controlador no importa requests"""
+    print("🧪 Test: Importación diferida de requests")
+
+    tests_dir = os.path.dirname(os.path.abspath(__file__))
+    code = (
+        "import sys; sys.path.insert(0, %r)\n"
+        "from controller_helper import make_controller\n"
+        "controller = make_controller(domains=['dazn.com'], extra_config={'LOG_LEVEL': 'WARNING'})\n"
+        "assert controller.is_warp_domain('live.dazn.com')\n"
+        "print('requests' in sys.modules)\n"
+    ) % tests_dir
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == 'False'
+    print("  ✓ requests se importa solo al descargar o notificar")
+
+    return True
+
+
+def test_start_does_not_wait_for_lists():
+    """Test: el monitor empieza mientras las listas se actualizan"""
+    print("🧪 Test: Actualización de listas en segundo plano")
+
+    controller = make_controller(domains=['dazn.com'], extra_config={
+        'LOG_LEVEL': 'WARNING',
+        'METRICS_ENABLED': 'false',
+        'CONTROL_SOCKET': '',
+    })
+    controller.redirect_backend.runner = FakeRunner()
+    controller.check_connectivity = lambda: None
+    controller.start_control_server = lambda: None
+
+    release = threading.Event()
+    updating = threading.Event()
+    monitored = []
+
+    def slow_update():
+        updating.set()
+        release.wait(10)
+
+    def monitor():
+        # El índice ya está disponible antes de terminar la actualización
+        monitored.append(controller.is_warp_domain('live.dazn.com'))
+        updating.wait(5)
+        monitored.append(release.is_set())
+
+    controller.update_domain_lists = slow_update
+    controller.monitor_pihole_log = monitor
+    start = time.perf_counter()
+    controller.start()
+    elapsed = time.perf_counter() - start
+    release.set()
+
+    assert monitored == [True, False]
+    assert elapsed < 5
+    print(f"  ✓ Monitor iniciado en {elapsed * 1000:.0f} ms sin esperar a las descargas")
+
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Ejecutando tests del índice compilado y arranque rápido")
+    print("=" * 60)
+
+    tests = [
+        test_index_matches_domain_index,
+        test_index_validation,
+        test_controller_boot_from_snapshot,
+        test_lazy_requests_import,
+        test_start_does_not_wait_for_lists
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
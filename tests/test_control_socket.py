@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Tests para el socket de control del monitor
+"""
+
+import sys
+import os
+import io
+import socket
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from control_socket import (ControlServer, ControlUnavailable, send_command, main as control_main,
+                            EXIT_OK, EXIT_FAILED, EXIT_UNAVAILABLE)
+from controller_helper import FakeRunner, load_query_monitor, make_controller
+
+
+def socket_path() -> Path:
+    return Path(tempfile.mkdtemp(prefix='antitebas-ctl-')) / 'control.sock'
+
+
+def test_server_dispatch():
+    """Test: peticiones JSON por línea y errores"""
+    print("🧪 Test: Despacho de operaciones")
+
+    def fail(request):
+        raise RuntimeError('roto')
+
+    path = socket_path()
+    server = ControlServer(path, {'echo': lambda request: {'value': request['value']}, 'fail': fail})
+    assert server.start()
+    try:
+        assert send_command(path, 'echo', value=7) == {'value': 7, 'ok': True}
+        print("  ✓ Respuesta JSON con ok=True")
+
+        response = send_command(path, 'nada')
+        assert response['ok'] is False and 'desconocida' in response['error']
+        response = send_command(path, 'fail')
+        assert response == {'ok': False, 'error': 'roto'}
+        print("  ✓ Operación desconocida o con error devuelve ok=False")
+
+        # Un segundo servidor no debe quitarle el socket al primero
+        assert not ControlServer(path, {}).start()
+        assert send_command(path, 'echo', value=1)['value'] == 1
+        print("  ✓ Socket en uso respetado")
+    finally:
+        server.stop()
+
+    assert not path.exists()
+    try:
+        send_command(path, 'echo', value=1)
+        assert False, "se esperaba ControlUnavailable"
+    except ControlUnavailable:
+        pass
+    print("  ✓ Sin monitor: ControlUnavailable")
+
+    # Socket huérfano de un monitor anterior
+    orphan = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    orphan.bind(str(path))
+    orphan.close()
+    server = ControlServer(path, {'echo': lambda request: {}})
+    assert server.start()
+    server.stop()
+    print("  ✓ Socket huérfano reemplazado")
+
+    return True
+
+
+def test_controller_operations():
+    """Test: test/add/remove/stats/reload/flush contra el controlador"""
+    print("🧪 Test: Operaciones del controlador")
+
+    path = socket_path()
+    controller = make_controller(domains=['dazn.com'],
+                                 extra_config={'LOG_LEVEL': 'WARNING', 'CONTROL_SOCKET': str(path)})
+    controller.start_control_server()
+    try:
+        response = send_command(path, 'test', domain='Live.DAZN.com')
+        assert response['warp'] is True and response['match'] == 'dazn.com'
+        assert send_command(path, 'test', domain='example.org')['warp'] is False
+        print("  ✓ test usa el índice en memoria")
+
+        assert send_command(path, 'add', domain='Movistar.es.')['domain'] == 'movistar.es'
+        assert controller.is_warp_domain('tv.movistar.es')
+        assert '+movistar.es' in (controller.workdir / 'warp-domains-manual.txt').read_text()
+        assert 'movistar.es' not in (controller.workdir / 'warp-domains.txt').read_text()
+        assert send_command(path, 'list')['domains'] == ['dazn.com', 'movistar.es']
+        assert send_command(path, 'add', domain='no válido!')['ok'] is False
+        print("  ✓ add aplica en vivo y se guarda en la capa manual")
+
+        assert send_command(path, 'remove', domain='movistar.es')['ok'] is True
+        assert not controller.is_warp_domain('tv.movistar.es')
+        assert send_command(path, 'remove', domain='movistar.es')['ok'] is False
+        assert send_command(path, 'remove', domain='dazn.com')['ok'] is True
+        assert send_command(path, 'list')['domains'] == []
+        assert send_command(path, 'add', domain='dazn.com')['ok'] is True
+        print("  ✓ remove aplica en vivo; list refleja altas y bajas manuales")
+
+        with open(controller.workdir / 'warp-domains.txt', 'a') as f:
+            f.write("laliga.es\n")
+        assert send_command(path, 'reload')['domains'] == 2
+        assert controller.is_warp_domain('www.laliga.es')
+        print("  ✓ reload relee la lista del disco")
+
+        controller.on_domain_resolved('dazn.com', {'104.16.1.1'}, 300)
+        stats = send_command(path, 'stats')
+        assert stats['domains'] == 2 and stats['redirect_pending'] == 1
+        controller.redirect_backend.runner = FakeRunner()
+        assert send_command(path, 'flush')['applied'] == 1
+        assert send_command(path, 'stats')['redirect_pending'] == 0
+        print("  ✓ stats y flush")
+    finally:
+        controller.control_server.stop()
+
+    return True
+
+
+def test_client_cli():
+    """Test: cliente de línea de comandos y códigos de salida"""
+    print("🧪 Test: Cliente de línea de comandos")
+
+    path = socket_path()
+    assert control_main(['--socket', str(path), 'stats']) == EXIT_UNAVAILABLE
+    print("  ✓ Código 3 sin monitor (warp-domains usa el modo directo)")
+
+    server = ControlServer(path, {
+        'test': lambda request: {'domain': request['domain'], 'warp': True, 'match': 'dazn.com'},
+        'add': lambda request: {'ok': False, 'domain': request['domain']},
+    })
+    assert server.start()
+    try:
+        output = io.StringIO()
+        with redirect_stdout(output):
+            assert control_main(['--socket', str(path), 'test', 'dazn.com']) == EXIT_OK
+            assert control_main(['--socket', str(path), 'add', 'x']) == EXIT_FAILED
+        assert 'Dominio dazn.com: 🎯 WARP' in output.getvalue()
+        assert '✗ Error agregando x' in output.getvalue()
+        print("  ✓ Salida con el formato del modo directo")
+    finally:
+        server.stop()
+
+    return True
+
+
+def test_list_without_monitor():
+    """Test: list sin monitor funde la lista del disco con la capa manual"""
+    print("🧪 Test: list sin monitor")
+
+    controller = make_controller(domains=['dazn.com', 'laliga.es'], extra_config={'LOG_LEVEL': 'WARNING'})
+    controller.add_domain('movistar.es')
+    controller.remove_domain('laliga.es')
+
+    module = load_query_monitor()
+    module.CONFIG_FILE = controller.workdir / 'warp-config.conf'
+    output = io.StringIO()
+    argv = sys.argv
+    try:
+        sys.argv = ['query-monitor.py', 'list']
+        with redirect_stdout(output):
+            module.main()
+    finally:
+        sys.argv = argv
+    text = output.getvalue()
+    assert '     1. dazn.com' in text and '     2. movistar.es' in text
+    assert 'laliga.es' not in text and 'Total: 2 dominios' in text
+    print("  ✓ Altas y bajas de warp-domains add/remove incluidas")
+
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Ejecutando tests del socket de control")
+    print("=" * 60)
+
+    tests = [
+        test_server_dispatch,
+        test_controller_operations,
+        test_list_without_monitor,
+        test_client_cli
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Tests para el interceptor DNS y las notificaciones al traffic manager
+"""
+
+import sys
+import os
+import io
+import json
+import threading
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from dns_interceptor import DnsInterceptor, QueryNotifier, check_manager, event_time, manager_url
+from controller_helper import make_controller
+
+
+class ManagerServer:
+    """Traffic manager local que guarda los POST recibidos en /api/query"""
+
+    def __init__(self, port=0):
+        self.events = []         # eventos recibidos (de arrays o documentos sueltos)
+        self.batches = []        # tamaño de cada POST
+        self.clients = set()     # puertos de origen (una conexión keep-alive = uno)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length))
+                events = payload if isinstance(payload, list) else [payload]
+                server.batches.append(len(events))
+                server.events.extend(events)
+                server.clients.add(self.client_address[1])
+                self.send_response(200 if self.path == '/api/query' else 404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.port = self.httpd.server_port
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def wait_for(self, count, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while len(self.events) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return len(self.events) >= count
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def test_notifier_batches():
+    """Test: eventos agrupados en lotes por una sola conexión"""
+    print("🧪 Test: Lotes con keep-alive")
+
+    server = ManagerServer()
+    notifier = QueryNotifier(manager_url('127.0.0.1', server.port), interval=0.05, batch_size=10)
+    notifier.start()
+    try:
+        for i in range(25):
+            assert notifier.notify(f"live{i}.dazn.com", '192.168.1.10', 'A')
+        assert server.wait_for(25)
+    finally:
+        notifier.stop()
+        server.close()
+
+    event = server.events[0]
+    assert event['domain'] == 'live0.dazn.com' and event['client'] == '192.168.1.10'
+    assert event['type'] == 'A' and 'T' in event['timestamp'] and event['count'] == 1
+    assert max(server.batches) == 10 and len(server.batches) <= 5
+    assert notifier.stats['sent'] == 25
+    assert len(server.clients) == 1
+    print(f"  ✓ 25 eventos en {len(server.batches)} POST por una única conexión")
+
+    server = ManagerServer()
+    single = QueryNotifier(manager_url('127.0.0.1', server.port), batch_size=1)
+    single.notify('dazn.com', '192.168.1.10', timestamp=1700000000.0)
+    assert single.flush()
+    server.close()
+    assert server.batches == [1] and server.events[0]['domain'] == 'dazn.com'
+    assert server.events[0]['timestamp'] == event_time(1700000000.0)
+    print("  ✓ batch_size=1: un documento por consulta")
+
+    return True
+
+
+def test_notifier_collapse():
+    """Test: consultas repetidas en la ventana se agrupan"""
+    print("🧪 Test: Agrupación de duplicados")
+
+    server = ManagerServer()
+    notifier = QueryNotifier(manager_url('127.0.0.1', server.port))
+    for _ in range(5):
+        notifier.notify('live.dazn.com', '192.168.1.10', 'A')
+    notifier.notify('live.dazn.com', '192.168.1.11', 'A')
+    assert notifier.pending() == 2 and notifier.stats['collapsed'] == 4
+    assert notifier.flush()
+
+    notifier.notify('live.dazn.com', '192.168.1.10', 'A')
+    assert notifier.flush()
+    server.close()
+
+    counts = [(e['client'], e['count']) for e in server.events]
+    assert counts == [('192.168.1.10', 5), ('192.168.1.11', 1), ('192.168.1.10', 1)]
+    print("  ✓ Un evento por dominio y cliente con count; nueva ventana tras enviar")
+
+    return True
+
+
+def test_notifier_spill():
+    """Test: búfer acotado con el traffic manager caído"""
+    print("🧪 Test: Búfer con el servidor caído")
+
+    server = ManagerServer()
+    port = server.port
+    server.close()
+
+    notifier = QueryNotifier(manager_url('127.0.0.1', port), timeout=0.5, spill_size=4)
+    for i in range(3):
+        notifier.notify(f"a{i}.com", '1.1.1.1')
+    assert notifier.flush() is False
+    for i in range(3, 6):
+        notifier.notify(f"a{i}.com", '1.1.1.1')
+    assert notifier.flush() is False
+    assert notifier.pending() == 4 and notifier.stats['dropped'] == 2
+    assert notifier.stats['errors'] == 2
+    print("  ✓ Eventos retenidos, descartando los más antiguos")
+
+    server = ManagerServer(port)
+    try:
+        assert notifier.flush()
+    finally:
+        server.close()
+    assert [e['domain'] for e in server.events] == ['a2.com', 'a3.com', 'a4.com', 'a5.com']
+    assert notifier.pending() == 0
+    print("  ✓ Reenvío al recuperarse el traffic manager")
+
+    assert not check_manager('127.0.0.1', 9, timeout=0.5)
+    return True
+
+
+def test_interceptor_index():
+    """Test: detección con el índice de dominios del controlador"""
+    print("🧪 Test: Detección con el índice en memoria")
+
+    controller = make_controller(domains=['dazn.com'], extra_config={'LOG_LEVEL': 'WARNING'})
+    notified = []
+
+    class Recorder:
+        def notify(self, domain, client, query_type='A', timestamp=None):
+            notified.append((domain, client, query_type, timestamp))
+
+    interceptor = DnsInterceptor(controller.is_warp_domain, Recorder())
+    lines = [
+        'Jan 10 12:00:00 dnsmasq[1]: query[AAAA] live.dazn.com from 192.168.1.10',
+        'Jan 10 12:00:00 dnsmasq[1]: reply live.dazn.com is 104.16.1.1',
+        'Jan 10 12:00:01 dnsmasq[1]: query[A] example.org from 192.168.1.11',
+    ]
+    assert interceptor.process_queries(map(controller.parse_pihole_log_line, lines)) == 1
+    stamp = controller.parse_pihole_log_line(lines[0]).timestamp
+    assert notified == [('live.dazn.com', '192.168.1.10', 'AAAA', stamp)]
+    print("  ✓ Solo las consultas WARP se notifican, con la fecha de la línea")
+
+    assert interceptor.process_queries([{'domain': 'dazn.com', 'client_ip': '192.168.1.12',
+                                         'query_type': 'A', 'timestamp': 1700000000.0}]) == 1
+    assert notified[-1] == ('dazn.com', '192.168.1.12', 'A', 1700000000.0)
+    assert event_time(1700000000.0) == datetime.fromtimestamp(1700000000).astimezone().isoformat()
+    print("  ✓ Mismo epoch desde la base FTL; el evento lo lleva en ISO 8601")
+
+    controller.add_domain('laliga.es')
+    assert interceptor.intercept('www.laliga.es', '127.0.0.1')
+    print("  ✓ Los cambios del índice se ven sin recargar")
+
+    return True
+
+
+def test_controller_commands():
+    """Test: comandos check/test y notificación desde el monitor"""
+    print("🧪 Test: Comandos del interceptor en el controlador")
+
+    server = ManagerServer()
+    controller = make_controller(domains=['dazn.com'], extra_config={
+        'LOG_LEVEL': 'WARNING',
+        'TRAFFIC_MANAGER_HOST': '127.0.0.1',
+        'TRAFFIC_MANAGER_PORT': str(server.port),
+    })
+    try:
+        output = io.StringIO()
+        with redirect_stdout(output):
+            assert controller.intercept_command(['check']) == 0
+            assert controller.intercept_command(['test', 'live.dazn.com', '192.168.1.5']) == 0
+            assert controller.intercept_command(['test', 'example.org']) == 1
+            assert controller.intercept_command(['otro']) == 1
+        assert 'Servidor WARP disponible' in output.getvalue()
+        assert 'Probando intercepción para: live.dazn.com' in output.getvalue()
+        assert server.wait_for(1)
+        assert server.events[0]['client'] == '192.168.1.5'
+        print("  ✓ check, test y uso con la misma salida que el script")
+
+        # Por defecto el monitor principal no notifica (lo hace el interceptor)
+        controller.classify_lines(['Jan 10 12:00:00 dnsmasq[1]: query[A] www.dazn.com from 192.168.1.20'])
+        assert controller.notifier.pending() == 0
+        print("  ✓ Sin NOTIFY_FROM_MONITOR el monitor no duplica los eventos del interceptor")
+
+        controller.notify_from_monitor = True
+        controller.notifier.start()
+        controller.classify_lines(['Jan 10 12:00:01 dnsmasq[1]: query[A] cdn.dazn.com from 192.168.1.20'])
+        assert server.wait_for(2)
+        assert server.events[1]['domain'] == 'cdn.dazn.com'
+        controller.notifier.stop()
+        assert len(server.events) == 2
+        print("  ✓ Con NOTIFY_FROM_MONITOR=true el monitor principal notifica")
+    finally:
+        server.close()
+
+    disabled = make_controller(extra_config={'LOG_LEVEL': 'WARNING'})
+    assert disabled.notifier is None
+    print("  ✓ Sin TRAFFIC_MANAGER_HOST no hay notificaciones")
+
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Ejecutando tests del interceptor DNS")
+    print("=" * 60)
+
+    tests = [
+        test_notifier_batches,
+        test_notifier_collapse,
+        test_notifier_spill,
+        test_interceptor_index,
+        test_controller_commands
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Tests para el pool de resolución DNS asíncrona
+"""
+
+import sys
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+import dns_resolver
+from dns_resolver import ResolverPool, resolve_dnspython
+
+
+class SlowResolver:
+    """Resolvedor falso que cuenta llamadas y tarda hasta que se libera"""
+
+    def __init__(self, answers, ttl=None):
+        self.answers = answers
+        self.ttl = ttl
+        self.calls = []
+        self.release = threading.Event()
+
+    def __call__(self, domain):
+        self.calls.append(domain)
+        self.release.wait(5)
+        if domain not in self.answers:
+            raise OSError("NXDOMAIN")
+        return set(self.answers[domain]), self.ttl
+
+
+def test_submit_does_not_block_and_coalesces():
+    """Test: submit vuelve de inmediato y agrupa consultas del mismo nombre"""
+    print("🧪 Test: Resolución sin bloqueo y coalescencia")
+
+    fake = SlowResolver({'dazn.com': ['1.1.1.1', '2606:4700::1111']})
+    pool = ResolverPool(workers=2, resolve_func=fake)
+    results = []
+    done = threading.Event()
+
+    def callback(domain, ips, ttl):
+        results.append((domain, ips, ttl))
+        if len(results) == 3:
+            done.set()
+
+    start = time.monotonic()
+    for _ in range(3):
+        pool.submit('dazn.com', callback)
+    assert time.monotonic() - start < 0.5
+    print("  ✓ submit no bloquea")
+
+    fake.release.set()
+    assert done.wait(5)
+    assert fake.calls == ['dazn.com']
+    assert pool.stats['coalesced'] == 2
+    assert results[0][1] == {'1.1.1.1', '2606:4700::1111'}
+    print("  ✓ Una sola resolución para 3 consultas, IPv4 e IPv6")
+
+    pool.shutdown()
+    print("  ✅ Coalescencia correcta")
+    print()
+    return True
+
+
+def test_cache_ttl_and_lru():
+    """Test: la caché respeta el TTL y el tamaño máximo"""
+    print("🧪 Test: Caché con TTL y LRU")
+
+    fake = SlowResolver({'a.com': ['1.0.0.1'], 'b.com': ['1.0.0.2'], 'c.com': ['1.0.0.3']}, ttl=60)
+    fake.release.set()
+    pool = ResolverPool(workers=1, cache_size=2, resolve_func=fake)
+
+    assert pool.resolve('a.com') == {'1.0.0.1'}
+    assert pool.resolve('a.com') == {'1.0.0.1'}
+    assert fake.calls == ['a.com']
+    ips, ttl = pool.get_cached('a.com')
+    assert 55 <= ttl <= 60
+    print("  ✓ Resultado servido desde caché con su TTL")
+
+    pool.resolve('b.com')
+    pool.resolve('a.com')   # a.com pasa a ser el más reciente
+    pool.resolve('c.com')   # expulsa b.com
+    assert len(pool) == 2
+    assert pool.get_cached('b.com') is None
+    assert pool.get_cached('a.com') is not None
+    print("  ✓ Tamaño acotado con expulsión LRU")
+
+    assert pool.resolve('no-existe.com') == set()
+    assert pool.stats['errors'] == 1
+    pool.resolve('no-existe.com')
+    assert fake.calls.count('no-existe.com') == 1
+    print("  ✓ Respuestas negativas cacheadas")
+
+    pool._cache['a.com'] = (time.monotonic() - 1, {'1.0.0.1'})
+    assert pool.get_cached('a.com') is None
+    print("  ✓ Entradas caducadas descartadas")
+
+    pool.shutdown()
+    print("  ✅ Caché correcta")
+    print()
+    return True
+
+
+class DNSException(Exception):
+    pass
+
+
+class NoAnswer(DNSException):
+    pass
+
+
+class Timeout(DNSException):
+    pass
+
+
+def stub_dns(records):
+    """Sustituto mínimo de dnspython: ``records[tipo]`` son IPs o una excepción"""
+    class Answer:
+        def __init__(self, addresses):
+            self.rrset = SimpleNamespace(ttl=120)
+            self._rdata = [SimpleNamespace(address=a) for a in addresses]
+
+        def __iter__(self):
+            return iter(self._rdata)
+
+    def resolve(domain, rdtype):
+        result = records[rdtype]
+        if isinstance(result, Exception):
+            raise result
+        return Answer(result)
+
+    return SimpleNamespace(
+        resolver=SimpleNamespace(resolve=resolve, NoAnswer=NoAnswer, NXDOMAIN=NoAnswer),
+        exception=SimpleNamespace(DNSException=DNSException),
+    )
+
+
+def test_dnspython_partial_failure():
+    """Test: un tipo de registro que falla no descarta las IPs del otro"""
+    print("🧪 Test: A correcto y AAAA con timeout")
+
+    original = dns_resolver.dns
+    try:
+        dns_resolver.dns = stub_dns({'A': ['104.16.1.1'], 'AAAA': Timeout('AAAA')})
+        assert resolve_dnspython('dazn.com') == ({'104.16.1.1'}, 120)
+        print("  ✓ IPs de A conservadas pese al timeout de AAAA")
+
+        pool = ResolverPool(workers=1, resolve_func=resolve_dnspython)
+        assert pool.lookup('dazn.com') == ({'104.16.1.1'}, 120)
+        pool.shutdown()
+        print("  ✓ El pool no lo guarda como fallo")
+
+        dns_resolver.dns = stub_dns({'A': NoAnswer(), 'AAAA': Timeout('AAAA')})
+        try:
+            resolve_dnspython('dazn.com')
+            assert False, "sin IPs debería propagar el error"
+        except Timeout:
+            pass
+        print("  ✓ Sin ninguna IP se propaga el error")
+    finally:
+        dns_resolver.dns = original
+
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Tests para el pool de resolución DNS")
+    print("=" * 60)
+    print()
+
+    tests = [
+        test_submit_does_not_block_and_coalesces,
+        test_cache_ttl_and_lru,
+        test_dnspython_partial_failure
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tests para el índice de sufijos de dominios WARP
+"""
+
+import sys
+import os
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from domain_index import DomainIndex, OverlayIndex
+
+
+def linear_is_warp_domain(warp_domains, domain):
+    """Implementación original (recorrido lineal) usada como referencia"""
+    if domain in warp_domains:
+        return True
+    for warp_domain in warp_domains:
+        if domain.endswith(f".{warp_domain}"):
+            return True
+    return False
+
+
+def test_exact_and_subdomain_match():
+    """Test de coincidencia exacta y de subdominios"""
+    print("🧪 Test: Coincidencia exacta y de subdominios")
+
+    index = DomainIndex(['example.com', 'dazn.com', 'stream.es'])
+
+    assert index.matches('example.com')
+    assert index.matches('www.example.com')
+    assert index.matches('a.b.c.dazn.com')
+    assert index.match('live.stream.es') == 'stream.es'
+    print("  ✓ Exacto y subdominios detectados")
+
+    assert not index.matches('notexample.com')
+    assert not index.matches('example.com.evil.net')
+    assert not index.matches('com')
+    assert not index.matches('')
+    assert index.match('google.com') is None
+    print("  ✓ Falsos positivos rechazados")
+
+    print("  ✅ Coincidencias correctas")
+    print()
+    return True
+
+
+def test_matches_linear_reference():
+    """Test de equivalencia con el recorrido lineal original"""
+    print("🧪 Test: Equivalencia con la implementación lineal")
+
+    warp_domains = {'example.com', 'sub.other.org', 'tv', 'a-b.net'}
+    index = DomainIndex(warp_domains)
+
+    queries = [
+        'example.com', 'x.example.com', 'example.co', 'other.org',
+        'sub.other.org', 'deep.sub.other.org', 'canal.tv', 'tv',
+        'a-b.net', 'xa-b.net', 'x.a-b.net', 'example.com.', 'localhost',
+    ]
+    for query in queries:
+        assert index.matches(query) == linear_is_warp_domain(warp_domains, query), query
+    print(f"  ✓ {len(queries)} consultas coinciden con la referencia")
+
+    print("  ✅ Equivalencia correcta")
+    print()
+    return True
+
+
+def test_set_operations():
+    """Test de operaciones de conjunto usadas por el controlador"""
+    print("🧪 Test: Operaciones de conjunto")
+
+    index = DomainIndex()
+    index.add('uno.com')
+    index.update(['dos.com', 'tres.com'])
+    assert len(index) == 3
+    assert 'dos.com' in index
+    assert sorted(index) == ['dos.com', 'tres.com', 'uno.com']
+
+    index.remove('dos.com')
+    index.discard('no-existe.com')
+    assert 'dos.com' not in index
+    assert not index.matches('www.dos.com')
+    print("  ✓ add/update/remove/discard correctos")
+
+    print("  ✅ Operaciones de conjunto correctas")
+    print()
+    return True
+
+
+def test_overlay():
+    """Test de la capa de altas y bajas manuales sobre el índice"""
+    print("🧪 Test: Capa manual sobre el índice")
+
+    base = DomainIndex(['dazn.com', 'live.dazn.com', 'laliga.es'])
+    overlay = OverlayIndex(base).with_added('movistar.es').with_added('dazn.com')
+    assert overlay.added == {'movistar.es'} and overlay.changes == 1
+    assert overlay.match('tv.movistar.es') == 'movistar.es' and len(overlay) == 4
+    assert 'movistar.es' not in base
+    print("  ✓ Altas consultadas antes que la base, sin tocarla")
+
+    overlay = overlay.with_removed('live.dazn.com').with_removed('laliga.es').with_removed('no-existe.com')
+    assert overlay.removed == {'live.dazn.com', 'laliga.es'}
+    assert overlay.match('a.live.dazn.com') == 'dazn.com'
+    assert not overlay.matches('www.laliga.es') and 'laliga.es' not in overlay
+    assert sorted(overlay) == ['dazn.com', 'movistar.es'] and len(overlay) == 2
+    print("  ✓ Bajas ocultan la entrada base; sus padres siguen cubriendo")
+
+    overlay = overlay.with_added('laliga.es').with_removed('movistar.es')
+    assert overlay.removed == {'live.dazn.com'} and overlay.added == frozenset()
+    assert overlay.matches('www.laliga.es') and not overlay.matches('movistar.es')
+    print("  ✓ Alta de una baja (y viceversa) deshace el cambio")
+
+    print()
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Tests para el índice de dominios WARP")
+    print("=" * 60)
+    print()
+
+    tests = [
+        test_exact_and_subdomain_match,
+        test_matches_linear_reference,
+        test_set_operations,
+        test_overlay
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tests para la validación y normalización de dominios
+"""
+
+import sys
+import os
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from domain_validator import is_valid_domain, normalize_domain, normalize_batch, validate_stream
+
+VALID = [
+    'google.com',
+    'subdomain.example.com',
+    'test-domain.es',
+    'a.b.c.d.example.com',
+    'localhost',
+]
+
+INVALID = [
+    '',
+    '-invalid.com',
+    'invalid-.com',
+    '.invalid.com',
+    'invalid..com',
+    'under_score.com',
+    'a' * 254,
+    ('a' * 64) + '.com',
+]
+
+
+def test_single_domain():
+    """Test: validación y normalización de un dominio"""
+    print("🧪 Test: Dominio individual")
+
+    for domain in VALID:
+        assert is_valid_domain(domain), f"Debería ser válido: {domain}"
+    for domain in INVALID:
+        assert not is_valid_domain(domain), f"Debería ser inválido: {domain[:50]}"
+    print(f"  ✓ {len(VALID)} válidos y {len(INVALID)} inválidos")
+
+    assert normalize_domain('WWW.DAZN.com.') == 'www.dazn.com'
+    assert normalize_domain('ñandú.es') == 'xn--and-6ma2c.es'
+    assert normalize_domain('xn--and-6ma2c.es') == 'xn--and-6ma2c.es'
+    assert normalize_domain('bad..ñ.es') is None
+    print("  ✓ Minúsculas, punto final e IDNA")
+
+    print("  ✅ Validación correcta")
+    print()
+    return True
+
+
+def test_batch_matches_single():
+    """Test: el lote da el mismo resultado que la validación individual"""
+    print("🧪 Test: Validación por lotes")
+
+    candidates = VALID + INVALID + ['DAZN.COM.', 'ñandú.es', 'x' * 63 + '.es', 'bad\nname.com', 'a.', '.']
+    expected = sorted(filter(None, map(normalize_domain, candidates)))
+    assert sorted(normalize_batch(candidates)) == expected, normalize_batch(candidates)
+    print(f"  ✓ {len(expected)} de {len(candidates)} candidatos aceptados")
+
+    stream = list(validate_stream(iter(candidates * 3), batch_size=7))
+    assert sorted(stream) == sorted(expected * 3)
+    print("  ✓ Flujo troceado en lotes")
+
+    long_domain = '.'.join(['a' * 63] * 3 + ['b' * 61])
+    assert len(long_domain) == 253
+    assert normalize_batch([long_domain, long_domain + '.', long_domain + 'b']) == [long_domain, long_domain]
+    print("  ✓ Límite de 253 caracteres")
+
+    print("  ✅ Lotes correctos")
+    print()
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Tests para el validador de dominios")
+    print("=" * 60)
+    print()
+
+    tests = [
+        test_single_domain,
+        test_batch_matches_single
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Tests para los generadores de datos de los benchmarks
+"""
+
+import sys
+import os
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from generators import blocklist_lines, generate_domains, log_lines
+from list_parser import parse_blocklist, parse_hosts
+from log_parser import ReplyCorrelator
+from controller_helper import make_controller
+
+
+def test_blocklists_parse():
+    """Test: las listas generadas se parsean en todos los formatos"""
+    print("🧪 Test: Listas sintéticas")
+
+    domains = generate_domains(2000)
+    assert len(set(domains)) == 2000
+    assert set(parse_hosts(blocklist_lines(domains, 'hosts'))) == set(domains)
+    for fmt in ('plain', 'wildcard'):
+        assert set(parse_blocklist(blocklist_lines(domains, fmt))) == set(domains)
+    print("  ✓ hosts, plana y wildcard devuelven los mismos dominios")
+
+    print("  ✅ Listas correctas")
+    print()
+    return True
+
+
+def test_log_stream_understood():
+    """Test: el log generado tiene consultas y respuestas reconocibles"""
+    print("🧪 Test: pihole.log sintético")
+
+    warp = generate_domains(50, seed=9)
+    lines = list(log_lines(5000, warp, warp_ratio=0.2))
+    assert len(lines) == 5000
+
+    controller = make_controller(domains=warp)
+    correlator = ReplyCorrelator()
+    queries = warp_queries = answers = 0
+    for line in lines:
+        query = controller.parse_pihole_log_line(line)
+        if query:
+            queries += 1
+            if controller.is_warp_domain(query['domain']):
+                warp_queries += 1
+                correlator.track(query['domain'])
+        elif correlator.feed(line):
+            answers += 1
+    controller.resolver.shutdown()
+
+    assert queries > 1000
+    assert 0.1 < warp_queries / queries < 0.3
+    assert answers >= warp_queries
+    print(f"  ✓ {queries} consultas, {warp_queries} WARP, {answers} respuestas WARP")
+
+    print("  ✅ Log correcto")
+    print()
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Tests para los generadores de benchmarks")
+    print("=" * 60)
+    print()
+
+    tests = [
+        test_blocklists_parse,
+        test_log_stream_understood
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
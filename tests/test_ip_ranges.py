@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Tests para los rangos CIDR de la lista de IPs: agregación, búsqueda e
+instalación como rangos en los backends
+"""
+
+import sys
+import os
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from ip_ranges import IpRanges
+from redirect_backends import IptablesBackend, IpsetBackend, NftablesBackend
+from controller_helper import FakeRunner, make_controller
+
+IP_LIST = """# Rangos WARP
+104.16.0.0/13
+104.24.0.0/13       # adyacente: se funde con el anterior
+104.16.5.0/24
+172.64.1.1/16
+10.0.1.0/24
+10.0.2.0/24
+198.41.128.7
+2606:4700::/33
+2606:4700:8000::/33
+no-es-una-ip
+300.1.1.0/24
+"""
+
+
+def test_collapse_and_lookup():
+    """Test: agregación de prefijos y búsqueda por intervalos"""
+    print("🧪 Test: Agregación y búsqueda de rangos")
+
+    ranges, invalid = IpRanges.parse(IP_LIST.splitlines())
+    assert invalid == 2
+    assert ranges.networks == ('10.0.1.0/24', '10.0.2.0/24', '104.16.0.0/12', '172.64.0.0/16',
+                               '198.41.128.7', '2606:4700::/32')
+    print(f"  ✓ 10 entradas válidas agregadas en {len(ranges)} prefijos")
+
+    for ip in ('104.16.0.0', '104.27.255.255', '172.64.200.1', '198.41.128.7', '10.0.2.9',
+               '2606:4700:8000::1'):
+        assert ip in ranges, ip
+    for ip in ('104.15.255.255', '104.32.0.0', '198.41.128.8', '10.0.3.0', '2606:4701::1',
+               'no-es-una-ip', '::ffff:104.16.0.1'):
+        assert ip not in ranges, ip
+    assert '1.1.1.1' not in IpRanges()
+    print("  ✓ Límites de cada intervalo, IPv6 y entradas no válidas")
+
+    return True
+
+
+def test_backends_install_networks():
+    """Test: cada backend instala los rangos como tales, no IP a IP"""
+    print("🧪 Test: Rangos en ipset, nftables e iptables")
+
+    ranges, _ = IpRanges.parse(IP_LIST.splitlines())
+
+    runner = FakeRunner()
+    backend = IpsetBackend(runner=runner)
+    backend.ipv6_enabled = True
+    backend.set_networks(ranges.networks)
+    assert backend.flush() == 6
+    batch = runner.inputs_of('ipset')[0]
+    assert "add WARP_NETS 104.16.0.0/12" in batch and "add WARP_NETS6 2606:4700::/32" in batch
+    assert "WARP_IPS" not in batch and backend.installed == set()
+    print("  ✓ ipset: un miembro hash:net por prefijo")
+
+    backend.set_networks(['104.16.0.0/12', '8.8.8.0/24'])
+    assert backend.flush() == 6
+    batch = runner.inputs_of('ipset')[1]
+    assert "del WARP_NETS 172.64.0.0/16" in batch and "add WARP_NETS 8.8.8.0/24" in batch
+    assert "104.16.0.0/12" not in batch
+    assert backend.flush() == 0
+    print("  ✓ Cambio de lista: solo el diff de rangos")
+
+    runner = FakeRunner()
+    backend = NftablesBackend(runner=runner)
+    assert backend.setup()
+    backend.set_networks(['104.16.0.0/12', '2606:4700::/32'])
+    assert backend.flush() == 2
+    batch = runner.inputs_of('nft')[1]
+    assert "add element inet antitebas warp_nets { 104.16.0.0/12 }" in batch
+    assert "add element inet antitebas warp_nets6 { 2606:4700::/32 }" in batch
+    assert "timeout" not in batch
+    print("  ✓ nftables: sets interval sin timeout")
+
+    saved = ("*nat\n-A WARP_REDIRECT -d 1.1.1.1/32 -p tcp -j REDIRECT --to-ports 8080\n"
+             "-A WARP_REDIRECT -d 8.8.8.0/24 -p tcp -j REDIRECT --to-ports 8080\nCOMMIT\n")
+    runner = FakeRunner(outputs={'iptables-save': saved})
+    backend = IptablesBackend(runner=runner)
+    assert backend.setup()
+    assert backend.installed == {'1.1.1.1'} and backend.networks == {'8.8.8.0/24'}
+    backend.set_networks(['104.16.0.0/12'])
+    assert backend.flush() == 2
+    restore = runner.inputs_of('iptables-restore')[-1]
+    assert "-A WARP_REDIRECT -d 104.16.0.0/12 -p tcp -j REDIRECT --to-ports 8080" in restore
+    assert "-D WARP_REDIRECT -d 8.8.8.0/24" in restore and "1.1.1.1" not in restore
+    assert backend.networks == {'104.16.0.0/12'}
+    print("  ✓ iptables: una regla por prefijo, rangos antiguos adoptados y retirados")
+
+    return True
+
+
+def test_controller_skips_covered_ips():
+    """Test: IPs resueltas dentro de un rango no instalan regla propia"""
+    print("🧪 Test: IPs cubiertas por un rango")
+
+    controller = make_controller(domains=['dazn.com'], extra_config={
+        'LOG_LEVEL': 'WARNING', 'WARMUP_ENABLED': 'false',
+    })
+    (controller.workdir / 'warp-ips.txt').write_text(IP_LIST)
+    controller.load_warp_lists()
+    runner = FakeRunner()
+    controller.redirect_backend.runner = runner
+    controller.redirect_backend.ipv6_enabled = True
+
+    controller.on_domain_resolved('dazn.com', {'104.17.1.1', '2606:4700::6810:1', '151.101.1.1'}, 300)
+    assert controller.redirect_backend.pending == {'151.101.1.1'}
+    assert len(controller.redirect_table) == 1
+    assert controller.m_in_ranges.value() == 2
+    print("  ✓ Solo la IP fuera de los rangos se encola")
+
+    assert controller.flush_redirects() == 7
+    batch = runner.inputs_of('ipset')
+    assert any("add WARP_NETS 104.16.0.0/12" in data for data in batch)
+    assert any("add WARP_IPS 151.101.1.1" in data for data in batch)
+    assert not any("104.17.1.1" in data for data in batch)
+    print("  ✓ Rangos y la IP suelta instalados en el flush")
+
+    controller.record_coverage('dazn.com', ['104.17.1.1', '151.101.1.1'])
+    assert controller.m_coverage.value(result='hit') == 1
+    print("  ✓ Respuesta dentro de un rango cuenta como cubierta")
+
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Ejecutando tests de rangos de IPs")
+    print("=" * 60)
+
+    tests = [
+        test_collapse_and_lookup,
+        test_backends_install_networks,
+        test_controller_skips_covered_ips
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
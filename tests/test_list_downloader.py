@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Tests para el descargador de listas (GET condicional y caché en disco)
+"""
+
+import sys
+import os
+import gzip
+import lzma
+import tempfile
+from pathlib import Path
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from list_downloader import (ListDownloader, STATUS_UPDATED, STATUS_NOT_MODIFIED,
+                             STATUS_UNCHANGED, STATUS_STALE, STATUS_ERROR)
+from controller_helper import make_controller
+
+
+class ListServer:
+    """Servidor HTTP local que sirve listas con ETag opcional"""
+
+    def __init__(self):
+        self.files = {}          # ruta → (cuerpo, etag)
+        self.requests = []       # (ruta, If-None-Match)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append((self.path, self.headers.get('If-None-Match')))
+                if self.path not in server.files:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body, etag = server.files[self.path]
+                if etag and self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                if etag:
+                    self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_port}{path}"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class CountingParser:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, lines):
+        self.calls += 1
+        return (line.strip() for line in lines if line.strip())
+
+
+def test_conditional_get_and_cache():
+    """Test: 304 y hash sin cambios no vuelven a parsear"""
+    print("🧪 Test: GET condicional y caché por hash")
+
+    server = ListServer()
+    server.files['/etag.txt'] = (b"dazn.com\nlaliga.com\n", '"v1"')
+    server.files['/plain.txt'] = (b"movistarplus.es\n", None)
+    parser = CountingParser()
+    downloader = ListDownloader(tempfile.mkdtemp(prefix='antitebas-cache-'))
+    jobs = [(server.url('/etag.txt'), 'spain', parser), (server.url('/plain.txt'), 'spain', parser)]
+
+    try:
+        results = downloader.fetch_all(jobs)
+        assert [r.status for r in results] == [STATUS_UPDATED, STATUS_UPDATED]
+        assert results[0].domains == {'dazn.com', 'laliga.com'}
+        assert parser.calls == 2
+        print("  ✓ Primera descarga parseada y cacheada")
+
+        results = downloader.fetch_all(jobs)
+        assert [r.status for r in results] == [STATUS_NOT_MODIFIED, STATUS_UNCHANGED]
+        assert results[0].domains == {'dazn.com', 'laliga.com'}
+        assert results[1].domains == {'movistarplus.es'}
+        assert parser.calls == 2
+        assert ('/etag.txt', '"v1"') in server.requests
+        print("  ✓ 304 y cuerpo idéntico reutilizan la caché sin parsear")
+
+        server.files['/etag.txt'] = (b"dazn.com\n", '"v2"')
+        result = downloader.fetch(server.url('/etag.txt'), 'spain', parser)
+        assert result.status == STATUS_UPDATED and result.domains == {'dazn.com'}
+        print("  ✓ Contenido nuevo se vuelve a parsear")
+    finally:
+        server.close()
+        downloader.close()
+
+    print("  ✅ Caché correcta")
+    print()
+    return True
+
+
+def test_errors_use_stale_cache():
+    """Test: errores de descarga con y sin caché previa"""
+    print("🧪 Test: Errores de descarga")
+
+    server = ListServer()
+    server.files['/list.txt'] = (b"dazn.com\n", None)
+    downloader = ListDownloader(tempfile.mkdtemp(prefix='antitebas-cache-'))
+    parser = CountingParser()
+
+    try:
+        downloader.fetch(server.url('/list.txt'), 'hosts', parser)
+        del server.files['/list.txt']
+        result = downloader.fetch(server.url('/list.txt'), 'hosts', parser)
+        assert result.status == STATUS_STALE and result.domains == {'dazn.com'}
+        print("  ✓ Error HTTP: se usa el último resultado conocido")
+
+        result = downloader.fetch(server.url('/missing.txt'), 'hosts', parser)
+        assert result.status == STATUS_ERROR and result.domains == set()
+        print("  ✓ Error sin caché: lista vacía")
+    finally:
+        server.close()
+        downloader.close()
+
+    print("  ✅ Errores correctos")
+    print()
+    return True
+
+
+def test_compressed_and_local_lists():
+    """Test: listas gzip/xz por HTTP y archivos locales"""
+    print("🧪 Test: Listas comprimidas y locales")
+
+    body = b"0.0.0.0 dazn.com\n0.0.0.0 laliga.com\n"
+    server = ListServer()
+    server.files['/hosts.gz'] = (gzip.compress(body), None)
+    server.files['/hosts.xz'] = (lzma.compress(body), None)
+    downloader = ListDownloader(tempfile.mkdtemp(prefix='antitebas-cache-'))
+    parser = CountingParser()
+    hosts = lambda lines: (line.split()[1] for line in lines if line.strip())
+
+    try:
+        for path in ('/hosts.gz', '/hosts.xz'):
+            result = downloader.fetch(server.url(path), 'hosts', hosts)
+            assert result.domains == {'dazn.com', 'laliga.com'}, result
+        print("  ✓ gzip y xz descomprimidos al vuelo")
+    finally:
+        server.close()
+
+    local = Path(tempfile.mkdtemp(prefix='antitebas-list-')) / 'local.txt.gz'
+    local.write_bytes(gzip.compress(b"movistarplus.es\n"))
+    for url in (str(local), local.as_uri()):
+        assert downloader.fetch(url, 'spain', parser).domains == {'movistarplus.es'}
+    assert downloader.fetch(str(local), 'spain', parser).status == STATUS_UNCHANGED
+    print("  ✓ Ruta local y file:// (sin reparsear si no cambia)")
+
+    result = downloader.fetch(str(local.with_name('missing.txt')), 'spain', parser)
+    assert result.status == STATUS_ERROR
+    print("  ✓ Archivo local inexistente: error")
+    downloader.close()
+
+    print("  ✅ Fuentes correctas")
+    print()
+    return True
+
+
+def test_corrupt_compressed_list():
+    """Test: una lista comprimida corrupta no afecta a las demás"""
+    print("🧪 Test: Lista comprimida corrupta")
+
+    workdir = Path(tempfile.mkdtemp(prefix='antitebas-list-'))
+    good = workdir / 'good.txt'
+    good.write_text("0.0.0.0 dazn.com\n")
+    corrupt = workdir / 'corrupt.txt.gz'
+    valid_gz = gzip.compress(b"laliga.es\n" * 1000)
+    # Cabecera gzip válida seguida de un bloque deflate inválido
+    corrupt.write_bytes(valid_gz[:10] + b'\xff' * 64 + valid_gz[10:])
+    controller = make_controller(extra_config={
+        'LOG_LEVEL': 'CRITICAL',
+        'DOMAIN_LISTS_URLS': f"{good.as_uri()},{corrupt.as_uri()}",
+    })
+
+    try:
+        controller.update_domain_lists()
+        assert set(controller.warp_domains) == {'dazn.com'}
+        print("  ✓ Error de descompresión aislado: la lista buena se aplica")
+
+        downloader = controller.downloader
+        parser = CountingParser()
+        assert downloader.fetch(corrupt.as_uri(), 'hosts', parser).status == STATUS_ERROR
+        corrupt.write_bytes(gzip.compress(b"laliga.es\n"))
+        assert downloader.fetch(corrupt.as_uri(), 'hosts', parser).domains == {'laliga.es'}
+        corrupt.write_bytes(valid_gz[:len(valid_gz) // 2])
+        result = downloader.fetch(corrupt.as_uri(), 'hosts', parser)
+        assert result.status == STATUS_STALE and result.domains == {'laliga.es'}, result
+        assert downloader.load_meta(corrupt.as_uri(), 'hosts')['count'] == 1
+        print("  ✓ gzip truncado: último resultado conocido, caché intacta")
+    finally:
+        controller.resolver.shutdown()
+
+    print("  ✅ Fallos aislados por URL")
+    print()
+    return True
+
+
+def test_controller_downloads_in_parallel():
+    """Test: el controlador descarga ambas listas en una sola tanda"""
+    print("🧪 Test: Actualización de listas del controlador")
+
+    server = ListServer()
+    server.files['/hosts'] = (b"# hosts\n0.0.0.0 dazn.com\n127.0.0.1 laliga.com\n1.2.3.4 otro.com\n", '"h"')
+    server.files['/spain'] = (b"*.movistarplus.es\nbeinsports.com\n", None)
+    controller = make_controller(extra_config={
+        'DOMAIN_LISTS_URLS': server.url('/hosts'),
+        'SPAIN_BLOCKLIST_URLS': f"{server.url('/spain')}, ",
+    })
+
+    try:
+        controller.update_domain_lists()
+        assert set(controller.warp_domains) == {'dazn.com', 'laliga.com', 'movistarplus.es', 'beinsports.com'}
+        print("  ✓ Formatos hosts y plano combinados")
+
+        controller.update_domain_lists()
+        assert len(server.requests) == 4
+        assert ('/hosts', '"h"') in server.requests
+        assert len(controller.warp_domains) == 4
+        print("  ✓ Segunda actualización condicional")
+    finally:
+        server.close()
+        controller.resolver.shutdown()
+
+    print("  ✅ Actualización correcta")
+    print()
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Tests para el descargador de listas")
+    print("=" * 60)
+    print()
+
+    tests = [
+        test_conditional_get_and_cache,
+        test_errors_use_stale_cache,
+        test_compressed_and_local_lists,
+        test_corrupt_compressed_list,
+        test_controller_downloads_in_parallel
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Tests para el parser incremental de listas
+"""
+
+import sys
+import os
+import gzip
+import lzma
+import tracemalloc
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from list_parser import decompress_chunks, iter_lines, parse_hosts, parse_blocklist
+
+
+def split_chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_lines_across_chunks():
+    """Test: líneas partidas entre bloques"""
+    print("🧪 Test: Líneas entre bloques")
+
+    data = "0.0.0.0 dazn.com\n# comentario\n127.0.0.1 ñandú.es\nsin-salto".encode()
+    for size in (1, 3, 7, len(data)):
+        lines = list(iter_lines(split_chunks(data, size)))
+        assert lines == ['0.0.0.0 dazn.com', '# comentario', '127.0.0.1 ñandú.es', 'sin-salto'], size
+    print("  ✓ Mismo resultado con cualquier tamaño de bloque (UTF-8 incluido)")
+
+    print("  ✅ División correcta")
+    print()
+    return True
+
+
+def test_formats():
+    """Test: formatos hosts, plano y wildcard"""
+    print("🧪 Test: Formatos de lista")
+
+    lines = [
+        '0.0.0.0 dazn.com',
+        '127.0.0.1 laliga.com  # inline',
+        '1.2.3.4 otro.com',
+        '*.movistarplus.es',
+        'beinsports.com',
+        '',
+        '# comentario',
+    ]
+    assert list(parse_hosts(lines)) == ['dazn.com', 'laliga.com']
+    print("  ✓ hosts: solo entradas de bloqueo")
+
+    assert list(parse_blocklist(lines)) == [
+        'dazn.com', 'laliga.com', 'movistarplus.es', 'beinsports.com']
+    print("  ✓ Lista España: hosts, plano y wildcard")
+
+    print("  ✅ Formatos correctos")
+    print()
+    return True
+
+
+def test_compressed_streaming_memory():
+    """Test: gzip/xz en streaming con memoria acotada"""
+    print("🧪 Test: Descompresión en streaming")
+
+    def peak_parsing(compressed, expected):
+        # Bloques generados bajo demanda, como los de una descarga
+        chunks = (compressed[i:i + 65536] for i in range(0, len(compressed), 65536))
+        tracemalloc.start()
+        count = sum(1 for _ in parse_hosts(iter_lines(decompress_chunks(chunks))))
+        _current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert count == expected
+        return peak
+
+    for name, compress in (('gzip', gzip.compress), ('xz', lambda data: lzma.compress(data, preset=1))):
+        peaks = []
+        for n in (25000, 100000):
+            data = b''.join(b'0.0.0.0 dominio%d.example.com\n' % i for i in range(n))
+            peaks.append(peak_parsing(compress(data), n))
+        # El diccionario de xz ocupa un tamaño fijo (según el preset), no según la lista
+        assert peaks[1] < peaks[0] * 1.5, peaks
+        print(f"  ✓ {name}: pico {peaks[0] // 1024} KB con 25k dominios, {peaks[1] // 1024} KB con 100k")
+
+    print("  ✅ Streaming correcto")
+    print()
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Tests para el parser de listas")
+    print("=" * 60)
+    print()
+
+    tests = [
+        test_lines_across_chunks,
+        test_formats,
+        test_compressed_streaming_memory
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
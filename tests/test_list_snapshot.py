@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Tests para las instantáneas de listas: sustitución atómica, recarga de
+archivos editados a mano y lectura concurrente sin locks
+"""
+
+import sys
+import os
+import threading
+import time
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from controller_helper import make_controller
+from ip_ranges import IpRanges
+
+
+def test_snapshots_are_immutable():
+    """Test: cada cambio publica una versión nueva sin tocar la anterior"""
+    print("🧪 Test: Instantáneas inmutables y versionadas")
+
+    controller = make_controller(domains=['dazn.com'], extra_config={'LOG_LEVEL': 'WARNING'})
+    before = controller.lists
+    assert controller.add_domain('laliga.es')
+    after = controller.lists
+
+    assert after.version == before.version + 1
+    assert 'laliga.es' not in before.domains and 'laliga.es' in after.domains
+    assert controller.is_warp_domain('www.laliga.es')
+    assert isinstance(controller.warp_ips, IpRanges)
+    print(f"  ✓ v{before.version} intacta, v{after.version} en vigor")
+
+    assert controller.control_reload({})['version'] == after.version + 1
+    assert controller.control_stats({})['list_version'] == controller.lists.version
+    print("  ✓ reload y stats informan de la versión")
+
+    return True
+
+
+def test_reload_on_file_change():
+    """Test: ediciones a mano de las listas se recargan"""
+    print("🧪 Test: Recarga por cambio de archivo")
+
+    controller = make_controller(domains=['dazn.com'], extra_config={'LOG_LEVEL': 'WARNING'})
+    assert not controller.reload_if_changed()
+    controller.add_domain('laliga.es')
+    assert not controller.reload_if_changed()
+    print("  ✓ Los cambios del propio controlador no provocan recarga")
+
+    version = controller.lists.version
+    domain_file = controller.workdir / 'warp-domains.txt'
+    with open(domain_file, 'a') as f:
+        f.write("movistarplus.es\n")
+    assert controller.reload_if_changed()
+    assert controller.is_warp_domain('ver.movistarplus.es') and controller.is_warp_domain('laliga.es')
+    assert controller.lists.version == version + 1
+    print("  ✓ Dominio añadido a mano disponible tras la recarga")
+
+    (controller.workdir / 'warp-ips.txt').write_text("# IPs\n104.16.1.1\n")
+    assert controller.reload_if_changed()
+    assert controller.warp_ips.networks == ('104.16.1.1',)
+    assert not controller.reload_if_changed()
+    print("  ✓ Lista de IPs nueva detectada")
+
+    return True
+
+
+def test_concurrent_reads_during_updates():
+    """Test: el monitor consulta mientras se actualizan las listas"""
+    print("🧪 Test: Lecturas concurrentes sin locks")
+
+    controller = make_controller(domains=['dazn.com'], extra_config={'LOG_LEVEL': 'WARNING'})
+    hosts = controller.workdir / 'hosts.txt'
+    hosts.write_text(''.join(f"0.0.0.0 cdn{i}.example.net\n" for i in range(2000)))
+    controller.config['DOMAIN_LISTS_URLS'] = hosts.as_uri()
+
+    errors = []
+    lookups = [0]
+    stop = threading.Event()
+
+    def reader():
+        try:
+            while not stop.is_set():
+                # Nunca una instantánea a medias: dazn.com está en todas
+                if not controller.is_warp_domain('live.dazn.com'):
+                    errors.append('dazn.com ausente')
+                lookups[0] += 1
+        except Exception as e:
+            errors.append(repr(e))
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    try:
+        for i in range(10):
+            controller.update_domain_lists()
+            controller.add_domain(f"extra{i}.es")
+            controller.load_warp_lists()
+    finally:
+        stop.set()
+        thread.join()
+
+    assert errors == [], errors[:3]
+    assert controller.is_warp_domain('cdn1999.example.net') and controller.is_warp_domain('extra9.es')
+    print(f"  ✓ {lookups[0]} consultas durante {controller.lists.version} versiones, sin errores")
+
+    return True
+
+
+def test_watch_loop():
+    """Test: el hilo de vigilancia recarga sin intervención"""
+    print("🧪 Test: Hilo de vigilancia de listas")
+
+    controller = make_controller(domains=['dazn.com'], extra_config={
+        'LOG_LEVEL': 'WARNING', 'LIST_WATCH_INTERVAL': '0.05',
+    })
+    controller.running = True
+    thread = threading.Thread(target=controller.list_watch_loop, daemon=True)
+    thread.start()
+    try:
+        (controller.workdir / 'warp-domains.txt').write_text("dazn.com\nlaliga.es\n")
+        deadline = time.monotonic() + 5
+        while not controller.is_warp_domain('laliga.es') and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert controller.is_warp_domain('laliga.es')
+    finally:
+        controller.running = False
+        thread.join(1)
+    print("  ✓ Cambio detectado por el hilo de vigilancia")
+
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Ejecutando tests de instantáneas de listas")
+    print("=" * 60)
+
+    tests = [
+        test_snapshots_are_immutable,
+        test_reload_on_file_change,
+        test_concurrent_reads_during_updates,
+        test_watch_loop
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
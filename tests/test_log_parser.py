@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Tests para el parser del log de Pi-hole (respuestas y cadenas CNAME)
+"""
+
+import sys
+import os
+import time
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from log_parser import LogParser, LogQuery, ReplyCorrelator, parse_answer_line
+from controller_helper import make_controller
+
+CNAME_LOG = """Oct 29 10:15:30 dnsmasq[812]: query[A] www.dazn.com from 192.168.1.100
+Oct 29 10:15:30 dnsmasq[812]: forwarded www.dazn.com to 1.1.1.1
+Oct 29 10:15:30 dnsmasq[812]: reply www.dazn.com is <CNAME>
+Oct 29 10:15:30 dnsmasq[812]: reply www.dazn.com.cdn.cloudflare.net is <CNAME>
+Oct 29 10:15:30 dnsmasq[812]: reply edge-77.fastcdn.net is 104.16.1.1
+Oct 29 10:15:30 dnsmasq[812]: reply edge-77.fastcdn.net is 104.16.1.2
+Oct 29 10:15:31 dnsmasq[812]: query[A] google.com from 192.168.1.100
+Oct 29 10:15:31 dnsmasq[812]: reply google.com is 142.250.1.1
+"""
+
+
+def test_parse_answer_lines():
+    """Test de reconocimiento de líneas reply/cached"""
+    print("🧪 Test: Líneas reply/cached")
+
+    assert parse_answer_line("Oct 29 10:15:30 dnsmasq[1]: reply a.com is 1.2.3.4") == ('a.com', '1.2.3.4')
+    assert parse_answer_line("Oct 29 10:15:30 dnsmasq[1]: cached a.com is <CNAME>") == ('a.com', '<CNAME>')
+    assert parse_answer_line(
+        "Oct 29 10:15:30 dnsmasq[1]: 17 10.0.0.2/5300 reply a.com is ::1") == ('a.com', '::1')
+    assert parse_answer_line("Oct 29 10:15:30 dnsmasq[1]: query[A] a.com from 10.0.0.2") is None
+    assert parse_answer_line("Oct 29 10:15:30 dnsmasq[1]: forwarded a.com to 1.1.1.1") is None
+    print("  ✓ Formatos normal y log-queries=extra")
+
+    print("  ✅ Líneas reconocidas")
+    print()
+    return True
+
+
+def test_cname_chain_is_followed():
+    """Test: la cadena CNAME lleva las IPs del CDN al dominio WARP"""
+    print("🧪 Test: Seguimiento de cadenas CNAME")
+
+    correlator = ReplyCorrelator()
+    answers = []
+    for line in CNAME_LOG.splitlines():
+        if 'query[A] www.dazn.com' in line:
+            correlator.track('www.dazn.com')
+        answer = correlator.feed(line, now=0)
+        if answer:
+            answers.append(answer)
+
+    assert [a.ip for a in answers] == ['104.16.1.1', '104.16.1.2']
+    assert all(a.root == 'www.dazn.com' for a in answers)
+    assert answers[0].name == 'edge-77.fastcdn.net'
+    print("  ✓ IPs del CDN asociadas a www.dazn.com")
+
+    assert correlator.alias_root('edge-77.fastcdn.net', now=1) == 'www.dazn.com'
+    assert correlator.alias_root('google.com', now=1) is None
+    print("  ✓ Destinos CNAME registrados como alias; google.com ignorado")
+
+    print("  ✅ Cadena CNAME correcta")
+    print()
+    return True
+
+
+def test_unanswered_queries_expire():
+    """Test: consultas sin respuesta en el log se devuelven al caducar"""
+    print("🧪 Test: Consultas sin respuesta")
+
+    correlator = ReplyCorrelator(window=5)
+    correlator.track('a.com', now=0)
+    correlator.track('b.com', now=1)
+    correlator.feed("Oct 29 10:15:30 dnsmasq[1]: cached b.com is 2.2.2.2", now=2)
+
+    assert correlator.expire(now=3) == []
+    assert correlator.expire(now=10) == ['a.com']
+    assert correlator.expire(now=20) == []
+    print("  ✓ Solo a.com queda pendiente de resolver")
+
+    print("  ✅ Caducidad correcta")
+    print()
+    return True
+
+
+def test_parse_queries_and_timestamps():
+    """Test: consultas de dnsmasq y FTL con su fecha real"""
+    print("🧪 Test: Consultas y fechas del log")
+
+    # Reloj fijo: 15 de marzo de 2024
+    parser = LogParser(clock=lambda: time.mktime((2024, 3, 15, 12, 0, 0, 0, 0, -1)))
+    query = parser.parse_line("Mar  5 08:30:15 dnsmasq[812]: query[AAAA] live.dazn.com from 192.168.1.10")
+    assert isinstance(query, LogQuery)
+    assert (query['domain'], query['client_ip'], query.get('query_type')) == ('live.dazn.com', '192.168.1.10', 'AAAA')
+    assert query.timestamp == time.mktime((2024, 3, 5, 8, 30, 15, 0, 0, -1))
+    assert query.get('raw_line') is None
+    print("  ✓ Formato syslog de dnsmasq, registro con acceso tipo diccionario")
+
+    query = parser.parse_line("2024-03-15 11:59:58.250 [812/T900] query[A] dazn.com from 10.0.0.2")
+    assert query.domain == 'dazn.com'
+    assert query.timestamp == time.mktime((2024, 3, 15, 11, 59, 58, 0, 0, -1)) + 0.25
+    query = parser.parse_line("Mar 15 12:00:00 dnsmasq[1]: 17 10.0.0.2/5300 query[A] a.com from 10.0.0.2")
+    assert query.client_ip == '10.0.0.2'
+    print("  ✓ Formato de FTL y log-queries=extra")
+
+    # Diciembre leído en marzo: año anterior
+    query = parser.parse_line("Dec 31 23:59:59 dnsmasq[1]: query[A] a.com from 10.0.0.2")
+    assert query.timestamp == time.mktime((2023, 12, 31, 23, 59, 59, 0, 0, -1))
+    for line in ("Mar 15 12:00:00 dnsmasq[1]: reply a.com is 1.2.3.4",
+                 "query[A] a.com from 10.0.0.2",
+                 "Mar 15 12:00:00 dnsmasq[1]: query[type=65] a.com from 10.0.0.2"):
+        assert parser.parse_line(line) is None
+    print("  ✓ Año deducido del mes; respuestas y líneas sin fecha descartadas")
+
+    print("  ✅ Consultas correctas")
+    print()
+    return True
+
+
+def test_batch_parse_matches_line_by_line():
+    """Test: el parser por lotes produce lo mismo que línea a línea"""
+    print("🧪 Test: Parser por lotes")
+
+    parser = LogParser()
+    lines = CNAME_LOG.splitlines() + ["Oct 29 10:15:31 dnsmasq[812]: config error", ""]
+    events = parser.parse(lines)
+    expected = []
+    for line in lines:
+        query = parser.parse_line(line)
+        if query:
+            expected.append(query)
+        elif parse_answer_line(line):
+            expected.append(parse_answer_line(line))
+        elif expected[-1] is not None:
+            # Varias líneas seguidas sin consulta ni respuesta: un solo None
+            expected.append(None)
+    assert events == expected
+    assert events[1] is None and events[-1] is None
+    assert parser.parse([]) == []
+    print(f"  ✓ {len(lines)} líneas → {len(events)} eventos en orden")
+
+    correlator = ReplyCorrelator()
+    correlator.track('www.dazn.com', now=0)
+    answers = [correlator.feed_answer(event, now=0) for event in events if type(event) is not LogQuery]
+    assert [a.ip for a in answers if a] == ['104.16.1.1', '104.16.1.2']
+    print("  ✓ Cadena CNAME seguida con feed_answer")
+
+    print("  ✅ Lotes correctos")
+    print()
+    return True
+
+
+def test_controller_uses_log_answers():
+    """Test: el controlador redirige las IPs del log sin resolver"""
+    print("🧪 Test: Controlador con respuestas del log")
+
+    controller = make_controller(domains=['dazn.com'])
+    resolved = []
+    controller.resolver.submit = lambda domain, callback: resolved.append(domain)
+
+    for line in CNAME_LOG.splitlines():
+        query_data = controller.parse_pihole_log_line(line)
+        if query_data:
+            controller.process_dns_query(query_data)
+        else:
+            controller.process_log_answer(line)
+
+    assert controller.redirect_backend.pending == {'104.16.1.1', '104.16.1.2'}
+    assert resolved == []
+    assert controller.stats['warp_queries'] == 1
+    print("  ✓ IPs encoladas sin consultas DNS adicionales")
+
+    controller.process_dns_query({'domain': 'edge-77.fastcdn.net', 'client_ip': '192.168.1.100'})
+    assert controller.stats['warp_queries'] == 2
+    print("  ✓ Consulta directa al destino CNAME tratada como WARP")
+
+    batched = make_controller(domains=['dazn.com'], extra_config={'LOG_LEVEL': 'WARNING'})
+    batched.resolver.submit = lambda domain, callback: resolved.append(domain)
+    batched.classify_lines(CNAME_LOG.splitlines())
+    assert batched.redirect_backend.pending == {'104.16.1.1', '104.16.1.2'}
+    assert batched.stats['total_queries'] == 2 and resolved == []
+    print("  ✓ classify_lines (parser por lotes) da el mismo resultado")
+
+    print("  ✅ Controlador correcto")
+    print()
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Tests para el parser del log de Pi-hole")
+    print("=" * 60)
+    print()
+
+    tests = [
+        test_parse_answer_lines,
+        test_cname_chain_is_followed,
+        test_unanswered_queries_expire,
+        test_parse_queries_and_timestamps,
+        test_batch_parse_matches_line_by_line,
+        test_controller_uses_log_answers
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Tests para el lector incremental del log (rotación, truncado, estado)
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from log_tailer import LogTailer, load_inotify
+
+
+def append(path, text):
+    with open(path, 'a') as f:
+        f.write(text)
+
+
+def test_batched_reads_and_partial_lines():
+    """Test: lectura en lotes y líneas incompletas"""
+    print("🧪 Test: Lotes y líneas parciales")
+
+    workdir = Path(tempfile.mkdtemp())
+    log = workdir / 'pihole.log'
+    log.write_text("antigua 1\n")
+
+    tailer = LogTailer(log, use_inotify=False)
+    assert tailer.open()
+    assert tailer.read_lines() == []
+    print("  ✓ Empieza al final del archivo")
+
+    append(log, "línea 1\nlínea 2\nlínea 3 sin termin")
+    assert tailer.read_lines() == ['línea 1', 'línea 2']
+    append(log, "ar\n")
+    assert tailer.read_lines() == ['línea 3 sin terminar']
+    assert tailer.offset == log.stat().st_size
+    print("  ✓ Línea partida entregada completa")
+
+    tailer.close()
+    print("  ✅ Lectura en lotes correcta")
+    print()
+    return True
+
+
+def test_rotation_and_truncation():
+    """Test: rotación por logrotate y truncado"""
+    print("🧪 Test: Rotación y truncado")
+
+    workdir = Path(tempfile.mkdtemp())
+    log = workdir / 'pihole.log'
+    log.write_text("")
+
+    tailer = LogTailer(log, use_inotify=False)
+    tailer.open()
+    append(log, "a\n")
+    assert tailer.read_lines() == ['a']
+
+    # logrotate: mover y crear uno nuevo; quedan líneas por leer en el viejo
+    append(log, "b\n")
+    log.rename(workdir / 'pihole.log.1')
+    log.write_text("c\n")
+    lines = tailer.read_lines()
+    lines += tailer.read_lines()
+    assert lines == ['b', 'c']
+    print("  ✓ Archivo rotado terminado y nuevo archivo leído")
+
+    append(log, "d\ne\n")
+    assert tailer.read_lines() == ['d', 'e']
+    with open(log, 'w') as f:
+        f.write("f\n")
+    assert tailer.read_lines() == ['f']
+    print("  ✓ Truncado detectado")
+
+    tailer.close()
+    print("  ✅ Rotación correcta")
+    print()
+    return True
+
+
+def test_resume_from_state():
+    """Test: continuar desde la posición guardada tras reiniciar"""
+    print("🧪 Test: Estado persistente")
+
+    workdir = Path(tempfile.mkdtemp())
+    log = workdir / 'pihole.log'
+    state = workdir / 'state' / 'offset.json'
+    log.write_text("")
+
+    tailer = LogTailer(log, state_file=state, use_inotify=False)
+    tailer.open()
+    append(log, "uno\ndos\n")
+    assert tailer.read_lines() == ['uno', 'dos']
+    tailer.close()
+
+    append(log, "tres\n")   # escrito mientras el monitor estaba parado
+    tailer = LogTailer(log, state_file=state, use_inotify=False)
+    tailer.open()
+    assert tailer.read_lines() == ['tres']
+    tailer.close()
+    print("  ✓ Sin pérdidas ni repeticiones tras reiniciar")
+
+    log.unlink()
+    log.write_text("nuevo\n")
+    tailer = LogTailer(log, state_file=state, use_inotify=False)
+    tailer.open()
+    assert tailer.read_lines() == ['nuevo']
+    tailer.close()
+    print("  ✓ Archivo rotado durante la parada leído desde el principio")
+
+    print("  ✅ Estado correcto")
+    print()
+    return True
+
+
+def test_inotify_wakeup():
+    """Test: la espera termina al escribir en el log (inotify)"""
+    print("🧪 Test: Despertar por inotify")
+
+    if load_inotify() is None:
+        print("  ⚠️ inotify no disponible - test omitido")
+        print()
+        return True
+
+    workdir = Path(tempfile.mkdtemp())
+    log = workdir / 'pihole.log'
+    log.write_text("")
+    tailer = LogTailer(log)
+    tailer.open()
+    assert tailer._watcher is not None
+
+    threading.Timer(0.2, append, args=(log, "nueva\n")).start()
+    start = time.monotonic()
+    tailer.wait(timeout=5)
+    assert time.monotonic() - start < 2
+    assert tailer.read_lines() == ['nueva']
+    print("  ✓ Línea recibida sin esperar al timeout")
+
+    tailer.close()
+    print("  ✅ inotify correcto")
+    print()
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Tests para el lector del log de Pi-hole")
+    print("=" * 60)
+    print()
+
+    tests = [
+        test_batched_reads_and_partial_lines,
+        test_rotation_and_truncation,
+        test_resume_from_state,
+        test_inotify_wakeup
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
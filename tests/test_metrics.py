@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Tests para las métricas internas y el endpoint /metrics
+"""
+
+import sys
+import os
+import tempfile
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from metrics import MetricsRegistry, MetricsServer
+from query_sources import LogQuerySource
+from controller_helper import make_controller
+
+
+def test_render_format():
+    """Test: formato de texto de contadores, gauges e histogramas"""
+    print("🧪 Test: Formato de exposición")
+
+    registry = MetricsRegistry()
+    counter = registry.counter('queries_total', 'Consultas', ['kind'])
+    counter.inc(kind='warp')
+    counter.inc(2, kind='warp')
+    gauge = registry.gauge('depth', 'Profundidad', ['stage'], func=lambda: {'resolve': 3})
+    histogram = registry.histogram('latency_seconds', 'Latencia', buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    text = registry.render()
+    assert '# TYPE antitebas_queries_total counter' in text
+    assert 'antitebas_queries_total{kind="warp"} 3' in text
+    assert 'antitebas_depth{stage="resolve"} 3' in text
+    assert gauge.value(stage='resolve') == 3
+    print("  ✓ Contador y gauge calculado con etiquetas")
+
+    assert 'antitebas_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'antitebas_latency_seconds_bucket{le="1"} 2' in text
+    assert 'antitebas_latency_seconds_bucket{le="+Inf"} 3' in text
+    assert 'antitebas_latency_seconds_count 3' in text
+    assert 'antitebas_latency_seconds_sum 5.55' in text
+    print("  ✓ Buckets acumulativos, suma y total")
+
+    registry.gauge('broken', 'Falla', func=lambda: 1 / 0)
+    assert 'antitebas_queries_total' in registry.render()
+    print("  ✓ Un gauge que falla no rompe el resto")
+
+    return True
+
+
+def test_metrics_server():
+    """Test: servidor HTTP local de /metrics"""
+    print("🧪 Test: Endpoint /metrics")
+
+    registry = MetricsRegistry()
+    registry.counter('hits_total', 'Aciertos').inc()
+    server = MetricsServer(registry, port=0)
+    assert server.start()
+    try:
+        url = f"http://127.0.0.1:{server.port}"
+        with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+            body = response.read().decode()
+            assert response.headers['Content-Type'].startswith('text/plain')
+        assert 'antitebas_hits_total 1' in body
+        print("  ✓ GET /metrics devuelve el texto de Prometheus")
+
+        try:
+            urllib.request.urlopen(f"{url}/otra", timeout=5)
+            assert False, "se esperaba 404"
+        except urllib.error.HTTPError as e:
+            assert e.code == 404
+        print("  ✓ Otras rutas devuelven 404")
+    finally:
+        server.stop()
+
+    return True
+
+
+def test_controller_metrics():
+    """Test: métricas del controlador al clasificar líneas"""
+    print("🧪 Test: Métricas del controlador")
+
+    controller = make_controller(domains=['dazn.com'], extra_config={'LOG_LEVEL': 'WARNING'})
+    controller.classify_lines([
+        'Jan 10 12:00:00 dnsmasq[1]: query[A] live.dazn.com from 192.168.1.10',
+        'Jan 10 12:00:00 dnsmasq[1]: reply live.dazn.com is 104.16.1.1',
+        'Jan 10 12:00:01 dnsmasq[1]: query[A] example.org from 192.168.1.10',
+    ])
+
+    assert controller.m_queries.value() == 2
+    assert controller.m_warp_queries.value() == 1
+    assert controller.m_log_answers.value() == 1
+    assert controller.m_stage_seconds.count(stage='classify') == 1
+    assert controller.m_stage_seconds.count(stage='apply') == 1
+    print("  ✓ Consultas, respuestas y latencia por etapa")
+
+    text = controller.metrics.render()
+    assert 'antitebas_warp_domains 1' in text
+    assert 'antitebas_redirect_pending 1' in text
+    print("  ✓ Gauges calculados al leer las métricas")
+
+    return True
+
+
+def test_source_lag():
+    """Test: retraso de lectura del log"""
+    print("🧪 Test: Retraso de la fuente")
+
+    workdir = Path(tempfile.mkdtemp(prefix='antitebas-test-'))
+    log_file = workdir / 'pihole.log'
+    log_file.write_text('')
+    source = LogQuerySource(log_file, poll_interval=0.01)
+    batches = source.batches(lambda: True)
+    next(batches)
+    assert source.lag()['bytes'] == 0
+
+    with open(log_file, 'a') as f:
+        f.write('Jan 10 12:00:00 dnsmasq[1]: query[A] a.com from 192.168.1.10\n')
+    assert source.lag()['bytes'] > 0
+    print("  ✓ Bytes pendientes cuando el log crece")
+
+    while not next(batches):
+        pass
+    assert source.lag()['bytes'] == 0
+    print("  ✓ Sin retraso tras leer hasta el final")
+    source.close()
+
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Ejecutando tests de métricas")
+    print("=" * 60)
+
+    tests = [
+        test_render_format,
+        test_metrics_server,
+        test_controller_metrics,
+        test_source_lag
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
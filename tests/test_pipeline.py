@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Tests para el pipeline por etapas con colas acotadas
+"""
+
+import logging
+import sys
+import os
+import threading
+import time
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from pipeline import Pipeline, Stage, OVERFLOW_BLOCK, OVERFLOW_DROP
+from controller_helper import make_controller
+
+
+def test_drop_and_coalesce():
+    """Test: descarte al llenarse la cola y agrupación por clave"""
+    print("🧪 Test: Descarte y agrupación por clave")
+
+    stage = Stage('resolve', lambda item: None, queue_size=2, overflow=OVERFLOW_DROP, key=lambda d: d)
+    assert stage.put('a.com') is True
+    assert stage.put('a.com') is False
+    assert stage.stats['coalesced'] == 1
+    print("  ✓ Dominio repetido en cola agrupado")
+
+    assert stage.put('b.com') is True
+    assert stage.put('c.com') is False
+    assert stage.stats['dropped'] == 1
+    assert stage.depth == 2 and stage.stats['max_depth'] == 2
+    print("  ✓ Cola llena: elemento descartado sin bloquear")
+
+    stage.start()
+    deadline = time.monotonic() + 2
+    while stage.stats['processed'] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stage.stop()
+    assert stage.put('a.com') is True
+    print("  ✓ La clave se libera al procesar el elemento")
+
+    print("  ✅ Políticas de cola correctas")
+    print()
+    return True
+
+
+def test_block_backpressure():
+    """Test: una cola bloqueante frena al productor"""
+    print("🧪 Test: Contrapresión con cola bloqueante")
+
+    release = threading.Event()
+    stage = Stage('classify', lambda item: release.wait(2), queue_size=1, overflow=OVERFLOW_BLOCK)
+    stage.start()
+    stage.put(1)
+    time.sleep(0.05)   # el worker toma el primero y queda esperando
+    stage.put(2)       # ocupa la única plaza
+
+    done = threading.Event()
+    threading.Thread(target=lambda: (stage.put(3), done.set()), daemon=True).start()
+    assert not done.wait(0.1)
+    print("  ✓ El productor espera con la cola llena")
+
+    release.set()
+    assert done.wait(2)
+    stage.stop()
+    assert stage.stats['dropped'] == 0
+    print("  ✓ Continúa al liberarse sitio, sin descartes")
+
+    print("  ✅ Contrapresión correcta")
+    print()
+    return True
+
+
+def test_pipeline_stages():
+    """Test: varias etapas encadenadas con varios workers"""
+    print("🧪 Test: Etapas encadenadas")
+
+    results = []
+    lock = threading.Lock()
+    pipeline = Pipeline()
+
+    def square(n):
+        time.sleep(0.02)
+        pipeline.submit('collect', n * n)
+
+    def collect(n):
+        with lock:
+            results.append(n)
+
+    pipeline.add_stage('square', square, workers=4, queue_size=100)
+    pipeline.add_stage('collect', collect, queue_size=100)
+    pipeline.start()
+    start = time.monotonic()
+    for n in range(20):
+        pipeline.submit('square', n)
+    assert pipeline.join(timeout=5)
+    elapsed = time.monotonic() - start
+    pipeline.stop()
+
+    assert sorted(results) == [n * n for n in range(20)]
+    assert elapsed < 0.3   # en serie serían 0.4 s
+    print(f"  ✓ 20 elementos en {elapsed * 1000:.0f} ms con 4 workers")
+
+    stats = pipeline.stats()
+    assert stats['square']['processed'] == 20 and stats['square']['workers'] == 4
+    assert pipeline.depths() == {'square': 0, 'collect': 0}
+    print("  ✓ Estadísticas y profundidad de colas disponibles")
+
+    print("  ✅ Pipeline correcto")
+    print()
+    return True
+
+
+def test_concurrent_counters():
+    """Test: los contadores no pierden incrementos con varios workers"""
+    print("🧪 Test: Contadores con varios workers")
+
+    def handler(n):
+        if n % 2:
+            raise ValueError(n)
+
+    stage = Stage('count', handler, workers=8, queue_size=5000, logger=logging.getLogger('test-pipeline'))
+    stage.logger.disabled = True
+    stage.start()
+    for n in range(4000):
+        stage.put(n)
+    deadline = time.monotonic() + 5
+    while stage.queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stage.stop()
+
+    stats = stage.snapshot()
+    assert stats['processed'] == 2000 and stats['errors'] == 2000
+    print("  ✓ 4000 elementos contados sin pérdidas entre 8 workers")
+
+    print("  ✅ Contadores correctos")
+    print()
+    return True
+
+
+def test_controller_pipeline():
+    """Test: el controlador procesa el log a través del pipeline"""
+    print("🧪 Test: Controlador con pipeline")
+
+    controller = make_controller(domains=['dazn.com'], extra_config={'ANSWER_WAIT': '0'})
+    controller.resolver.resolve_func = lambda domain: ({'104.16.9.9'}, 60)
+    controller.pipeline = controller.build_pipeline()
+    controller.pipeline.start()
+
+    controller.pipeline.submit('classify', [
+        'Jan  1 10:00:00 dnsmasq[1]: query[A] www.dazn.com from 192.168.1.10',
+        'Jan  1 10:00:00 dnsmasq[1]: reply www.dazn.com is 104.16.1.1',
+        'Jan  1 10:00:01 dnsmasq[1]: query[A] live.dazn.com from 192.168.1.10',
+    ])
+    # Lote vacío (espera sin datos): caduca la consulta sin respuesta
+    time.sleep(0.01)
+    controller.pipeline.submit('classify', [])
+    assert controller.pipeline.join(timeout=5)
+    controller.pipeline.stop()
+    controller.resolver.shutdown()
+
+    assert controller.redirect_backend.pending == {'104.16.1.1', '104.16.9.9'}
+    print("  ✓ IP del log y IP resuelta llegan al backend")
+
+    print("  ✅ Integración correcta")
+    print()
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Tests para el pipeline por etapas")
+    print("=" * 60)
+    print()
+
+    tests = [
+        test_drop_and_coalesce,
+        test_block_backpressure,
+        test_pipeline_stages,
+        test_concurrent_counters,
+        test_controller_pipeline
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Tests para la ventana de deduplicación de consultas
+"""
+
+import sys
+import os
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from query_dedup import QueryDeduplicator
+from controller_helper import FakeClock, make_controller
+
+
+def test_window_and_budget():
+    """Test: ventana temporal, memoria fija e invalidación"""
+    print("🧪 Test: Ventana y memoria fija")
+
+    clock = FakeClock()
+    dedup = QueryDeduplicator(window=5, max_entries=3, clock=clock)
+    assert dedup.lookup('live.dazn.com', 'A') is None
+    dedup.record('live.dazn.com', 'A', True)
+    dedup.record('example.org', 'A', False)
+    assert dedup.lookup('live.dazn.com', 'A') is True
+    assert dedup.lookup('example.org', 'A') is False
+    assert dedup.lookup('live.dazn.com', 'AAAA') is None
+    print("  ✓ Veredicto reutilizado por (dominio, tipo)")
+
+    clock.now += 5
+    assert dedup.lookup('live.dazn.com', 'A') is None
+    print("  ✓ La entrada deja pasar la consulta al terminar la ventana")
+
+    for i in range(10):
+        dedup.record(f"d{i}.com", 'A', False)
+    assert len(dedup) == 3 and dedup.stats['evicted'] >= 7
+    assert dedup.lookup('d9.com', 'A') is False and dedup.lookup('d0.com', 'A') is None
+    print("  ✓ Como mucho max_entries entradas (LRU)")
+
+    dedup.record('d9.com', 'AAAA', True)
+    dedup.invalidate('d9.com')
+    assert dedup.lookup('d9.com', 'A') is None and dedup.lookup('d9.com', 'AAAA') is None
+    dedup.clear()
+    assert len(dedup) == 0
+    print("  ✓ invalidate por dominio y clear")
+
+    disabled = QueryDeduplicator(window=0)
+    disabled.record('a.com', 'A', True)
+    assert disabled.lookup('a.com', 'A') is None and len(disabled) == 0
+    print("  ✓ window=0 desactiva la deduplicación")
+
+    return True
+
+
+def query(domain, query_type='A', client='192.168.1.10'):
+    return {'domain': domain, 'client_ip': client, 'query_type': query_type}
+
+
+def test_controller_resolve_mode():
+    """Test: consultas repetidas no vuelven a resolver"""
+    print("🧪 Test: Deduplicación con ANSWER_SOURCE=resolve")
+
+    controller = make_controller(domains=['dazn.com'],
+                                 extra_config={'LOG_LEVEL': 'WARNING', 'ANSWER_SOURCE': 'resolve'})
+    resolutions = []
+    controller.request_resolution = resolutions.append
+
+    for _ in range(1000):
+        assert controller.process_dns_query(query('live.dazn.com'))
+        assert not controller.process_dns_query(query('example.org'))
+    assert resolutions == ['live.dazn.com']
+    assert controller.stats['total_queries'] == 2000 and controller.stats['warp_queries'] == 1000
+    assert controller.m_deduped.value() == 999
+    print("  ✓ 1000 consultas repetidas: una sola resolución, estadísticas completas")
+
+    controller.process_dns_query(query('live.dazn.com', 'AAAA'))
+    assert resolutions == ['live.dazn.com', 'live.dazn.com']
+    print("  ✓ Otro tipo de consulta tiene su propia ventana")
+
+    # Cambio de lista: el veredicto cacheado no debe sobrevivir
+    controller.add_domain('example.org')
+    assert controller.process_dns_query(query('example.org'))
+    controller.remove_domain('dazn.com')
+    assert not controller.process_dns_query(query('live.dazn.com'))
+    print("  ✓ add/remove invalidan la ventana")
+
+    return True
+
+
+def test_controller_redirect_state():
+    """Test: caducar la redirección reabre la ventana; respuestas del log siguen"""
+    print("🧪 Test: Cambio de estado de redirección")
+
+    controller = make_controller(domains=['dazn.com'], extra_config={'LOG_LEVEL': 'WARNING'})
+    clock = FakeClock()
+    controller.redirect_table.clock = clock
+    controller.classify_lines([
+        'Jan 10 12:00:00 dnsmasq[1]: query[A] live.dazn.com from 192.168.1.10',
+        'Jan 10 12:00:00 dnsmasq[1]: reply live.dazn.com is 104.16.1.1',
+        'Jan 10 12:00:01 dnsmasq[1]: query[A] live.dazn.com from 192.168.1.10',
+        'Jan 10 12:00:01 dnsmasq[1]: reply live.dazn.com is 104.16.2.2',
+    ])
+    assert controller.m_deduped.value() == 1
+    assert {'104.16.1.1', '104.16.2.2'} <= controller.redirect_backend.pending
+    print("  ✓ Respuestas de consultas repetidas también se redirigen")
+
+    assert controller.dedup.lookup('live.dazn.com', 'A') is True
+    clock.now += 100000
+    assert controller.expire_redirects() == 2
+    assert controller.dedup.lookup('live.dazn.com', 'A') is None
+    print("  ✓ IPs caducadas invalidan la ventana del dominio")
+
+    # Tabla llena: las IPs desalojadas por LRU también invalidan su dominio
+    controller.redirect_table.max_size = 1
+    controller.process_dns_query({'domain': 'live.dazn.com', 'client_ip': '192.168.1.10', 'query_type': 'A'})
+    controller.on_domain_resolved('live.dazn.com', {'104.16.1.1'}, 300)
+    assert controller.dedup.lookup('live.dazn.com', 'A') is True
+    controller.on_domain_resolved('cdn.dazn.com', {'104.16.3.3'}, 300)
+    assert '104.16.1.1' not in controller.redirect_table
+    assert controller.dedup.lookup('live.dazn.com', 'A') is None
+    print("  ✓ IPs desalojadas por tamaño invalidan la ventana del dominio")
+
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Ejecutando tests de deduplicación de consultas")
+    print("=" * 60)
+
+    tests = [
+        test_window_and_budget,
+        test_controller_resolve_mode,
+        test_controller_redirect_state
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
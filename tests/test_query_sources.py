@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Tests para las fuentes de consultas (base de datos SQLite de FTL)
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from query_sources import FtlQuerySource
+from controller_helper import make_controller
+
+
+def create_ftl_db(path):
+    """Crear una base con el esquema mínimo de la tabla queries de FTL"""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE queries (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp INTEGER NOT NULL, "
+                 "type INTEGER NOT NULL, status INTEGER NOT NULL, domain TEXT NOT NULL, "
+                 "client TEXT NOT NULL, forward TEXT)")
+    conn.commit()
+    return conn
+
+
+def insert_queries(conn, domains, query_type=1):
+    now = int(time.time())
+    conn.executemany("INSERT INTO queries (timestamp, type, status, domain, client) VALUES (?, ?, 2, ?, ?)",
+                     [(now, query_type, domain, '192.168.1.10') for domain in domains])
+    conn.commit()
+
+
+def test_incremental_batches():
+    """Test: lectura incremental por id y en lotes"""
+    print("🧪 Test: Lectura incremental de pihole-FTL.db")
+
+    workdir = Path(tempfile.mkdtemp())
+    conn = create_ftl_db(workdir / 'pihole-FTL.db')
+    insert_queries(conn, ['antigua.com'])
+
+    source = FtlQuerySource(workdir / 'pihole-FTL.db', batch_size=2)
+    assert source.read_queries() == []
+    print("  ✓ Al arrancar sin estado se empieza tras la última consulta")
+
+    insert_queries(conn, ['a.com', 'b.com', 'c.com'])
+    insert_queries(conn, ['d.com'], query_type=2)
+    first = source.read_queries()
+    second = source.read_queries()
+    assert [q['domain'] for q in first] == ['a.com', 'b.com']
+    assert [q['domain'] for q in second] == ['c.com', 'd.com']
+    assert second[1]['query_type'] == 'AAAA' and second[1]['client_ip'] == '192.168.1.10'
+    assert isinstance(first[0]['timestamp'], float) and abs(first[0]['timestamp'] - time.time()) < 5
+    assert source.read_queries() == []
+    print("  ✓ Consultas nuevas en lotes de 2, con tipo y cliente")
+
+    source.close()
+    print("  ✅ Lectura correcta")
+    print()
+    return True
+
+
+def test_high_water_mark_persisted():
+    """Test: reinicio sin perder ni repetir consultas"""
+    print("🧪 Test: Marca de agua persistente")
+
+    workdir = Path(tempfile.mkdtemp())
+    db = workdir / 'pihole-FTL.db'
+    state = workdir / 'state' / 'ftl.last-id'
+    conn = create_ftl_db(db)
+
+    source = FtlQuerySource(db, state_file=state)
+    source.read_queries()
+    insert_queries(conn, ['a.com', 'b.com'])
+    assert len(source.read_queries()) == 2
+    source.close()
+
+    insert_queries(conn, ['parado.com'])
+    source = FtlQuerySource(db, state_file=state)
+    assert [q['domain'] for q in source.read_queries()] == ['parado.com']
+    source.close()
+    print("  ✓ Las consultas hechas con el monitor parado se procesan una sola vez")
+
+    # Base recreada: ids más bajos que el guardado
+    conn.close()
+    db.unlink()
+    conn = create_ftl_db(db)
+    insert_queries(conn, ['nueva.com'])
+    source = FtlQuerySource(db, state_file=state)
+    assert [q['domain'] for q in source.read_queries()] == ['nueva.com']
+    source.close()
+    print("  ✓ Base recreada: se lee desde el principio")
+
+    missing = FtlQuerySource(workdir / 'missing.db')
+    assert missing.read_queries() == []
+    print("  ✓ Base inexistente: sin consultas y sin excepción")
+
+    print("  ✅ Estado correcto")
+    print()
+    return True
+
+
+def test_controller_ftl_source():
+    """Test: el controlador detecta dominios WARP desde FTL"""
+    print("🧪 Test: Controlador con QUERY_SOURCE=ftl")
+
+    workdir = Path(tempfile.mkdtemp())
+    conn = create_ftl_db(workdir / 'pihole-FTL.db')
+    controller = make_controller(domains=['dazn.com'], extra_config={
+        'QUERY_SOURCE': 'ftl',
+        'FTL_DB_FILE': str(workdir / 'pihole-FTL.db'),
+        'FTL_STATE_FILE': str(workdir / 'ftl.last-id'),
+    })
+    assert controller.answer_source == 'resolve'
+    print("  ✓ Respuestas por resolución (FTL no guarda IPs)")
+
+    resolved = []
+    controller.request_resolution = resolved.append
+    source = controller.create_query_source()
+    source.read_queries()
+    insert_queries(conn, ['www.dazn.com', 'google.com'])
+    controller.classify_handler()(source.read_queries())
+    source.close()
+    controller.resolver.shutdown()
+
+    assert resolved == ['www.dazn.com']
+    assert controller.stats['total_queries'] == 2 and controller.stats['warp_queries'] == 1
+    print("  ✓ Dominio WARP detectado y enviado a resolver")
+
+    print("  ✅ Integración correcta")
+    print()
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Tests para las fuentes de consultas")
+    print("=" * 60)
+    print()
+
+    tests = [
+        test_incremental_batches,
+        test_high_water_mark_persisted,
+        test_controller_ftl_source
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
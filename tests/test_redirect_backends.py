@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Tests para los backends de redirección (iptables / ipset)
+"""
+
+import sys
+import os
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from redirect_backends import IptablesBackend, IpsetBackend, NftablesBackend, create_backend, CHAIN_NAME
+from controller_helper import FakeClock, FakeRunner
+
+
+def test_ipset_backend_single_rule():
+    """Test: el backend ipset instala una sola regla por familia"""
+    print("🧪 Test: Backend ipset con regla única")
+
+    runner = FakeRunner(fail_prefixes=[
+        ("iptables", "-t", "nat", "-C"),
+        ("ip6tables", "-t", "nat", "-C"),
+    ])
+    backend = IpsetBackend(redirect_port=8080, runner=runner)
+    assert backend.setup()
+
+    creates = [c for c in runner.commands if c[:2] == ["ipset", "create"]]
+    appends = [c for c in runner.commands if "-A" in c and CHAIN_NAME in c]
+    assert len(creates) == 4
+    assert sum("hash:net" in c for c in creates) == 2
+    assert len(appends) == 4
+    assert all("--match-set" in c for c in appends)
+    assert backend.rule_count() == 4
+    print(f"  ✓ {len(appends)} reglas con --match-set instaladas (IPs y rangos por familia)")
+
+    print("  ✅ Regla única por familia")
+    print()
+    return True
+
+
+def test_ipset_backend_batches_ips():
+    """Test: las IPs se cargan en lote con un solo ipset restore"""
+    print("🧪 Test: Carga en lote con ipset restore")
+
+    runner = FakeRunner()
+    backend = IpsetBackend(runner=runner)
+    backend.setup()
+    runner.commands.clear()
+    runner.inputs.clear()
+
+    assert backend.add_ips(['1.1.1.1', '2.2.2.2', '2606:4700::1111']) == 3
+    assert backend.add_ips(['1.1.1.1']) == 0
+    assert runner.commands == []
+    print("  ✓ add_ips no lanza procesos")
+
+    assert backend.flush() == 3
+    assert runner.commands == [["ipset", "restore", "-exist"]]
+    payload = runner.inputs[0]
+    assert "add WARP_IPS 1.1.1.1" in payload
+    assert "add WARP_IPS6 2606:4700::1111" in payload
+    print("  ✓ Un único proceso por flush")
+
+    assert backend.add_ips(['1.1.1.1']) == 0
+    assert backend.flush() == 0
+    print("  ✓ IPs instaladas no se repiten")
+
+    print("  ✅ Carga en lote correcta")
+    print()
+    return True
+
+
+def test_failed_batch_is_retried():
+    """Test: un lote fallido vuelve a quedar pendiente"""
+    print("🧪 Test: Reintento de lotes fallidos")
+
+    runner = FakeRunner(fail_prefixes=[("ipset", "restore")])
+    backend = IpsetBackend(runner=runner)
+    backend.ipv6_enabled = True
+    backend.add_ips(['3.3.3.3'])
+    assert backend.flush() == 0
+    assert backend.pending == {'3.3.3.3'}
+
+    runner.fail_prefixes = []
+    assert backend.flush() == 1
+    assert backend.installed == {'3.3.3.3'}
+    print("  ✓ IP instalada en el siguiente flush")
+
+    print("  ✅ Reintento correcto")
+    print()
+    return True
+
+
+def test_iptables_backend_without_ipv6():
+    """Test: backend iptables clásico sin ip6tables disponible"""
+    print("🧪 Test: Backend iptables sin IPv6")
+
+    runner = FakeRunner(fail_prefixes=[
+        ("ip6tables",),
+        ("iptables", "-t", "nat", "-C", CHAIN_NAME),
+    ])
+    backend = create_backend('iptables', runner=runner)
+    assert isinstance(backend, IptablesBackend)
+    assert backend.setup()
+    assert not backend.ipv6_enabled
+
+    backend.add_ips(['4.4.4.4', '::1'])
+    assert backend.flush() == 1
+    restores = [i for c, i in zip(runner.commands, runner.inputs) if c[0] == "iptables-restore"]
+    assert len(restores) == 1
+    assert f"-A {CHAIN_NAME} -d 4.4.4.4/32" in restores[0]
+    assert not any(c[0].startswith("ip6tables-restore") for c in runner.commands)
+    print("  ✓ Solo se instala la IPv4, en una transacción")
+
+    try:
+        create_backend('pf')
+        assert False, "Debería fallar con backend desconocido"
+    except ValueError:
+        print("  ✓ Backend desconocido rechazado")
+
+    print("  ✅ Backend iptables correcto")
+    print()
+    return True
+
+
+def test_iptables_backend_adopts_live_rules():
+    """Test: tras un reinicio se adoptan las reglas existentes sin duplicarlas"""
+    print("🧪 Test: Reconciliación de arranque del backend iptables")
+
+    saved = "\n".join([
+        "*nat",
+        f":{CHAIN_NAME} - [0:0]",
+        f"-A {CHAIN_NAME} -d 5.5.5.5/32 -p tcp -j REDIRECT --to-ports 8080",
+        "COMMIT",
+    ])
+    runner = FakeRunner(fail_prefixes=[("ip6tables",)], outputs={"iptables-save": saved})
+    backend = IptablesBackend(runner=runner)
+    assert backend.setup()
+    assert backend.installed == {'5.5.5.5'}
+    assert not any(c[0] == "iptables-restore" for c in runner.commands)
+    print("  ✓ Regla existente adoptada sin transacción")
+
+    assert backend.add_ips(['5.5.5.5']) == 0
+    assert backend.remove_ips(['5.5.5.5']) == 1
+    assert backend.flush() == 1
+    assert f"-D {CHAIN_NAME} -d 5.5.5.5/32" in runner.inputs[-1]
+    assert backend.installed == set()
+    print("  ✓ Baja aplicada con iptables-restore")
+
+    print("  ✅ Reconciliación correcta")
+    print()
+    return True
+
+
+def test_nft_backend_timeouts():
+    """Test: backend nftables con timeout por elemento en una transacción"""
+    print("🧪 Test: Backend nftables")
+
+    runner = FakeRunner()
+    clock = FakeClock()
+    backend = create_backend('nft', redirect_port=8080, runner=runner)
+    backend.clock = clock
+    assert isinstance(backend, NftablesBackend) and backend.native_timeouts
+    assert backend.setup()
+    script = runner.inputs[0]
+    assert runner.commands == [["nft", "-f", "-"]]
+    assert "type ipv4_addr; flags timeout;" in script and "type ipv6_addr; flags timeout;" in script
+    assert "type ipv4_addr; flags interval;" in script and "flush set inet antitebas warp_nets" in script
+    assert script.count("redirect to :8080") == 4
+    assert "flush chain inet antitebas warp_redirect" in script
+    assert backend.ipv6_enabled and backend.rule_count() == 4
+    print("  ✓ Tabla, sets con timeout y una regla por set")
+
+    runner.commands.clear()
+    runner.inputs.clear()
+    assert backend.add_ips(['1.1.1.1', '2606:4700::1111'], ttl=600) == 2
+    assert backend.add_ips(['2.2.2.2'], ttl=60) == 1
+    assert backend.flush() == 3
+    assert runner.commands == [["nft", "-f", "-"]]
+    batch = runner.inputs[0]
+    assert "add element inet antitebas warp_ips { 1.1.1.1 timeout 600s, 2.2.2.2 timeout 60s }" in batch
+    assert "add element inet antitebas warp_ips6 { 2606:4700::1111 timeout 600s }" in batch
+    assert "delete element" in batch
+    print("  ✓ Elementos con su TTL en un único nft -f por flush")
+
+    # El timeout del kernel sigue a la caducidad de la tabla (última aparición + ttl)
+    assert backend.add_ips(['1.1.1.1'], ttl=600) == 0
+    clock.now += 240                     # 0,4·ttl: antes solo se renovaba pasada la mitad
+    assert backend.add_ips(['1.1.1.1'], ttl=600) == 1
+    assert backend.flush() == 1
+    assert "1.1.1.1 timeout 600s" in runner.inputs[-1]
+    clock.now += 361                     # pasado el primer timeout (t0 + 600)
+    backend.forget(['1.1.1.1'])
+    assert '1.1.1.1' in backend.installed and backend._expiry['1.1.1.1'] > clock.now
+    print("  ✓ Renovación reenviada: el elemento no caduca antes que la tabla")
+
+    # El controlador solo olvida las caducadas; el kernel ya las retiró
+    assert backend._expiry['2.2.2.2'] <= clock.now
+    runner.commands.clear()
+    backend.forget(['2.2.2.2', '1.1.1.1'])
+    assert runner.commands == []
+    assert '2.2.2.2' not in backend.installed and '1.1.1.1' in backend.installed
+    print("  ✓ Caducidad sin borrados desde el controlador")
+
+    runner.fail_prefixes = [["nft"]]
+    backend.add_ips(['3.3.3.3'], ttl=120)
+    assert backend.flush() == 0 and backend.pending == {'3.3.3.3'}
+    runner.fail_prefixes = []
+    assert backend.flush() == 1
+    assert "3.3.3.3 timeout 120s" in runner.inputs[-1]
+    print("  ✓ Lote fallido reintentado con su timeout")
+
+    print("  ✅ Backend nftables correcto")
+    print()
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Tests para backends de redirección")
+    print("=" * 60)
+    print()
+
+    tests = [
+        test_ipset_backend_single_rule,
+        test_ipset_backend_batches_ips,
+        test_failed_batch_is_retried,
+        test_iptables_backend_without_ipv6,
+        test_iptables_backend_adopts_live_rules,
+        test_nft_backend_timeouts
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
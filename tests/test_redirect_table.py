@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Tests para la tabla de redirecciones (caducidad por TTL y desalojo LRU)
+"""
+
+import sys
+import os
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from redirect_table import RedirectTable
+from redirect_backends import IpsetBackend, create_backend
+from controller_helper import FakeClock, FakeRunner, make_controller
+
+
+def test_ttl_expiry():
+    """Test: caducidad por última aparición + TTL"""
+    print("🧪 Test: Caducidad por TTL")
+
+    clock = FakeClock()
+    table = RedirectTable(min_ttl=60, max_ttl=3600, clock=clock)
+    table.touch(['1.1.1.1'], ttl=30, domain='dazn.com')      # TTL elevado al mínimo (60)
+    table.touch(['2.2.2.2'], ttl=300)
+    table.touch(['3.3.3.3'], ttl=10 ** 6)                     # limitado al máximo (3600)
+    assert table.domain('1.1.1.1') == 'dazn.com'
+
+    clock.now += 61
+    assert table.expire() == ['1.1.1.1']
+    assert '1.1.1.1' not in table and len(table) == 2
+    print("  ✓ TTL limitado a [min_ttl, max_ttl]")
+
+    # Volver a ver la IP renueva su caducidad
+    clock.now += 200
+    table.touch(['2.2.2.2'], ttl=300)
+    clock.now += 100
+    assert table.expire() == []
+    clock.now += 300
+    assert table.expire() == ['2.2.2.2']
+    print("  ✓ Una IP vista de nuevo no caduca con su TTL anterior")
+
+    # Un TTL menor no acorta una caducidad más lejana
+    table.touch(['3.3.3.3'], ttl=60)
+    clock.now += 3600
+    assert table.expire() == ['3.3.3.3']
+    assert table.stats['expired'] == 3
+    print("  ✓ Se conserva la caducidad más lejana")
+
+    return True
+
+
+def test_batches_and_eviction():
+    """Test: barrido por lotes y tamaño máximo con LRU"""
+    print("🧪 Test: Lotes y desalojo LRU")
+
+    clock = FakeClock()
+    table = RedirectTable(max_size=1000, min_ttl=60, clock=clock)
+    table.touch([f"10.0.{i // 256}.{i % 256}" for i in range(500)])
+    clock.now += 61
+    assert len(table.expire(limit=200)) == 200
+    assert len(table.expire(limit=200)) == 200
+    assert len(table.expire(limit=200)) == 100
+    assert len(table) == 0
+    print("  ✓ Caducadas retiradas en lotes de tamaño fijo")
+
+    table = RedirectTable(max_size=3, min_ttl=60, clock=clock)
+    table.touch(['1.1.1.1', '2.2.2.2', '3.3.3.3'], domain='dazn.com')
+    table.touch(['1.1.1.1'])
+    assert table.touch(['4.4.4.4']) == [('2.2.2.2', 'dazn.com')]
+    assert len(table) == 3 and '1.1.1.1' in table
+    assert table.stats['evicted'] == 1
+    print("  ✓ Con la tabla llena se desaloja la IP menos reciente")
+
+    # Las entradas obsoletas del montículo no crecen sin límite
+    table = RedirectTable(max_size=10, min_ttl=1, clock=clock)
+    for i in range(5000):
+        clock.now += 1
+        table.touch(['5.5.5.5'])
+    assert len(table._heap) <= 2 * len(table) + 1024
+    print("  ✓ Montículo compactado al renovar muchas veces")
+
+    return True
+
+
+def test_ipset_adopts_existing_members():
+    """Test: el backend ipset adopta las IPs que ya tiene el set"""
+    print("🧪 Test: Adopción de IPs del ipset")
+
+    runner = FakeRunner(outputs={'ipset': "create WARP_IPS hash:ip family inet\nadd WARP_IPS 9.9.9.9\n"})
+    backend = IpsetBackend(runner=runner)
+    assert backend.setup()
+    assert backend.installed == {'9.9.9.9'}
+    print("  ✓ IPs de una ejecución anterior quedan bajo seguimiento")
+
+    return True
+
+
+def test_controller_aging():
+    """Test: el controlador retira IPs caducadas y desalojadas"""
+    print("🧪 Test: Envejecimiento en el controlador")
+
+    controller = make_controller(domains=['dazn.com'], extra_config={
+        'LOG_LEVEL': 'WARNING', 'REDIRECT_MAX_ENTRIES': '2', 'REDIRECT_MIN_TTL': '60',
+    })
+    clock = FakeClock()
+    controller.redirect_table.clock = clock
+    backend = controller.redirect_backend
+    backend.runner = FakeRunner()
+
+    controller.on_domain_resolved('dazn.com', {'1.1.1.1', '2.2.2.2'}, 60)
+    controller.flush_redirects()
+    assert backend.installed == {'1.1.1.1', '2.2.2.2'}
+
+    controller.on_domain_resolved('live.dazn.com', {'3.3.3.3'}, 60)
+    controller.flush_redirects()
+    assert len(backend.installed) == 2 and '3.3.3.3' in backend.installed
+    print("  ✓ Tamaño máximo respetado también en el kernel")
+
+    clock.now += 61
+    assert controller.expire_redirects() == 2
+    controller.flush_redirects()
+    assert backend.installed == set()
+    assert len(controller.redirect_table) == 0
+    print("  ✓ IPs caducadas eliminadas de la redirección")
+
+    # Con nftables el kernel retira los elementos: el barrido no lanza comandos
+    nft_runner = FakeRunner()
+    controller.redirect_backend = backend = create_backend('nft', runner=nft_runner)
+    controller.on_domain_resolved('dazn.com', {'4.4.4.4'}, 90)
+    controller.flush_redirects()
+    assert '4.4.4.4 timeout 90s' in nft_runner.inputs[-1]
+    backend._expiry['4.4.4.4'] -= 91
+    clock.now += 91
+    issued = nft_runner.count
+    assert controller.expire_redirects() == 1
+    controller.flush_redirects()
+    assert nft_runner.count == issued and backend.installed == set()
+    print("  ✓ nftables: caducidad en el kernel, sin borrados")
+
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Ejecutando tests de la tabla de redirecciones")
+    print("=" * 60)
+
+    tests = [
+        test_ttl_expiry,
+        test_batches_and_eviction,
+        test_ipset_adopts_existing_members,
+        test_controller_aging
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests para el aplicador de reglas por lotes (iptables-save / iptables-restore)
+"""
+
+import sys
+import os
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from rule_applier import RuleApplier, CHAIN_NAME
+from controller_helper import FakeRunner
+
+SAVED_CHAIN = f"""# Generated by iptables-save
+*nat
+:PREROUTING ACCEPT [0:0]
+:{CHAIN_NAME} - [0:0]
+-A PREROUTING -j {CHAIN_NAME}
+-A {CHAIN_NAME} -d 1.1.1.1/32 -p tcp -j REDIRECT --to-ports 8080
+-A {CHAIN_NAME} -d 1.1.1.1/32 -p tcp -j REDIRECT --to-ports 8080
+-A {CHAIN_NAME} -d 2.2.2.2/32 -p tcp -j REDIRECT --to-ports 8080
+-A {CHAIN_NAME} -p tcp -m set --match-set WARP_IPS dst -j REDIRECT --to-ports 8080
+COMMIT
+"""
+
+
+def save_restore_runner(iptables='iptables', fail_restore=False):
+    """Runner falso: iptables-save devuelve SAVED_CHAIN; restore falla si se pide"""
+    return FakeRunner(outputs={f'{iptables}-save': SAVED_CHAIN},
+                      fail_prefixes=[(f'{iptables}-restore',)] if fail_restore else ())
+
+
+def test_parse_save_output():
+    """Test de lectura de la cadena desde iptables-save"""
+    print("🧪 Test: Lectura de iptables-save")
+
+    applier = RuleApplier(save_restore_runner())
+    live = applier.parse_save(SAVED_CHAIN)
+    assert set(live) == {'1.1.1.1', '2.2.2.2'}
+    assert len(live['1.1.1.1']) == 2
+    print("  ✓ IPs y duplicados detectados, regla ipset ignorada")
+
+    print("  ✅ Lectura correcta")
+    print()
+    return True
+
+
+def test_commit_single_transaction():
+    """Test: altas y bajas en una única transacción"""
+    print("🧪 Test: Transacción única con altas y bajas")
+
+    runner = save_restore_runner()
+    applier = RuleApplier(runner)
+    applier.add(['1.1.1.1', '3.3.3.3', '4.4.4.4'])
+
+    added, removed = applier.commit()
+    assert added == {'3.3.3.3', '4.4.4.4'}
+    assert removed == {'2.2.2.2'}
+    assert len(runner.calls('iptables-save')) == 1
+    assert len(runner.calls('iptables-restore')) == 1
+
+    cmd, payload = runner.calls('iptables-restore')[0]
+    assert cmd == ['iptables-restore', '--noflush']
+    lines = payload.splitlines()
+    assert lines[0] == '*nat' and lines[-1] == 'COMMIT'
+    assert f"-D {CHAIN_NAME} -d 1.1.1.1/32 -p tcp -j REDIRECT --to-ports 8080" in lines
+    assert f"-D {CHAIN_NAME} -d 2.2.2.2/32 -p tcp -j REDIRECT --to-ports 8080" in lines
+    assert f"-A {CHAIN_NAME} -d 3.3.3.3/32 -p tcp -j REDIRECT --to-ports 8080" in lines
+    print(f"  ✓ {len(lines) - 2} cambios en un solo iptables-restore")
+
+    assert applier.commit() == (set(), set())
+    assert len(runner.calls('iptables-save')) == 1 and len(runner.calls('iptables-restore')) == 1
+    print("  ✓ Sin cambios no se lanza ningún proceso")
+
+    print("  ✅ Transacción correcta")
+    print()
+    return True
+
+
+def test_reconcile_and_failure():
+    """Test: reconciliación de arranque y recuperación ante fallos"""
+    print("🧪 Test: Reconciliación y fallo de iptables-restore")
+
+    runner = save_restore_runner()
+    applier = RuleApplier(runner)
+    installed = applier.reconcile()
+    assert installed == {'1.1.1.1', '2.2.2.2'}
+    assert len(runner.calls('iptables-restore')) == 1
+    assert runner.calls('iptables-restore')[0][1].count('-D ') == 1
+    print("  ✓ Duplicado eliminado al adoptar reglas existentes")
+
+    runner = save_restore_runner('ip6tables', fail_restore=True)
+    applier = RuleApplier(runner, iptables='ip6tables')
+    applier.add(['2606:4700::1111'])
+    assert applier.commit() == (set(), set())
+    assert applier.live is None
+    assert '/128' in runner.calls('ip6tables-restore')[0][1]
+    applier.commit()
+    assert len(runner.calls('ip6tables-save')) == 2
+    print("  ✓ Tras un fallo se vuelve a leer el estado real")
+
+    print("  ✅ Reconciliación correcta")
+    print()
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Tests para el aplicador de reglas")
+    print("=" * 60)
+    print()
+
+    tests = [
+        test_parse_save_output,
+        test_commit_single_transaction,
+        test_reconcile_and_failure
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Tests para el precalentamiento de redirecciones de dominios WARP
+"""
+
+import sys
+import os
+import threading
+import time
+from datetime import datetime
+
+# Agregar el path del módulo
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'antiTebasPlugin', 'src'))
+
+from warmup import WarmupScheduler, next_trigger, parse_schedule
+from controller_helper import FakeRunner, make_controller
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_concurrency_and_rate():
+    """Test: límite de resoluciones simultáneas y por segundo"""
+    print("🧪 Test: Concurrencia y ritmo del precalentamiento")
+
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+    resolved = []
+
+    def resolve(domain):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return ({'104.16.0.1'} if domain != 'nx.example' else set()), 300
+
+    warmup = WarmupScheduler(resolve, lambda d, ips, ttl: resolved.append(d),
+                             concurrency=2, rate=50, refresh_interval=0)
+    domains = [f"d{i}.com" for i in range(20)] + ['nx.example']
+    assert warmup.schedule(domains + ['d0.com']) == 21
+    start = time.monotonic()
+    warmup.start()
+    try:
+        assert wait_until(lambda: warmup.stats['resolved'] + warmup.stats['failed'] == 21)
+    finally:
+        warmup.stop()
+    elapsed = time.monotonic() - start
+
+    assert sorted(resolved) == sorted(domains[:-1])
+    assert warmup.stats['failed'] == 1
+    assert peak[0] <= 2
+    assert elapsed >= (21 - 2) / 50 * 0.9
+    print(f"  ✓ 21 dominios en {elapsed:.2f} s, como mucho {peak[0]} a la vez (límite 50/s)")
+
+    return True
+
+
+def test_queue_and_hot_domains():
+    """Test: cola acotada y dominios calientes"""
+    print("🧪 Test: Cola y dominios calientes")
+
+    warmup = WarmupScheduler(lambda d: (set(), 0), lambda *a: None, hot_size=3, max_pending=2)
+    assert warmup.schedule(['a.com', 'b.com', 'c.com']) == 2
+    assert warmup.stats['dropped'] == 1 and warmup.pending() == 2
+    print("  ✓ Como mucho max_pending dominios en cola")
+
+    for domain, hits in [('a.com', 1), ('b.com', 3), ('c.com', 2), ('d.com', 1)]:
+        for _ in range(hits):
+            warmup.touch(domain)
+    assert warmup.hot_domains() == ['b.com', 'c.com', 'd.com']
+    print("  ✓ Dominios calientes por número de consultas, acotados a hot_size")
+
+    return True
+
+
+def test_apex_selection():
+    """Test: la lista se precalienta por sus entradas raíz"""
+    print("🧪 Test: Selección de dominios raíz de la lista")
+
+    controller = make_controller(domains=[
+        'www.dazn.com', 'dazn.com', 'cdn.live.dazn.com', 'live.dazn.com', 'laliga.es',
+        'a.b.movistarplus.es', 'b.movistarplus.es',
+    ], extra_config={'LOG_LEVEL': 'WARNING', 'WARMUP_LIST_LIMIT': '2', 'WARMUP_REFRESH_INTERVAL': '0'})
+    assert set(controller.apex_domains()) == {'dazn.com', 'laliga.es', 'b.movistarplus.es'}
+    print("  ✓ Subdominios con un padre listado descartados")
+
+    assert controller.schedule_warmup() == 2
+    assert controller.warmup.pending() == 2
+    assert set(controller.warmup._queue) <= {'dazn.com', 'laliga.es', 'b.movistarplus.es'}
+    print("  ✓ WARMUP_LIST_LIMIT se aplica tras elegir las raíces")
+
+    return True
+
+
+def test_match_schedule():
+    """Test: precalentamiento antes de cada ventana de partido"""
+    print("🧪 Test: Horarios de partido")
+
+    windows, invalid = parse_schedule('21:00, sab 16:15 ,dom 18:30,, 25:00, vie, xx 10:00')
+    assert windows == [(None, 21, 0), (5, 16, 15), (6, 18, 30)] and invalid == 3
+    print("  ✓ Entradas HH:MM y dia HH:MM; inválidas contadas")
+
+    saturday = datetime(2026, 10, 17, 15, 0)
+    assert next_trigger(windows, 900, saturday) == datetime(2026, 10, 17, 16, 0)
+    assert next_trigger(windows, 900, datetime(2026, 10, 17, 16, 0)) == datetime(2026, 10, 17, 20, 45)
+    assert next_trigger(windows, 900, datetime(2026, 10, 17, 23, 0)) == datetime(2026, 10, 18, 18, 15)
+    assert next_trigger([(0, 0, 5)], 900, saturday) == datetime(2026, 10, 18, 23, 50)
+    assert next_trigger([], 900, saturday) is None
+    print("  ✓ Próximo disparo LEAD antes de la ventana (también cruzando el día)")
+
+    now = [datetime(2026, 10, 17, 15, 0)]
+    fired = []
+    warmup = WarmupScheduler(lambda d: (set(), 0), lambda *a: None, refresh_interval=0,
+                             windows=[(5, 16, 15)], lead=900,
+                             on_window=lambda: fired.append(now[0]), wall_clock=lambda: now[0])
+    warmup.planner_poll = 0.01
+    warmup.start()
+    try:
+        time.sleep(0.05)
+        assert fired == []
+        now[0] = datetime(2026, 10, 17, 16, 0, 30)
+        assert wait_until(lambda: fired)
+        time.sleep(0.05)
+    finally:
+        warmup.stop()
+    assert fired == [datetime(2026, 10, 17, 16, 0, 30)] and warmup.stats['windows'] == 1
+    print("  ✓ on_window se llama una vez al llegar el disparo")
+
+    controller = make_controller(domains=['dazn.com'], extra_config={
+        'LOG_LEVEL': 'WARNING', 'WARMUP_SCHEDULE': 'sab 16:15,dom 18:30', 'WARMUP_LEAD': '600',
+    })
+    assert controller.warmup.windows == [(5, 16, 15), (6, 18, 30)] and controller.warmup.lead == 600
+    assert controller.warmup.on_window == controller.schedule_warmup
+    print("  ✓ WARMUP_SCHEDULE y WARMUP_LEAD configuran el controlador")
+
+    return True
+
+
+def make_warm_controller(answer_source='log'):
+    controller = make_controller(domains=['dazn.com', 'laliga.es'], extra_config={
+        'LOG_LEVEL': 'WARNING',
+        'ANSWER_SOURCE': answer_source,
+        'WARMUP_RATE': '0',
+        'WARMUP_REFRESH_INTERVAL': '0',
+    })
+    controller.resolver.resolve_func = lambda domain: ({'104.16.1.1'} if domain == 'dazn.com' else set(), 300)
+    controller.redirect_backend.runner = FakeRunner()
+    return controller
+
+
+def test_controller_warmup_covers_first_connection():
+    """Test: redirección instalada antes de la primera consulta"""
+    print("🧪 Test: Primera conexión cubierta por el precalentamiento")
+
+    controller = make_warm_controller()
+    controller.warmup.start()
+    try:
+        assert controller.schedule_warmup() == 2
+        assert wait_until(lambda: controller.warmup.stats['resolved'] + controller.warmup.stats['failed'] == 2)
+        controller.flush_redirects()
+        assert '104.16.1.1' in controller.redirect_backend.installed
+        print("  ✓ IPs de la lista redirigidas sin ninguna consulta")
+
+        controller.classify_lines([
+            'Jan 10 12:00:00 dnsmasq[1]: query[A] dazn.com from 192.168.1.10',
+            'Jan 10 12:00:00 dnsmasq[1]: reply dazn.com is 104.16.1.1',
+            'Jan 10 12:00:01 dnsmasq[1]: query[A] laliga.es from 192.168.1.10',
+            'Jan 10 12:00:01 dnsmasq[1]: reply laliga.es is 130.1.1.1',
+            'Jan 10 12:00:01 dnsmasq[1]: reply laliga.es is 130.1.1.2',
+            'Jan 10 12:00:05 dnsmasq[1]: query[A] laliga.es from 192.168.1.11',
+            'Jan 10 12:00:05 dnsmasq[1]: reply laliga.es is 130.1.1.1',
+        ])
+        assert controller.m_coverage.value(result='hit') == 1
+        assert controller.m_coverage.value(result='miss') == 1
+        print("  ✓ Métricas de cobertura: hit para la precalentada, miss para la otra")
+        print("  ✓ Solo la primera respuesta de cada dominio por TTL cuenta")
+
+        # Una lista nueva se precalienta al publicarse
+        controller.add_domain('movistarplus.es')
+        assert wait_until(lambda: controller.warmup.stats['scheduled'] >= 3)
+        assert 'laliga.es' in controller.warmup.hot_domains()
+        print("  ✓ Recarga de listas y dominios consultados se vuelven a encolar")
+    finally:
+        controller.warmup.stop()
+
+    return True
+
+
+def test_controller_resolve_mode_coverage():
+    """Test: cobertura con ANSWER_SOURCE=resolve y precalentamiento desactivado"""
+    print("🧪 Test: Cobertura en modo resolve")
+
+    controller = make_warm_controller('resolve')
+    controller.request_resolution = lambda domain: None
+    controller.on_domain_resolved('dazn.com', *controller.resolver.lookup('dazn.com'))
+    controller.flush_redirects()
+    controller.process_dns_query({'domain': 'dazn.com', 'client_ip': '192.168.1.10', 'query_type': 'A'})
+    controller.process_dns_query({'domain': 'laliga.es', 'client_ip': '192.168.1.10', 'query_type': 'A'})
+    assert controller.m_coverage.value(result='hit') == 1
+    assert controller.m_coverage.value(result='miss') == 1
+    print("  ✓ Respuesta ya redirigida cuenta como hit")
+
+    disabled = make_controller(extra_config={'LOG_LEVEL': 'WARNING', 'WARMUP_ENABLED': 'false'})
+    assert disabled.warmup is None and disabled.schedule_warmup() == 0
+    print("  ✓ WARMUP_ENABLED=false desactiva el precalentamiento")
+
+    return True
+
+
+def main():
+    """Ejecutar todos los tests"""
+    print("=" * 60)
+    print("🚀 Ejecutando tests de precalentamiento")
+    print("=" * 60)
+
+    tests = [
+        test_concurrency_and_rate,
+        test_queue_and_hot_domains,
+        test_apex_selection,
+        test_match_schedule,
+        test_controller_warmup_covers_first_connection,
+        test_controller_resolve_mode_coverage
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            if test():
+                passed += 1
+        except AssertionError as e:
+            print(f"  ❌ Test falló: {e}")
+            failed += 1
+        except Exception as e:
+            print(f"  ❌ Error en test: {e}")
+            failed += 1
+
+    print("=" * 60)
+    print(f"📊 Resultados: {passed} passed, {failed} failed")
+    print("=" * 60)
+
+    if failed > 0:
+        sys.exit(1)
+    else:
+        print("\n✅ Todos los tests pasaron correctamente\n")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()